@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Script to apply pending schema migrations to the database in DATABASE_URL.
+
+With --explain, the SQLite query plans of the hot evaluation queries are
+printed before and after migrating.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from src.database import database_settings, engine, init_db
+from src.migrations import applied_versions
+
+# Query shapes of create_evaluation, get_evaluations, get_active_evaluations, the stats and metric queries
+HOT_QUERIES = {
+    "create_evaluation": "SELECT id FROM evaluations WHERE image_id = 1 AND prompt_version = 'v1'",
+    "get_evaluations": "SELECT id FROM evaluations WHERE prompt_version = 'v1'",
+    "get_active_evaluations": (
+        "SELECT id FROM evaluations WHERE processing_status = 'pending' OR processing_status = 'processing'"
+    ),
+    "accuracy by prompt version": (
+        "SELECT prompt_version, avg(accuracy) FROM evaluations "
+        "WHERE processing_status = 'success' AND accuracy IS NOT NULL GROUP BY prompt_version"
+    ),
+    "word evaluations": "SELECT id FROM word_evaluations WHERE evaluation_id IN (1, 2)",
+    "dataset images": "SELECT image_id FROM dataset_images WHERE dataset_id = 1",
+}
+
+async def print_query_plans(title: str):
+    """Print EXPLAIN QUERY PLAN for each hot query"""
+    print(f"\n{title}:")
+    async with engine.connect() as conn:
+        for name, query in HOT_QUERIES.items():
+            try:
+                result = await conn.execute(text(f"EXPLAIN QUERY PLAN {query}"))
+                plan = "; ".join(row[-1] for row in result.fetchall())
+            except Exception as e:
+                plan = f"not available ({e.__class__.__name__})"
+            print(f"  {name}: {plan}")
+
+async def main():
+    """Apply pending migrations"""
+    explain = "--explain" in sys.argv[1:] and database_settings.is_sqlite
+
+    async with engine.connect() as conn:
+        before = await conn.run_sync(applied_versions)
+    print(f"Schema versions applied: {sorted(before) or 'none'}")
+
+    if explain:
+        await print_query_plans("Query plans before")
+
+    await init_db()
+
+    async with engine.connect() as conn:
+        after = await conn.run_sync(applied_versions)
+    print(f"Applied migrations: {sorted(after - before) or 'none, schema is up to date'}")
+
+    if explain:
+        await print_query_plans("Query plans after")
+
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
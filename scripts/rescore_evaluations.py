@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Script to rescore stored evaluations locally, without calling OCR.
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from pathlib import Path
+
+# Add src to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from src.database import async_session
+from src.rescoring import DEFAULT_CHUNK_SIZE, rescore_evaluations
+
+async def main():
+    """Rescore stored evaluations"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompt-version", help="Only rescore evaluations of this prompt version")
+    parser.add_argument("--run-id", type=int, help="Only rescore evaluations of this evaluation run")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Evaluations per chunk")
+    parser.add_argument("--workers", type=int, help="Scoring processes (default: CPU count, 0: no pool)")
+    parser.add_argument("--dry-run", action="store_true", help="Count changes without writing them")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    async with async_session() as db:
+        stats = await rescore_evaluations(
+            db,
+            prompt_version=args.prompt_version,
+            evaluation_run_id=args.run_id,
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            dry_run=args.dry_run
+        )
+
+    print(f"Rescoring completed{' (dry run)' if args.dry_run else ''}:")
+    print(f"  - Rescored: {stats['rescored']} evaluations")
+    print(f"  - Changed: {stats['changed']}")
+    print(f"  - Errors: {stats['failed']}")
+    print(f"  - Time: {stats['elapsed_seconds']:.1f}s")
+
+if __name__ == "__main__":
+    asyncio.run(main())
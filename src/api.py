@@ -5,7 +5,9 @@ from typing import List, Optional
 import asyncio
 import os
 import json
+import mimetypes
 import shutil
+import uuid
 from pathlib import Path
 
 from .database import get_db, init_db
@@ -14,8 +16,8 @@ from .schemas import (
     Evaluation, EvaluationCreate, EvaluationUpdate, EvaluationWithDetails,
     PromptTemplate, PromptTemplateCreate, PromptTemplateUpdate,
     CSVImportRequest, CSVImportResponse,
-    EvaluationStats, AccuracyDistribution,
-    BatchProcessRequest, BatchProcessResponse,
+    EvaluationStats, AccuracyDistribution, ErrorRateMetrics, OcrCacheStats, OcrUsageStats, OcrLatencyStats,
+    OcrExecutorStats, BatchProcessRequest, BatchProcessResponse, RescoreRequest, RescoreJob,
     ImageFilter, PaginationParams, PaginatedResponse,
     PaginatedImagesResponse, PaginatedEvaluationsResponse,
     EvaluationProgress, EvaluationHistory, PromptVersionStats,
@@ -29,6 +31,9 @@ from .schemas import (
 )
 from . import crud
 from .orchestrator import OcrOrchestrator
+from .image_store import get_image_store
+from .metrics import MetricsCache, compute_error_rates
+from .rescoring import rescore_evaluations
 
 app = FastAPI(
     title="OCR Evaluation API",
@@ -58,12 +63,40 @@ def get_ocr_orchestrator():
         ocr_orchestrator = OcrOrchestrator()
     return ocr_orchestrator
 
+# Rescoring jobs by job_id, kept for the life of the process
+rescore_jobs = {}
+
+# Error-rate metrics per run/dataset/prompt version, recomputed when their evaluations change
+error_rate_cache = MetricsCache()
+
+def invalidate_prompt_registry():
+    """Make the next OCR call reload prompts after a prompt version changes"""
+    if ocr_orchestrator is not None:
+        ocr_orchestrator.ocr.prompts.invalidate()
+
 # Startup and shutdown events
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
     await init_db()
     print("Database initialized")
+    
+    # Drop image store blobs that were written but never attached to an image
+    swept = await asyncio.to_thread(get_image_store().sweep)
+    if swept:
+        print(f"Removed {swept} unreferenced images from the image store")
+    
+    # Open the pooled image download session up front
+    try:
+        await get_ocr_orchestrator().start()
+    except ValueError as e:
+        print(f"OCR orchestrator not started: {e}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release OCR resources on shutdown"""
+    if ocr_orchestrator is not None:
+        await ocr_orchestrator.close()
 
 # Health check endpoint
 @app.get("/health")
@@ -352,7 +385,7 @@ async def create_evaluation(
     db_evaluation = await crud.create_evaluation(db, evaluation)
     
     # Queue background processing
-    background_tasks.add_task(process_evaluation_background, db_evaluation.id)
+    background_tasks.add_task(process_evaluation_background, db_evaluation.id, evaluation.bypass_cache)
     
     return db_evaluation
 
@@ -380,7 +413,7 @@ async def batch_process_evaluations(
         
         try:
             db_evaluation = await crud.create_evaluation(db, evaluation_create)
-            background_tasks.add_task(process_evaluation_background, db_evaluation.id)
+            background_tasks.add_task(process_evaluation_background, db_evaluation.id, request.bypass_cache)
             queued_count += 1
         except Exception:
             continue
@@ -390,6 +423,45 @@ async def batch_process_evaluations(
         message=f"Queued {queued_count} evaluations for processing"
     )
 
+@app.post("/api/evaluations/rescore", response_model=RescoreJob)
+async def rescore_stored_evaluations(request: RescoreRequest, background_tasks: BackgroundTasks):
+    """Rescore stored evaluations locally without calling OCR"""
+    job = RescoreJob(job_id=uuid.uuid4().hex, status="processing")
+    rescore_jobs[job.job_id] = job
+    background_tasks.add_task(rescore_evaluations_background, job.job_id, request)
+    return job
+
+@app.get("/api/evaluations/rescore/{job_id}", response_model=RescoreJob)
+async def get_rescore_job(job_id: str):
+    """Get the status and counts of a rescoring job"""
+    job = rescore_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Rescoring job not found")
+    return job
+
+async def rescore_evaluations_background(job_id: str, request: RescoreRequest):
+    """Background task to rescore stored evaluations"""
+    from .database import async_session
+    
+    job = rescore_jobs[job_id]
+    async with async_session() as db:
+        try:
+            stats = await rescore_evaluations(
+                db,
+                prompt_version=request.prompt_version,
+                evaluation_run_id=request.evaluation_run_id,
+                chunk_size=request.chunk_size,
+                dry_run=request.dry_run
+            )
+            job.rescored = stats['rescored']
+            job.changed = stats['changed']
+            job.failed = stats['failed']
+            job.elapsed_seconds = stats['elapsed_seconds']
+            job.status = "success"
+        except Exception as e:
+            job.status = "failed"
+            job.error_message = str(e)
+
 # Progress and Status endpoints
 
 @app.get("/api/evaluations/{evaluation_id}/progress", response_model=EvaluationProgress)
@@ -529,6 +601,55 @@ async def get_accuracy_distribution(db: AsyncSession = Depends(get_db)):
     distribution = await crud.get_accuracy_distribution(db)
     return AccuracyDistribution(**distribution)
 
+@app.get("/api/stats/error-rates", response_model=ErrorRateMetrics)
+async def get_error_rate_statistics(
+    evaluation_run_id: Optional[int] = None,
+    dataset_id: Optional[int] = None,
+    prompt_version: Optional[str] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    """Get CER, WER and per-position error rates with bootstrap confidence intervals"""
+    scope = (evaluation_run_id, dataset_id, prompt_version)
+    fingerprint = await crud.get_metric_fingerprint(db, *scope)
+    metrics = error_rate_cache.get(scope, fingerprint)
+    if metrics is None:
+        inputs = await crud.get_error_rate_inputs(db, *scope)
+        # CPU-bound; keep it off the event loop
+        metrics = await asyncio.to_thread(compute_error_rates, **inputs)
+        error_rate_cache.put(scope, fingerprint, metrics)
+    return ErrorRateMetrics(**metrics)
+
+@app.get("/api/stats/ocr-cache", response_model=OcrCacheStats)
+async def get_ocr_cache_statistics():
+    """Get OCR result cache hit/miss counters"""
+    cache = get_ocr_orchestrator().ocr.cache
+    if cache is None:
+        return OcrCacheStats(enabled=False)
+    return OcrCacheStats(enabled=True, **cache.get_stats())
+
+@app.get("/api/stats/ocr-latency", response_model=OcrLatencyStats)
+async def get_ocr_latency_statistics():
+    """Get OCR latency percentiles with and without hedging, and hedge win rate"""
+    ocr = get_ocr_orchestrator().ocr
+    return OcrLatencyStats(
+        **ocr.hedging.get_stats(),
+        streaming=OcrLatencyStats(**ocr.stream_hedging.get_stats())
+    )
+
+@app.get("/api/stats/ocr-executor", response_model=OcrExecutorStats)
+async def get_ocr_executor_statistics():
+    """Get queue depth and wait times of the OCR executor"""
+    return OcrExecutorStats(**get_ocr_orchestrator().executor.get_stats())
+
+@app.get("/api/stats/ocr-usage", response_model=List[OcrUsageStats])
+async def get_ocr_usage_statistics(
+    group_by: str = Query("prompt_version", pattern="^(prompt_version|evaluation_run)$"),
+    db: AsyncSession = Depends(get_db)
+):
+    """Get OCR latency, token and cost aggregates per prompt version or evaluation run"""
+    stats = await crud.get_ocr_usage_stats(db, group_by)
+    return [OcrUsageStats(**row) for row in stats]
+
 # File serving for images
 @app.get("/api/images/{image_id}/file")
 async def get_image_file(image_id: int, db: AsyncSession = Depends(get_db)):
@@ -537,14 +658,21 @@ async def get_image_file(image_id: int, db: AsyncSession = Depends(get_db)):
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
     
+    from fastapi.responses import FileResponse, StreamingResponse
+    
+    store = get_image_store()
+    if image.content_hash and store.exists(image.content_hash):
+        # Stored blobs have no extension, so take the type from the original name
+        media_type = mimetypes.guess_type(image.url or "")[0] or "image/jpeg"
+        return StreamingResponse(store.iter_chunks(image.content_hash), media_type=media_type)
+    
     if not image.local_path or not os.path.exists(image.local_path):
         raise HTTPException(status_code=404, detail="Image file not found")
     
-    from fastapi.responses import FileResponse
     return FileResponse(image.local_path)
 
 # Background task functions
-async def process_evaluation_background(evaluation_id: int):
+async def process_evaluation_background(evaluation_id: int, bypass_cache: bool = False):
     """Background task to process an evaluation"""
     from .database import async_session
     
@@ -560,48 +688,42 @@ async def process_evaluation_background(evaluation_id: int):
                 evaluation_id, 
                 crud.EvaluationUpdate(
                     processing_status="processing",
-                    progress_percentage=10,
-                    current_step="Initializing OCR processing"
-                )
-            )
-            
-            # Update progress: downloading image
-            await crud.update_evaluation(
-                db, 
-                evaluation_id, 
-                crud.EvaluationUpdate(
-                    progress_percentage=30,
+                    progress_percentage=5,
                     current_step="Downloading image"
                 )
             )
             
             # Process the evaluation using OCR orchestrator
             orchestrator = get_ocr_orchestrator()
+            await orchestrator.ocr.prompts.ensure_loaded(db, evaluation.prompt_version)
             
-            # Update progress: running OCR
-            await crud.update_evaluation(
-                db, 
-                evaluation_id, 
-                crud.EvaluationUpdate(
-                    progress_percentage=60,
-                    current_step="Running OCR analysis"
+            # Report real progress as words evaluated out of words in the reference,
+            # mapped onto 10-95% and written at most once per 5% step
+            last_reported = {'percentage': 5}
+            
+            async def report_progress(words_done: int, words_total: int):
+                fraction = min(words_done / words_total, 1.0) if words_total else 1.0
+                percentage = 10 + int(85 * fraction)
+                if percentage - last_reported['percentage'] < 5 and words_done != words_total:
+                    return
+                last_reported['percentage'] = percentage
+                await crud.update_evaluation(
+                    db,
+                    evaluation_id,
+                    crud.EvaluationUpdate(
+                        progress_percentage=percentage,
+                        current_step=f"Evaluated {words_done} of {words_total} words"
+                    )
                 )
-            )
             
             result = await orchestrator.process_single_evaluation(
                 evaluation.image.url,
                 evaluation.image.reference_text,
-                evaluation.image.number
-            )
-            
-            # Update progress: analyzing results
-            await crud.update_evaluation(
-                db, 
-                evaluation_id, 
-                crud.EvaluationUpdate(
-                    progress_percentage=90,
-                    current_step="Analyzing results"
-                )
+                evaluation.image.number,
+                bypass_cache=bypass_cache,
+                prompt_version=evaluation.prompt_version,
+                progress_callback=report_progress,
+                persist_image=not evaluation.image.content_hash
             )
             
             if result.get('success'):
@@ -618,6 +740,7 @@ async def process_evaluation_background(evaluation_id: int):
                         word_position=word_eval.get('word_position', 0)
                     ))
                 
+                usage = result.get('usage') or {}
                 update_data = crud.EvaluationUpdate(
                     ocr_output=evaluation_data.get('full_text', ''),
                     accuracy=evaluation_data.get('accuracy', 0),
@@ -626,10 +749,25 @@ async def process_evaluation_background(evaluation_id: int):
                     processing_status="success",
                     progress_percentage=100,
                     current_step="Completed",
+                    latency_ms=usage.get('latency_ms'),
+                    ttfb_ms=usage.get('ttfb_ms'),
+                    prompt_tokens=usage.get('prompt_tokens'),
+                    candidates_tokens=usage.get('candidates_tokens'),
+                    cached_tokens=usage.get('cached_tokens'),
+                    cost_estimate=usage.get('cost_estimate'),
+                    retry_count=result.get('retries', 0),
                     word_evaluations=word_evaluations
                 )
                 
                 await crud.update_evaluation(db, evaluation_id, update_data)
+                
+                # Keep the downloaded image in the image store for later runs and /file
+                if not evaluation.image.content_hash:
+                    if result.get('content_hash'):
+                        if await orchestrator.wait_persisted(result['content_hash']):
+                            await crud.attach_image_blob(db, evaluation.image.id, result['content_hash'])
+                    elif result.get('local_image_path'):
+                        await crud.attach_image_file(db, evaluation.image.id, result['local_image_path'])
             else:
                 # Update with error
                 await crud.update_evaluation(
@@ -639,7 +777,8 @@ async def process_evaluation_background(evaluation_id: int):
                         processing_status="failed",
                         progress_percentage=0,
                         current_step="Failed",
-                        error_message=result.get('error', 'Unknown error')
+                        error_message=result.get('error', 'Unknown error'),
+                        retry_count=result.get('retries', 0)
                     )
                 )
         
@@ -762,6 +901,7 @@ async def update_prompt_version(
     version = await crud.update_prompt_version(db, version_id, version_update)
     if not version:
         raise HTTPException(status_code=404, detail="Prompt version not found")
+    invalidate_prompt_registry()
     return version
 
 @app.post("/api/prompt-versions/{version_id}/promote")
@@ -770,6 +910,7 @@ async def promote_prompt_version(version_id: int, db: AsyncSession = Depends(get
     result = await crud.promote_prompt_version(db, version_id)
     if not result:
         raise HTTPException(status_code=404, detail="Prompt version not found")
+    invalidate_prompt_registry()
     return {"message": "Prompt version promoted to production"}
 
 # Evaluation Run endpoints
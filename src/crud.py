@@ -1,8 +1,9 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_, or_, case
 from sqlalchemy.orm import selectinload
 from typing import List, Optional, Dict, Any
+import asyncio
 import json
 import csv
 import os
@@ -12,8 +13,11 @@ from datetime import datetime, timedelta
 
 from .database import (
     Image, Evaluation, WordEvaluation, PromptTemplate,
-    Dataset, PromptFamily, PromptVersion, EvaluationRun, EvaluationRunPrompt, APIKey
+    Dataset, PromptFamily, PromptVersion, EvaluationRun, EvaluationRunPrompt, APIKey,
+    dataset_images
 )
+from .image_store import get_image_store
+from .scoring import transcription_from_evaluations
 from .schemas import (
     ImageCreate, ImageUpdate, EvaluationCreate, EvaluationUpdate,
     PromptTemplateCreate, PromptTemplateUpdate, WordEvaluationCreate,
@@ -25,13 +29,60 @@ from .schemas import (
 )
 
 # Image CRUD operations
+def _reference_blob(db_image: Image, digest: str):
+    """Point an Image row at a stored blob and take a reference on it."""
+    store = get_image_store()
+    store.incref(digest)
+    db_image.content_hash = digest
+    db_image.local_path = str(store.path(digest))
+
+async def _store_image_file(db_image: Image):
+    """
+    Move an Image row's file into the content-addressed image store.
+
+    The original file is removed once stored, local_path is pointed at the
+    stored blob and the blob's reference count is taken for this row. Counts are taken before the row is committed and
+    released after, so a failed commit can leak a blob but never lose one.
+    """
+    if not db_image.local_path or not os.path.isfile(db_image.local_path):
+        return
+    store = get_image_store()
+    digest = store.digest_of(db_image.local_path) or await asyncio.to_thread(store.put_file, db_image.local_path, True)
+    _reference_blob(db_image, digest)
+
 async def create_image(db: AsyncSession, image: ImageCreate) -> Image:
     db_image = Image(**image.dict())
+    await _store_image_file(db_image)
     db.add(db_image)
     await db.commit()
     await db.refresh(db_image)
     return db_image
 
+async def attach_image_file(db: AsyncSession, image_id: int, file_path: str) -> Optional[Image]:
+    """Store a downloaded file for an image that has none in the image store yet."""
+    result = await db.execute(select(Image).where(Image.id == image_id))
+    db_image = result.scalar_one_or_none()
+    if db_image is None or db_image.content_hash:
+        return db_image
+    
+    db_image.local_path = file_path
+    await _store_image_file(db_image)
+    await db.commit()
+    await db.refresh(db_image)
+    return db_image
+
+async def attach_image_blob(db: AsyncSession, image_id: int, content_hash: str) -> Optional[Image]:
+    """Point an image with nothing in the image store yet at an already-stored blob."""
+    result = await db.execute(select(Image).where(Image.id == image_id))
+    db_image = result.scalar_one_or_none()
+    if db_image is None or db_image.content_hash:
+        return db_image
+    
+    _reference_blob(db_image, content_hash)
+    await db.commit()
+    await db.refresh(db_image)
+    return db_image
+
 async def get_image(db: AsyncSession, image_id: int) -> Optional[Image]:
     result = await db.execute(
         select(Image).options(selectinload(Image.evaluations)).where(Image.id == image_id)
@@ -102,12 +153,20 @@ async def update_image(db: AsyncSession, image_id: int, image_update: ImageUpdat
     
     if db_image:
         update_data = image_update.dict(exclude_unset=True)
+        previous_hash = None
+        if 'local_path' in update_data and update_data['local_path'] != db_image.local_path:
+            previous_hash, db_image.content_hash = db_image.content_hash, None
         for field, value in update_data.items():
             setattr(db_image, field, value)
+        if 'local_path' in update_data and db_image.content_hash is None:
+            await _store_image_file(db_image)
         
         db_image.updated_at = datetime.utcnow()
         await db.commit()
         await db.refresh(db_image)
+        
+        if previous_hash:
+            get_image_store().decref(previous_hash)
     
     return db_image
 
@@ -116,8 +175,11 @@ async def delete_image(db: AsyncSession, image_id: int) -> bool:
     db_image = result.scalar_one_or_none()
     
     if db_image:
+        content_hash = db_image.content_hash
         await db.delete(db_image)
         await db.commit()
+        if content_hash:
+            get_image_store().decref(content_hash)
         return True
     return False
 
@@ -337,29 +399,136 @@ async def get_evaluation_stats(db: AsyncSession) -> Dict[str, Any]:
     }
 
 async def get_accuracy_distribution(db: AsyncSession) -> Dict[str, int]:
-    # Get all successful evaluations with accuracy
-    successful_evals = await db.execute(
-        select(Evaluation.accuracy).where(
+    # Bucket in SQL rather than loading every accuracy
+    result = await db.execute(
+        select(
+            func.count(Evaluation.id),
+            func.sum(case((Evaluation.accuracy >= 90, 1), else_=0)),
+            func.sum(case((and_(Evaluation.accuracy >= 70, Evaluation.accuracy < 90), 1), else_=0)),
+            func.sum(case((Evaluation.accuracy < 70, 1), else_=0))
+        ).where(
             and_(
                 Evaluation.processing_status == "success",
                 Evaluation.accuracy.isnot(None)
             )
         )
     )
+    total, high, medium, low = result.one()
     
-    accuracies = [acc for acc, in successful_evals.fetchall()]
+    return {
+        "high_accuracy": high or 0,
+        "medium_accuracy": medium or 0,
+        "low_accuracy": low or 0,
+        "total_processed": total or 0
+    }
+
+def _filter_metric_evaluations(
+    query,
+    evaluation_run_id: Optional[int] = None,
+    dataset_id: Optional[int] = None,
+    prompt_version: Optional[str] = None
+):
+    """Restrict a query to the successful evaluations in a run, dataset or prompt version"""
+    query = query.where(Evaluation.processing_status == "success")
+    if evaluation_run_id is not None:
+        query = query.where(Evaluation.evaluation_run_id == evaluation_run_id)
+    if dataset_id is not None:
+        query = query.where(
+            Evaluation.image_id.in_(
+                select(dataset_images.c.image_id).where(dataset_images.c.dataset_id == dataset_id)
+            )
+        )
+    if prompt_version:
+        query = query.where(Evaluation.prompt_version == prompt_version)
+    return query
+
+async def get_metric_fingerprint(
+    db: AsyncSession,
+    evaluation_run_id: Optional[int] = None,
+    dataset_id: Optional[int] = None,
+    prompt_version: Optional[str] = None
+) -> tuple:
+    """Count and latest update of the evaluations error-rate metrics are computed from"""
+    result = await db.execute(
+        _filter_metric_evaluations(
+            select(func.count(Evaluation.id), func.max(Evaluation.updated_at)),
+            evaluation_run_id, dataset_id, prompt_version
+        )
+    )
+    count, updated_at = result.one()
+    return count, updated_at
+
+async def get_error_rate_inputs(
+    db: AsyncSession,
+    evaluation_run_id: Optional[int] = None,
+    dataset_id: Optional[int] = None,
+    prompt_version: Optional[str] = None
+) -> Dict[str, List]:
+    """Load reference/transcription pairs and per-word match flags for error-rate metrics"""
+    result = await db.execute(
+        _filter_metric_evaluations(
+            select(Image.reference_text, Evaluation.ocr_output, Evaluation.word_evaluations_json)
+            .join(Image, Evaluation.image_id == Image.id),
+            evaluation_run_id, dataset_id, prompt_version
+        )
+    )
     
-    high = len([acc for acc in accuracies if acc >= 90])
-    medium = len([acc for acc in accuracies if 70 <= acc < 90])
-    low = len([acc for acc in accuracies if acc < 70])
+    references, transcriptions, word_matches = [], [], []
+    for reference_text, ocr_output, word_evaluations_json in result.fetchall():
+        word_evaluations = json.loads(word_evaluations_json) if word_evaluations_json else []
+        references.append(reference_text)
+        # Stored word evaluations keep illegible markers that ocr_output drops
+        transcriptions.append(
+            transcription_from_evaluations(word_evaluations) if word_evaluations else ocr_output
+        )
+        word_matches.append([bool(word_eval.get("match")) for word_eval in word_evaluations])
     
     return {
-        "high_accuracy": high,
-        "medium_accuracy": medium,
-        "low_accuracy": low,
-        "total_processed": len(accuracies)
+        "references": references,
+        "transcriptions": transcriptions,
+        "word_matches": word_matches
     }
 
+async def get_ocr_usage_stats(db: AsyncSession, group_by: str = "prompt_version") -> List[Dict[str, Any]]:
+    """Aggregate OCR latency, tokens and cost per prompt version or per evaluation run"""
+    group_column = Evaluation.evaluation_run_id if group_by == "evaluation_run" else Evaluation.prompt_version
+
+    result = await db.execute(
+        select(
+            group_column.label('group'),
+            func.count(Evaluation.id).label('evaluations'),
+            func.avg(Evaluation.latency_ms).label('avg_latency_ms'),
+            func.max(Evaluation.latency_ms).label('max_latency_ms'),
+            func.avg(Evaluation.ttfb_ms).label('avg_ttfb_ms'),
+            func.sum(Evaluation.prompt_tokens).label('prompt_tokens'),
+            func.sum(Evaluation.candidates_tokens).label('candidates_tokens'),
+            func.sum(Evaluation.cached_tokens).label('cached_tokens'),
+            func.sum(Evaluation.cost_estimate).label('total_cost'),
+            func.avg(Evaluation.cost_estimate).label('avg_cost')
+        ).where(
+            and_(
+                group_column.isnot(None),
+                Evaluation.latency_ms.isnot(None)
+            )
+        ).group_by(group_column)
+    )
+
+    return [
+        {
+            "group": str(row.group),
+            "evaluations": row.evaluations,
+            "avg_latency_ms": float(row.avg_latency_ms) if row.avg_latency_ms is not None else None,
+            "max_latency_ms": row.max_latency_ms,
+            "avg_ttfb_ms": float(row.avg_ttfb_ms) if row.avg_ttfb_ms is not None else None,
+            "prompt_tokens": row.prompt_tokens or 0,
+            "candidates_tokens": row.candidates_tokens or 0,
+            "cached_tokens": row.cached_tokens or 0,
+            "total_cost": float(row.total_cost or 0),
+            "avg_cost": float(row.avg_cost) if row.avg_cost is not None else None
+        }
+        for row in result.fetchall()
+    ]
+
 # CSV Import functionality
 async def import_csv_data(db: AsyncSession, csv_file_path: str, overwrite_existing: bool = False) -> Dict[str, Any]:
     """Import data from CSV file into the database"""
@@ -0,0 +1,78 @@
+import csv
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+
+def read_header(path: Union[str, Path]) -> List[str]:
+    """Return the column names from a CSV file's header row."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return next(csv.reader(f), [])
+
+
+def read_rows(path: Union[str, Path]) -> Iterator[Dict]:
+    """Yield the rows of a CSV file one at a time, as dicts keyed by the header."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+class CsvSink:
+    """
+    CSV file written one row at a time under fixed columns.
+
+    Rows go to a .part file next to the target, which replaces the target on
+    commit(), so an interrupted run never leaves a truncated output behind.
+    The file is only created once the first row arrives, unless an
+    empty output is asked for on commit. Columns a row lacks
+    are left empty and keys outside the columns are dropped.
+    """
+
+    def __init__(self, path: Union[str, Path], fieldnames: Sequence[str]):
+        """
+        Args:
+            path: Final CSV path
+            fieldnames: Output columns, in order
+        """
+        self.path = Path(path)
+        self.fieldnames = list(fieldnames)
+        self.rows = 0
+        self._part_path = self.path.with_name(f"{self.path.name}.part")
+        self._file = None
+        self._writer: Optional[csv.DictWriter] = None
+
+    def _open(self):
+        self._file = open(self._part_path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction='ignore')
+        self._writer.writeheader()
+
+    def write(self, row: Dict):
+        """Append one row."""
+        if self._writer is None:
+            self._open()
+        self._writer.writerow(row)
+        self.rows += 1
+
+    def commit(self, keep_empty: bool = False) -> bool:
+        """
+        Move the written rows into place.
+
+        Args:
+            keep_empty: Write a header-only file when no row arrived, so the
+                output exists even for an empty input
+
+        Returns:
+            Whether a file was written
+        """
+        if self._file is None:
+            if not keep_empty:
+                return False
+            self._open()
+        self._file.close()
+        os.replace(self._part_path, self.path)
+        return True
+
+    def close(self):
+        """Drop an uncommitted file."""
+        if self._file is not None and not self._file.closed:
+            self._file.close()
+            self._part_path.unlink(missing_ok=True)
@@ -1,13 +1,18 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Table, JSON
+from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Table, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from datetime import datetime
 import json
 
-DATABASE_URL = "sqlite+aiosqlite:///./ocr_evaluations.db"
+from .db_config import DatabaseSettings, create_database_engine
+from .migrations import apply_migrations
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# URL, SQL echo, pool sizing and SQLite pragmas come from the environment (see db_config)
+database_settings = DatabaseSettings.from_env()
+DATABASE_URL = database_settings.url
+
+engine = create_database_engine(database_settings)
 async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
@@ -16,15 +21,17 @@ Base = declarative_base()
 evaluation_run_datasets = Table(
     'evaluation_run_datasets',
     Base.metadata,
-    Column('evaluation_run_id', Integer, ForeignKey('evaluation_runs.id')),
-    Column('dataset_id', Integer, ForeignKey('datasets.id'))
+    Column('evaluation_run_id', Integer, ForeignKey('evaluation_runs.id'), primary_key=True),
+    Column('dataset_id', Integer, ForeignKey('datasets.id'), primary_key=True),
+    Index('ix_evaluation_run_datasets_dataset_id', 'dataset_id')
 )
 
 dataset_images = Table(
     'dataset_images',
     Base.metadata,
-    Column('dataset_id', Integer, ForeignKey('datasets.id')),
-    Column('image_id', Integer, ForeignKey('images.id'))
+    Column('dataset_id', Integer, ForeignKey('datasets.id'), primary_key=True),
+    Column('image_id', Integer, ForeignKey('images.id'), primary_key=True),
+    Index('ix_dataset_images_image_id', 'image_id')
 )
 
 class Dataset(Base):
@@ -123,6 +130,7 @@ class Image(Base):
     number = Column(String, unique=True, index=True)  # Original image number from CSV
     url = Column(String)
     local_path = Column(String)
+    content_hash = Column(String, index=True, nullable=True)  # SHA-256 of the file in the image store
     reference_text = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -133,6 +141,14 @@ class Image(Base):
 
 class Evaluation(Base):
     __tablename__ = "evaluations"
+    __table_args__ = (
+        # Existing evaluation for an image and prompt version; evaluations of an image
+        Index('ix_evaluations_image_id_prompt_version', 'image_id', 'prompt_version'),
+        # Status counts, active evaluations and per-version accuracy without reading rows
+        Index('ix_evaluations_status_prompt_version', 'processing_status', 'prompt_version', 'accuracy'),
+        Index('ix_evaluations_prompt_version', 'prompt_version'),
+        Index('ix_evaluations_run_id_status', 'evaluation_run_id', 'processing_status'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     image_id = Column(Integer, ForeignKey("images.id"))
@@ -154,7 +170,12 @@ class Evaluation(Base):
     
     # Performance metrics
     latency_ms = Column(Integer, nullable=True)
+    ttfb_ms = Column(Integer, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)
+    candidates_tokens = Column(Integer, nullable=True)
+    cached_tokens = Column(Integer, nullable=True)
     cost_estimate = Column(Float, nullable=True)
+    retry_count = Column(Integer, default=0)  # Download and OCR retries spent on this evaluation
     
     # Store word evaluations as JSON
     word_evaluations_json = Column(Text)  # JSON string of word evaluations
@@ -166,6 +187,9 @@ class Evaluation(Base):
 
 class WordEvaluation(Base):
     __tablename__ = "word_evaluations"
+    __table_args__ = (
+        Index('ix_word_evaluations_evaluation_id', 'evaluation_id', 'word_position'),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     evaluation_id = Column(Integer, ForeignKey("evaluations.id"))
@@ -190,9 +214,10 @@ class PromptTemplate(Base):
     description = Column(Text, nullable=True)
 
 async def init_db():
-    """Initialize the database and create all tables"""
+    """Initialize the database, create all tables and apply pending schema migrations"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(apply_migrations, Base.metadata)
 
 async def get_db():
     """Dependency to get database session"""
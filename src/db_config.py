@@ -0,0 +1,112 @@
+import os
+from typing import Dict, List
+
+from pydantic import BaseModel
+
+DEFAULT_DATABASE_URL = "sqlite+aiosqlite:///./ocr_evaluations.db"
+
+# Async drivers used when a URL names only the database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def normalize_database_url(url: str) -> str:
+    """Add the async driver to a URL without one, e.g. postgresql://... -> postgresql+asyncpg://..."""
+    scheme, separator, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{separator}{rest}"
+
+
+class DatabaseSettings(BaseModel):
+    """Database URL, SQL logging, pool sizing and SQLite pragmas."""
+    url: str = DEFAULT_DATABASE_URL
+    echo: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    # SQLite only; applied to every new connection
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_ms: int = 5000
+    cache_size_kb: int = 64 * 1024
+    mmap_size_mb: int = 256
+
+    @classmethod
+    def from_env(cls) -> "DatabaseSettings":
+        """
+        Read DATABASE_URL, DATABASE_ECHO, DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW,
+        DATABASE_POOL_TIMEOUT, SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS,
+        SQLITE_BUSY_TIMEOUT_MS, SQLITE_CACHE_SIZE_KB and SQLITE_MMAP_SIZE_MB.
+        """
+        return cls(
+            url=normalize_database_url(os.getenv("DATABASE_URL", DEFAULT_DATABASE_URL)),
+            echo=os.getenv("DATABASE_ECHO", "false").lower() in ("1", "true", "yes"),
+            pool_size=int(os.getenv("DATABASE_POOL_SIZE", "5")),
+            max_overflow=int(os.getenv("DATABASE_MAX_OVERFLOW", "10")),
+            pool_timeout=float(os.getenv("DATABASE_POOL_TIMEOUT", "30")),
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+            cache_size_kb=int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024))),
+            mmap_size_mb=int(os.getenv("SQLITE_MMAP_SIZE_MB", "256")),
+        )
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.url.startswith("sqlite")
+
+    def sqlite_pragmas(self) -> List[str]:
+        """PRAGMA statements run on each new SQLite connection."""
+        return [
+            f"PRAGMA journal_mode={self.journal_mode}",
+            f"PRAGMA synchronous={self.synchronous}",
+            f"PRAGMA busy_timeout={self.busy_timeout_ms}",
+            # A negative cache_size is in KiB rather than pages
+            f"PRAGMA cache_size=-{self.cache_size_kb}",
+            f"PRAGMA mmap_size={self.mmap_size_mb * 1024 * 1024}",
+        ]
+
+    def engine_kwargs(self) -> Dict:
+        """Keyword arguments for create_async_engine; pool sizing applies to server databases only."""
+        kwargs: Dict = {"echo": self.echo}
+        if self.is_sqlite:
+            # The driver's own lock wait, before SQLite's busy handler takes over
+            kwargs["connect_args"] = {"timeout": self.busy_timeout_ms / 1000}
+        else:
+            # SQLite keeps SQLAlchemy's default pool, which depending on the version
+            # may not take sizing arguments; its writers queue on the busy timeout
+            kwargs.update(
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_timeout=self.pool_timeout,
+                pool_pre_ping=True,
+            )
+        return kwargs
+
+
+def create_database_engine(settings: DatabaseSettings):
+    """
+    Create the async engine for settings.
+
+    SQLite connections get the configured pragmas as they are opened: WAL lets
+    readers run alongside the single writer, and busy_timeout makes
+    concurrent writers wait their turn instead of failing with "database is
+    locked".
+    """
+    from sqlalchemy import event
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(settings.url, **settings.engine_kwargs())
+    if settings.is_sqlite:
+        pragmas = settings.sqlite_pragmas()
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return engine
@@ -0,0 +1,181 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Optional, Union
+from urllib.parse import urlparse
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff", ".heic"}
+
+
+class DownloadCache:
+    """
+    URL-keyed cache of downloaded images, revalidated with conditional GETs.
+
+    Each URL maps to one file in the cache directory along with the ETag and
+    Last-Modified headers it was served with. Callers send those back as
+    If-None-Match/If-Modified-Since and reuse the file on a 304, so repeat
+    runs only hit the network for validation. Files are evicted least
+    recently used first once their total size exceeds max_bytes.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int = 2048 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            directory: Directory holding cached images and the index
+            max_bytes: Size budget for cached image files
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.directory / "download_cache.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS downloads (
+                url TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_downloads_last_access ON downloads (last_access)"
+        )
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM downloads").fetchone()[0]
+
+        self.stats = {
+            'not_modified': 0,
+            'downloads': 0,
+            'evictions': 0
+        }
+
+    @classmethod
+    def from_env(cls, directory: Union[str, Path]) -> Optional["DownloadCache"]:
+        """
+        Build a cache in directory from environment variables, or return None if disabled.
+
+        IMAGE_CACHE_ENABLED (default "true") and IMAGE_CACHE_MAX_MB (default 2048).
+        """
+        if os.getenv("IMAGE_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(directory, max_bytes=int(os.getenv("IMAGE_CACHE_MAX_MB", "2048")) * 1024 * 1024)
+
+    def _filename(self, url: str) -> str:
+        """Stable file name for a URL, keeping its image extension."""
+        suffix = Path(urlparse(url).path).suffix.lower()
+        if suffix not in IMAGE_EXTENSIONS:
+            suffix = ".jpg"
+        return f"url_{hashlib.sha256(url.encode('utf-8')).hexdigest()[:40]}{suffix}"
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """
+        Conditional request headers for url.
+
+        Returns:
+            If-None-Match/If-Modified-Since headers, or {} if the URL is not
+            cached or its file has gone
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT filename, etag, last_modified FROM downloads WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None or not (self.directory / row[0]).exists():
+            return {}
+
+        headers = {}
+        if row[1]:
+            headers["If-None-Match"] = row[1]
+        if row[2]:
+            headers["If-Modified-Since"] = row[2]
+        return headers
+
+    def not_modified(self, url: str) -> Optional[str]:
+        """
+        Record a 304 for url and return its cached file.
+
+        Returns:
+            Path of the cached image, or None if it was evicted in the meantime
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT filename FROM downloads WHERE url = ?", (url,)).fetchone()
+            if row is None or not (self.directory / row[0]).exists():
+                return None
+            self._conn.execute("UPDATE downloads SET last_access = ? WHERE url = ?", (time.time(), url))
+            self._conn.commit()
+            self.stats['not_modified'] += 1
+        return str(self.directory / row[0])
+
+    def temp_path(self, url: str) -> Path:
+        """Path to stream a new download of url into before store()."""
+        return self.directory / f"{self._filename(url)}.{uuid.uuid4().hex}.part"
+
+    def store(self, url: str, temp_path: Union[str, Path], etag: Optional[str], last_modified: Optional[str]) -> str:
+        """
+        Move a completed download into the cache, evicting old files if over budget.
+
+        Args:
+            url: URL the image was downloaded from
+            temp_path: File written from temp_path(url)
+            etag: ETag response header, if any
+            last_modified: Last-Modified response header, if any
+
+        Returns:
+            Path of the cached image
+        """
+        filename = self._filename(url)
+        path = self.directory / filename
+        os.replace(temp_path, path)
+        size = path.stat().st_size
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM downloads WHERE url = ?", (url,)).fetchone()
+            if previous:
+                self._bytes -= previous[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO downloads (url, filename, etag, last_modified, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, filename, etag, last_modified, size, time.time())
+            )
+            self._bytes += size
+            self.stats['downloads'] += 1
+            self._evict(keep=url)
+            self._conn.commit()
+        return str(path)
+
+    def _evict(self, keep: str):
+        """Delete least recently used files until within max_bytes, sparing the one just stored."""
+        while self._bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT url, filename, size FROM downloads WHERE url != ? ORDER BY last_access LIMIT 100", (keep,)
+            ).fetchall()
+            if not rows:
+                break
+            for url, filename, size in rows:
+                self._conn.execute("DELETE FROM downloads WHERE url = ?", (url,))
+                (self.directory / filename).unlink(missing_ok=True)
+                self._bytes -= size
+                self.stats['evictions'] += 1
+                if self._bytes <= self.max_bytes:
+                    break
+
+    def get_stats(self) -> Dict:
+        """Return revalidation/download counters and the cached size."""
+        with self._lock:
+            return {**self.stats, 'bytes': self._bytes}
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
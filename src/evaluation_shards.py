@@ -0,0 +1,223 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # Optional: only needed for EVALUATION_SHARD_COMPRESSION=zstd
+    zstandard = None
+
+SHARD_PREFIX = "evaluations-"
+
+
+def _decompressor():
+    if zstandard is None:
+        raise RuntimeError("Reading zstd shards requires the zstandard package")
+    return zstandard.ZstdDecompressor()
+
+
+def iter_shard_records(directory: Union[str, Path]) -> Iterator[Dict]:
+    """
+    Yield the records of every evaluation shard in directory, oldest first.
+
+    Reads the shards without opening their index, so it is safe on a
+    directory another process is writing. A line left incomplete by a crash
+    is skipped.
+    """
+    for path in sorted(Path(directory).glob(f"{SHARD_PREFIX}*.jsonl*")):
+        with open(path, 'rb') as raw:
+            if path.name.endswith(".zst"):
+                raw = _decompressor().stream_reader(raw, read_across_frames=True)
+            for line in io.TextIOWrapper(raw, encoding='utf-8', errors='replace'):
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class EvaluationShards:
+    """
+    Append-only store of evaluation records in size-rotated JSONL shards.
+
+    Each record is one compact JSON line appended to the current shard
+    (evaluations-00000.jsonl, evaluations-00001.jsonl, ...); a new shard is
+    started once the current one reaches max_bytes. With zstd compression
+    each record is its own zstd frame, so shards stay valid .jsonl.zst files
+    (zstdcat prints them) while single records can still be decompressed on
+    their own.
+
+    A SQLite index maps image number to shard, offset and length of its
+    latest record, so reading one evaluation back is a lookup and a single
+    seek, however many records the shards hold.
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path] = "evaluations",
+        max_bytes: int = 256 * 1024 * 1024,
+        compression: Optional[str] = None,
+    ):
+        """
+        Initialize the store.
+
+        Args:
+            directory: Directory holding the shards and index.db
+            max_bytes: Shard size at which the next shard is started
+            compression: None for plain JSONL or "zstd"
+        """
+        if compression not in (None, "zstd"):
+            raise ValueError(f"Unsupported evaluation shard compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd shard compression requires the zstandard package")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self._suffix = ".jsonl.zst" if compression else ".jsonl"
+        self._compressor = zstandard.ZstdCompressor() if compression else None
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.directory / "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS records (
+                image_number TEXT PRIMARY KEY,
+                shard TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+        # Continue the newest shard of this format, if it still has room
+        shards = sorted(self.directory.glob(f"{SHARD_PREFIX}*{self._suffix}"))
+        self._shard_number = int(shards[-1].name[len(SHARD_PREFIX):].split(".")[0]) if shards else 0
+        self._file = None
+
+        self.stats = {
+            'records': 0,
+            'bytes': 0,
+            'rotations': 0
+        }
+
+    @classmethod
+    def from_env(cls, directory: Union[str, Path]) -> "EvaluationShards":
+        """
+        Build a store in directory from EVALUATION_SHARD_MAX_MB (default 256)
+        and EVALUATION_SHARD_COMPRESSION ("none", the default, or "zstd").
+        """
+        compression = os.getenv("EVALUATION_SHARD_COMPRESSION", "none").lower()
+        return cls(
+            directory,
+            max_bytes=int(os.getenv("EVALUATION_SHARD_MAX_MB", "256")) * 1024 * 1024,
+            compression=None if compression in ("", "none") else compression,
+        )
+
+    def _shard_name(self, number: int) -> str:
+        return f"{SHARD_PREFIX}{number:05d}{self._suffix}"
+
+    def _open_shard(self):
+        """Open the current shard for appending, moving on to a new one if it is full."""
+        path = self.directory / self._shard_name(self._shard_number)
+        if path.exists() and path.stat().st_size >= self.max_bytes:
+            self._shard_number += 1
+            self.stats['rotations'] += 1
+            path = self.directory / self._shard_name(self._shard_number)
+        self._file = open(path, 'ab')
+        # Append mode does not move the position until the first write
+        self._file.seek(0, io.SEEK_END)
+        if not self.compression and self._file.tell():
+            # Start on a fresh line if a crash left the last one incomplete
+            with open(path, 'rb') as f:
+                f.seek(-1, io.SEEK_END)
+                if f.read(1) != b"\n":
+                    self._file.write(b"\n")
+
+    def _encode(self, record: Dict) -> bytes:
+        data = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+        return self._compressor.compress(data) if self._compressor else data
+
+    def append(self, image_number: str, record: Dict) -> str:
+        """
+        Append a record and point the index at it.
+
+        An image evaluated again keeps its earlier record in the shard, but
+        read() returns the latest one.
+
+        Args:
+            image_number: The image's number (CSV '#' column)
+            record: JSON-serializable evaluation record
+
+        Returns:
+            Location of the record as "<shard>:<offset>"
+        """
+        data = self._encode(record)
+        with self._lock:
+            if self._file is None:
+                self._open_shard()
+            elif self._file.tell() >= self.max_bytes:
+                self._file.close()
+                self._shard_number += 1
+                self.stats['rotations'] += 1
+                self._open_shard()
+
+            shard = Path(self._file.name).name
+            offset = self._file.tell()
+            self._file.write(data)
+            self._file.flush()
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO records (image_number, shard, offset, length, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (image_number, shard, offset, len(data), time.time())
+            )
+            self._conn.commit()
+            self.stats['records'] += 1
+            self.stats['bytes'] += len(data)
+        return f"{shard}:{offset}"
+
+    def _decode(self, shard: str, data: bytes) -> Dict:
+        if shard.endswith(".zst"):
+            data = _decompressor().decompress(data)
+        return json.loads(data)
+
+    def read(self, image_number: str) -> Optional[Dict]:
+        """Return the latest record for an image, or None if it has none."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT shard, offset, length FROM records WHERE image_number = ?", (image_number,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        shard, offset, length = row
+        with open(self.directory / shard, 'rb') as f:
+            f.seek(offset)
+            return self._decode(shard, f.read(length))
+
+    def iter_records(self) -> Iterator[Dict]:
+        """Yield every record of every shard, oldest first, including superseded ones."""
+        return iter_shard_records(self.directory)
+
+    def get_stats(self) -> Dict:
+        """Return append counters and the number of indexed images."""
+        with self._lock:
+            images = self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+            return {**self.stats, 'images': images, 'shard': self._shard_name(self._shard_number)}
+
+    def close(self):
+        """Close the open shard and the index."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self._conn.close()
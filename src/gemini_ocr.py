@@ -1,19 +1,37 @@
+import asyncio
 import json
 import os
+import time
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
 import PIL.Image
 from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 from google.genai.errors import APIError
-from io import BytesIO
 from pydantic import BaseModel, Field
 
+from src.hedging import DeadlineExceeded, HedgePolicy
+from src.image_store import ImageBytes
+from src.json_stream import JsonArrayStreamParser
+from src.ocr_backends import OcrBackend, create_backend
+from src.ocr_cache import OcrResultCache, hash_image
+from src.ocr_executor import OcrExecutor
+from src.ocr_usage import OcrUsage
+from src.prompt_registry import (
+    DEFAULT_OCR_PROMPT as OCR_PROMPT,
+    OUTPUT_TRANSCRIPTION,
+    CompiledPrompt,
+    PromptRegistry,
+)
+from src.rate_limiter import AimdConcurrencyController, RateLimiter, get_shared_rate_limiter
+from src.retry_policy import is_retryable
+from src.scoring import score_transcription
+
 # Load environment variables
 load_dotenv()
 
+T = TypeVar("T")
+
 class WordEvaluation(BaseModel):
     """Model for word-level evaluation results."""
     reference_word: str
@@ -24,231 +42,610 @@ class WordEvaluation(BaseModel):
 class GeminiOCR:
     """A class to handle OCR operations using Google's Gemini API."""
     
-    def __init__(self, timeout: int = 60):
+    def __init__(
+        self,
+        timeout: int = 60,
+        max_concurrency: Optional[int] = None,
+        cache: Optional[OcrResultCache] = None,
+        backend: Optional[OcrBackend] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        prompt_registry: Optional[PromptRegistry] = None,
+        hedge_policy: Optional[HedgePolicy] = None,
+        executor: Optional[OcrExecutor] = None,
+        stream_hedge_policy: Optional[HedgePolicy] = None,
+    ):
         """
         Initialize the Gemini OCR client.
         
         Args:
             timeout: Timeout in seconds for API calls
+            max_concurrency: Maximum number of async OCR calls in flight at once.
+                Defaults to the GEMINI_MAX_CONCURRENCY environment variable, or 100.
+            cache: Result cache placed in front of the API. Defaults to one built
+                from the OCR_CACHE_* environment variables.
+            backend: Model backend to call. Defaults to the one selected by the
+                OCR_BACKEND environment variable (see create_backend).
+            rate_limiter: Requests/tokens per minute limiter. Defaults to the
+                process-wide limiter configured by GEMINI_RPM and GEMINI_TPM.
+            prompt_registry: Source of compiled prompt versions. Defaults to an
+                empty registry, which serves the built-in prompt.
+            hedge_policy: Deadline and hedging policy for non-streaming calls. Defaults
+                to one built from the OCR_HEDGE_* variables, with OCR_DEADLINE_SECONDS
+                falling back to timeout.
+            executor: Pool for the blocking parts of async calls (image hashing, cache
+                lookups, response parsing), also given to the default backend for its
+                image encoding. Without one they run on the event loop.
+            stream_hedge_policy: Deadline and hedging policy for streaming calls, which
+                hedge on time to first chunk. Defaults to one built like hedge_policy.
         """
         self.timeout = timeout
-        self.client = genai.Client(
-            api_key=os.getenv("GOOGLE_API_KEY"),
-            http_options={"timeout": timeout * 1000}
+        self.backend = backend if backend is not None else create_backend(timeout, executor)
+        self.model = self.backend.model
+        self.max_concurrency = max_concurrency or int(os.getenv("GEMINI_MAX_CONCURRENCY", "100"))
+        
+        self.cache = cache if cache is not None else OcrResultCache.from_env()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else get_shared_rate_limiter()
+        self.prompts = prompt_registry if prompt_registry is not None else PromptRegistry()
+        self.hedging = hedge_policy if hedge_policy is not None else HedgePolicy.from_env(default_deadline=timeout)
+        # Streams are hedged on time to first chunk, so they keep their own latency window
+        self.stream_hedging = (
+            stream_hedge_policy if stream_hedge_policy is not None
+            else HedgePolicy.from_env(default_deadline=timeout)
         )
+        self.executor = executor
         
-        if not os.getenv("GOOGLE_API_KEY"):
-            raise ValueError("GOOGLE_API_KEY environment variable is not set")
+        # Backs off on 429/503 and ramps back up to max_concurrency
+        self.governor = AimdConcurrencyController(max_limit=self.max_concurrency)
     
-    def _process_image(self, image: Union[PIL.Image.Image, str, Path]) -> types.Part:
+    @staticmethod
+    def _validate_image(image: Union[PIL.Image.Image, ImageBytes, str, Path]):
         """
-        Process an image into a format suitable for the Gemini API.
+        Check that an image can be sent to the backend.
         
         Args:
-            image: Can be a PIL Image, file path (str or Path)
-            
-        Returns:
-            Processed image part for Gemini API
+            image: Can be a PIL Image, in-memory ImageBytes or a file path (str or Path)
         """
-        if isinstance(image, PIL.Image.Image):
-            # Handle PIL Image - convert to bytes
-            image_bytes = BytesIO()
-            image.save(image_bytes, format="WEBP")
-            return types.Part.from_bytes(
-                data=image_bytes.getvalue(),
-                mime_type="image/webp"
-            )
+        if isinstance(image, (PIL.Image.Image, ImageBytes)):
+            return
         elif isinstance(image, (str, Path)):
-            # Handle file path
             file_path = str(image)
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"File not found: {file_path}")
-            
-            # Upload file to Gemini
-            return self.client.files.upload(file=file_path)
         else:
             raise ValueError(
                 f"Unsupported image type: {type(image)}. "
-                "Supported types: PIL.Image.Image, str, Path"
+                "Supported types: PIL.Image.Image, ImageBytes, str, Path"
             )
     
+    def _build_prompt(
+        self,
+        reference_text: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+    ) -> Tuple[CompiledPrompt, str]:
+        """Return the compiled prompt to use and its rendered per-image suffix."""
+        compiled = self.prompts.get(prompt_version)
+        return compiled, compiled.render(reference_text)
+    
+    @staticmethod
+    def _parse_output(
+        output: str,
+        compiled: Optional[CompiledPrompt] = None,
+        reference_text: Optional[str] = None,
+    ) -> Dict:
+        """
+        Parse the model's JSON output into word evaluations and accuracy metrics.
+        
+        Prompts that only ask for a transcription are scored locally against
+        the reference text (see src.scoring).
+        
+        Args:
+            output: Raw JSON text returned by the model
+            compiled: Prompt the output was produced with
+            reference_text: Reference text the image is scored against
+            
+        Returns:
+            Dict containing the extracted text and evaluation results
+        """
+        if compiled is not None and compiled.output_format == OUTPUT_TRANSCRIPTION:
+            return GeminiOCR._score_transcription_output(output, reference_text)
+        
+        evaluations = json.loads(output)
+        
+        # Validate evaluations against our schema
+        word_evaluations = [WordEvaluation(**eval_data) for eval_data in evaluations]
+        
+        return GeminiOCR.summarize_evaluations(word_evaluations)
+    
+    @staticmethod
+    def _score_transcription_output(output: str, reference_text: Optional[str]) -> Dict:
+        """Score a {"transcription": ...} response against the reference text."""
+        data = json.loads(output)
+        if not isinstance(data, dict) or "transcription" not in data:
+            raise ValueError("Expected a JSON object with a 'transcription' field")
+        
+        result = score_transcription(reference_text, data["transcription"])
+        # Validate evaluations against our schema
+        result["evaluations"] = [WordEvaluation(**eval_data).dict() for eval_data in result["evaluations"]]
+        return result
+    
+    @staticmethod
+    def summarize_evaluations(word_evaluations: List[WordEvaluation]) -> Dict:
+        """
+        Build the result dict (full text and accuracy metrics) from word evaluations.
+        
+        Args:
+            word_evaluations: Validated word-level evaluations
+            
+        Returns:
+            Dict containing the extracted text and evaluation results
+        """
+        # Construct the full text from transcribed words
+        transcribed_words = []
+        for eval in word_evaluations:
+            if eval.transcribed_word and eval.transcribed_word != "[illegible]":
+                transcribed_words.append(eval.transcribed_word)
+        
+        full_text = " ".join(transcribed_words)
+        
+        # Calculate accuracy metrics
+        total_words = len(word_evaluations)
+        correct_words = sum(1 for eval in word_evaluations if eval.match)
+        accuracy = (correct_words / total_words) * 100 if total_words > 0 else 0
+        
+        return {
+            "full_text": full_text,
+            "evaluations": [eval.dict() for eval in word_evaluations],
+            "accuracy": accuracy,
+            "correct_words": correct_words,
+            "total_words": total_words
+        }
+    
+    @staticmethod
+    def _estimate_tokens(compiled: CompiledPrompt, prompt: str, reference_text: Optional[str]) -> int:
+        """
+        Rough token estimate for one request, used to pace the tokens/min quota.
+        
+        Counts the instructions and prompt at ~3 characters per token, a fixed
+        258 tokens for the image and ~60 output tokens per reference word for
+        the JSON evaluation.
+        """
+        reference_words = len((reference_text or "").split())
+        return (len(compiled.instructions) + len(prompt)) // 3 + 258 + 60 * reference_words
+    
+    def _cache_key(
+        self,
+        image: Union[PIL.Image.Image, ImageBytes, str, Path],
+        compiled: CompiledPrompt,
+        prompt: str,
+        reference_text: Optional[str],
+    ) -> str:
+        """Build the result cache key for an image/prompt/model/reference combination."""
+        return OcrResultCache.make_key(
+            hash_image(image), f"{compiled.prefix_hash}\n{prompt}", self.model, reference_text
+        )
+    
+    @staticmethod
+    def _elapsed_ms(started: float) -> int:
+        return int((time.perf_counter() - started) * 1000)
+    
+    def _finish_usage(self, usage: OcrUsage, call_started: float, estimated_tokens: int):
+        """Fill in latency and cost once a call completes and correct the token bucket."""
+        usage.latency_ms = self._elapsed_ms(call_started)
+        if usage.ttfb_ms is None:
+            # A non-streaming response arrives all at once
+            usage.ttfb_ms = usage.latency_ms
+        usage.compute_cost()
+        if usage.total_tokens:
+            self.rate_limiter.record_usage(estimated_tokens, usage.total_tokens)
+    
+    def _admit_blocking_hedge(self, estimated_tokens: int) -> bool:
+        """
+        Admit a blocking hedge if both a concurrency slot and the quota have room right now.
+        
+        The hedge holds its own slot, released by the attempt when it ends, so
+        whichever attempt loses still counts towards the AIMD limit while it runs.
+        """
+        if not self.governor.try_acquire():
+            return False
+        if not self.rate_limiter.try_acquire(estimated_tokens):
+            self.governor.release()
+            return False
+        return True
+    
+    def _record_losing_attempt(self, estimated_tokens: int) -> Callable[[Tuple[str, OcrUsage]], None]:
+        """Callback correcting the token bucket with a blocking loser's real usage once it ends."""
+        def record(result: Tuple[str, OcrUsage]):
+            _, loser_usage = result
+            if loser_usage.total_tokens:
+                self.rate_limiter.record_usage(estimated_tokens, loser_usage.total_tokens)
+        return record
+    
+    def _generate(
+        self,
+        image: Union[PIL.Image.Image, ImageBytes, str, Path],
+        compiled: CompiledPrompt,
+        prompt: str,
+        reference_text: Optional[str],
+        usage: OcrUsage,
+        estimated_tokens: int,
+        deadline: Optional[float],
+    ) -> str:
+        """
+        Call the backend under the hedge policy, keeping the winning attempt's usage.
+        
+        A blocking attempt cannot be cancelled, so each one holds a governor
+        slot until it ends: the primary the slot extract_text took for the
+        call, a hedge the one taken when it was admitted. A loser's tokens
+        correct the token bucket once it finishes.
+        """
+        def attempt(hedge: bool):
+            try:
+                attempt_usage = OcrUsage(model=self.model)
+                output = self.backend.generate(
+                    image, prompt, reference_text, instructions=compiled.instructions, usage=attempt_usage
+                )
+                return output, attempt_usage
+            finally:
+                self.governor.release()
+        
+        (output, attempt_usage), usage.hedged = self.hedging.run(
+            attempt, deadline,
+            admit_hedge=lambda: self._admit_blocking_hedge(estimated_tokens),
+            on_loser=self._record_losing_attempt(estimated_tokens)
+        )
+        usage.copy_tokens_from(attempt_usage)
+        return output
+    
+    async def _generate_async(
+        self,
+        image: Union[PIL.Image.Image, ImageBytes, str, Path],
+        compiled: CompiledPrompt,
+        prompt: str,
+        reference_text: Optional[str],
+        usage: OcrUsage,
+        estimated_tokens: int,
+        deadline: Optional[float],
+    ) -> str:
+        """
+        Async variant of _generate; the losing attempt is cancelled.
+        
+        Both attempts run inside the call's governor slot. A cancelled hedge
+        stays charged its estimate in the token bucket, since it may have been
+        billed for its input.
+        """
+        async def attempt(hedge: bool):
+            attempt_usage = OcrUsage(model=self.model)
+            output = await self.backend.generate_async(
+                image, prompt, reference_text, instructions=compiled.instructions, usage=attempt_usage
+            )
+            return output, attempt_usage
+        
+        # A hedge is a real request; only send it if the quota has room right now
+        (output, attempt_usage), usage.hedged = await self.hedging.run_async(
+            attempt, deadline, admit_hedge=lambda: self.rate_limiter.try_acquire(estimated_tokens)
+        )
+        usage.copy_tokens_from(attempt_usage)
+        return output
+    
     def extract_text(
         self,
-        image: Union[PIL.Image.Image, str, Path],
+        image: Union[PIL.Image.Image, ImageBytes, str, Path],
         reference_text: Optional[str] = None,
+        bypass_cache: bool = False,
+        prompt_version: Optional[str] = None,
+        deadline: Optional[float] = None,
     ) -> Dict:
         """
         Extract text from an image using Gemini API and evaluate against reference text if provided.
         
         Args:
-            image: The image to process (PIL Image or file path)
+            image: The image to process (PIL Image, ImageBytes or file path)
             reference_text: Optional reference text to compare against
+            bypass_cache: Skip the result cache lookup and always call the API
+            prompt_version: PromptVersion to use, defaults to the production prompt
+            deadline: Seconds allowed for the call including any hedge, defaults to
+                the hedge policy's deadline
             
         Returns:
-            Dict containing the extracted text and evaluation results
+            Dict containing the extracted text, evaluation results and the call's usage,
+            or {"error": message, "retryable": bool} if the call failed
         """
-        # Process the image
-        media_part = self._process_image(image)
+        self._validate_image(image)
+        compiled, prompt = self._build_prompt(reference_text, prompt_version)
         
-        # Use the exact prompt provided
-        prompt = """
-You are an AI assistant specialized in Optical Character Recognition (OCR) and text comparison for handwritten Hindi. You will be provided with an image containing handwritten Hindi text and a corresponding reference Hindi text that the handwriting is supposed to match.
-
-Your task is to:
-1.  **Transcribe:** Accurately transcribe the Hindi words from the provided image. Focus exclusively on Hindi script and words. Ignore any non-Hindi elements.
-2.  **Tokenize:** Internally, split both the reference text and your transcribed text into individual words. Word boundaries are typically defined by spaces.
-3.  **Compare and Evaluate:** Perform a word-by-word comparison of your transcribed text against the reference text. Your output should be a detailed evaluation for each word based on the sequence in the reference text.
-
-**Input Provided to You:**
-*   An image containing the handwritten Hindi text.
-*   A string containing the reference Hindi text (this is the ground truth the student was asked to write).
-
-**Output Format (Mandatory):**
-You must produce a JSON list of objects. Each object in the list represents the evaluation of a single word from the reference text, in the order they appear. Each object must contain the following keys:
-
-*   `reference_word` (string): The word from the reference text.
-*   `transcribed_word` (string/null): The corresponding word or segment transcribed from the image.
-    *   If a directly corresponding word is found, provide it.
-    *   If the word seems to be part of a merged segment in the transcription (e.g., reference "मत कर" transcribed as "मतकर"), this field might show the merged segment for both reference words involved.
-    *   If the word from the reference is entirely missing in the transcription, use `null` or an empty string for this field.
-    *   If a word in the image is completely illegible, you can represent it as `"[illegible]"`.
-*   `match` (boolean): `true` if the `transcribed_word` (or the relevant part of it) is an exact character-by-character match with the `reference_word` (including all matras and conjunct characters). `false` otherwise.
-*   `reason_diff` (string):
-    *   If `match` is `true`, this field can be an empty string or a brief confirmation like "Exact match."
-    *   If `match` is `false`, provide a concise explanation of the mismatch. Examples include:
-        *   "Spelling error: Transcribed '[transcribed]' vs reference '[reference]' (e.g., incorrect matra, different character)."
-        *   "Missing matra: e.g., 'ा' missing in '[transcribed]'."
-        *   "Extra character: e.g., additional 'र्' in '[transcribed]'."
-        *   "Word missing: Reference word '[reference]' not found in transcription at this position."
-        *   "Segmentation error: Reference '[reference]' appears merged in transcription (e.g., as part of '[merged_transcribed_segment]')."
-        *   "Segmentation error: Reference '[reference]' appears split in transcription."
-        *   "Illegible word in transcription."
-
-**Detailed Instructions for Comparison and Evaluation:**
-*   **Sequential Evaluation:** Iterate through the words of the reference text in order. For each `reference_word`, identify its corresponding counterpart(s) or absence in your transcribed text.
-*   **Accuracy:** The comparison must be exact. Differences in matras (vowel signs), anusvara, visarga, chandrabindu, and base characters constitute a mismatch.
-*   **Word Segmentation:**
-    *   If the student merges words that are separate in the reference (e.g., reference "मत कर", transcribed "मतकर"), then for `reference_word: "मत"`, the `transcribed_word` could be "मतकर", `match: false`, and `reason_diff` should explain the merge. Similarly for `reference_word: "कर"`.
-    *   If the student splits a word that is single in the reference, adapt the `reason_diff` accordingly.
-*   **Missing/Extra Words:**
-    *   If a reference word is missing from the transcription, indicate this clearly.
-    *   If the transcription contains extra words not present in the reference text, these should ideally be noted after all reference words have been evaluated, perhaps as additional entries with `reference_word: null` or by detailing them in the `reason_diff` of a nearby word if they disrupt the alignment significantly. For simplicity, prioritize evaluating against the reference words first.
-
-**Example (Conceptual):**
-If Reference Text is: `हर पल`
-And Transcribed Text from image is: `हर पल`
-Output:
-```json
-[
-  {
-    "reference_word": "हर",
-    "transcribed_word": "हर",
-    "match": true,
-    "reason_diff": "Exact match."
-  },
-  {
-    "reference_word": "पल",
-    "transcribed_word": "पल",
-    "match": true,
-    "reason_diff": "Exact match."
-  }
-]
-```
-
-If Reference Text is: लड़ाई
-And Transcribed Text from image is: लड़ई
-Output:
-```json
-[
-  {
-    "reference_word": "लड़ाई",
-    "transcribed_word": "लड़ई",
-    "match": false,
-    "reason_diff": "Spelling error: Transcribed 'लड़ई' is missing the 'ा' (aa) matra found in 'लड़ाई'."
-  }
-]
-```
-
-If Reference Text is: उस तट पर
-And Transcribed Text from image is: उस पर (student missed "तट")
-Output:
-```json
-[
-  {
-    "reference_word": "उस",
-    "transcribed_word": "उस",
-    "match": true,
-    "reason_diff": "Exact match."
-  },
-  {
-    "reference_word": "तट",
-    "transcribed_word": null,
-    "match": false,
-    "reason_diff": "Word missing: Reference word 'तट' not found in transcription at this position."
-  },
-  {
-    "reference_word": "पर",
-    "transcribed_word": "पर",
-    "match": true,
-    "reason_diff": "Exact match."
-  }
-]
-```
-
-Begin by transcribing the provided image, then proceed to the word-by-word evaluation against the reference text, structuring your final output strictly in the JSON format specified.
-"""
+        usage = OcrUsage(model=self.model)
+        started = time.perf_counter()
         
-        if reference_text:
-            prompt = f"Reference Text: {reference_text}\n\n{prompt}"
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self._cache_key(image, compiled, prompt, reference_text)
+            if not bypass_cache:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    usage.cache_hit = True
+                    self._finish_usage(usage, started, 0)
+                    return {**cached, "usage": usage.dict()}
         
+        estimated_tokens = self._estimate_tokens(compiled, prompt, reference_text)
+        # The primary attempt releases this slot when it ends, see _generate
+        self.governor.acquire()
+        self.rate_limiter.acquire(estimated_tokens)
+        usage.queue_ms = self._elapsed_ms(started)
+        call_started = time.perf_counter()
         try:
-            # Prepare configuration
-            config = {
-                "temperature": 0,
-                "response_mime_type": "application/json",
-            }
-            
             # Make the API call
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-exp",
-                contents=[media_part, prompt],
-                config=config,
+            output = self._generate(
+                image, compiled, prompt, reference_text, usage, estimated_tokens, deadline
             )
+            self.governor.record(None)
+            self._finish_usage(usage, call_started, estimated_tokens)
             
-            # Extract and parse the response
-            output = response.candidates[0].content.parts[0].text
-            evaluations = json.loads(output)
-            
-            # Validate evaluations against our schema
-            word_evaluations = [WordEvaluation(**eval_data) for eval_data in evaluations]
+            # Parse the response
+            result = self._parse_output(output, compiled, reference_text)
             
-            # Construct the full text from transcribed words
-            transcribed_words = []
-            for eval in word_evaluations:
-                if eval.transcribed_word and eval.transcribed_word != "[illegible]":
-                    transcribed_words.append(eval.transcribed_word)
-            
-            full_text = " ".join(transcribed_words)
-            
-            # Calculate accuracy metrics
-            total_words = len(word_evaluations)
-            correct_words = sum(1 for eval in word_evaluations if eval.match)
-            accuracy = (correct_words / total_words) * 100 if total_words > 0 else 0
-            
-            return {
-                "full_text": full_text,
-                "evaluations": [eval.dict() for eval in word_evaluations],
-                "accuracy": accuracy,
-                "correct_words": correct_words,
-                "total_words": total_words
-            }
+            if cache_key is not None:
+                self.cache.put(cache_key, result)
+            return {**result, "usage": usage.dict()}
             
         except APIError as e:
+            self.governor.record(e)
             print(f"Error calling Gemini API: {e}")
-            return {"error": str(e)}
+            return {"error": str(e), "retryable": is_retryable(e)}
+        except DeadlineExceeded as e:
+            print(f"Deadline exceeded: {e}")
+            return {"error": str(e), "retryable": is_retryable(e)}
         except Exception as e:
             print(f"Unexpected error: {e}")
-            return {"error": str(e)}
+            return {"error": str(e), "retryable": is_retryable(e)}
+    
+    async def _run_blocking(self, fn: Callable[..., T], *args) -> T:
+        """Run blocking work of an async call on the executor, or inline without one."""
+        if self.executor is None:
+            return fn(*args)
+        return await self.executor.run(fn, *args)
+    
+    async def extract_text_async(
+        self,
+        image: Union[PIL.Image.Image, ImageBytes, str, Path],
+        reference_text: Optional[str] = None,
+        bypass_cache: bool = False,
+        prompt_version: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> Dict:
+        """
+        Async variant of extract_text built on the backend's native async client.
+        
+        No thread is held while the request is in flight. The number of calls
+        in flight adapts between 1 and max_concurrency as the API reports 429/503.
+        
+        Args:
+            image: The image to process (PIL Image, ImageBytes or file path)
+            reference_text: Optional reference text to compare against
+            bypass_cache: Skip the result cache lookup and always call the API
+            prompt_version: PromptVersion to use, defaults to the production prompt
+            deadline: Seconds allowed for the call including any hedge, defaults to
+                the hedge policy's deadline
+            
+        Returns:
+            Dict containing the extracted text, evaluation results and the call's usage,
+            or {"error": message, "retryable": bool} if the call failed
+        """
+        self._validate_image(image)
+        compiled, prompt = self._build_prompt(reference_text, prompt_version)
+        
+        usage = OcrUsage(model=self.model)
+        started = time.perf_counter()
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = await self._run_blocking(self._cache_key, image, compiled, prompt, reference_text)
+            if not bypass_cache:
+                cached = await self._run_blocking(self.cache.get, cache_key)
+                if cached is not None:
+                    usage.cache_hit = True
+                    self._finish_usage(usage, started, 0)
+                    return {**cached, "usage": usage.dict()}
+        
+        estimated_tokens = self._estimate_tokens(compiled, prompt, reference_text)
+        async with self.governor.slot_async():
+            await self.rate_limiter.acquire_async(estimated_tokens)
+            usage.queue_ms = self._elapsed_ms(started)
+            call_started = time.perf_counter()
+            try:
+                # Make the API call
+                output = await self._generate_async(
+                    image, compiled, prompt, reference_text, usage, estimated_tokens, deadline
+                )
+                self.governor.record(None)
+                self._finish_usage(usage, call_started, estimated_tokens)
+                
+                # Parse the response
+                result = await self._run_blocking(self._parse_output, output, compiled, reference_text)
+                
+                if cache_key is not None:
+                    await self._run_blocking(self.cache.put, cache_key, result)
+                return {**result, "usage": usage.dict()}
+                
+            except APIError as e:
+                self.governor.record(e)
+                print(f"Error calling Gemini API: {e}")
+                return {"error": str(e), "retryable": is_retryable(e)}
+            except DeadlineExceeded as e:
+                print(f"Deadline exceeded: {e}")
+                return {"error": str(e), "retryable": is_retryable(e)}
+            except Exception as e:
+                print(f"Unexpected error: {e}")
+                return {"error": str(e), "retryable": is_retryable(e)}
+    
+    async def extract_text_stream(
+        self,
+        image: Union[PIL.Image.Image, ImageBytes, str, Path],
+        reference_text: Optional[str] = None,
+        bypass_cache: bool = False,
+        prompt_version: Optional[str] = None,
+        usage: Optional[OcrUsage] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[WordEvaluation]:
+        """
+        Stream word evaluations as the model produces them.
+        
+        The JSON array is parsed incrementally, so each WordEvaluation is yielded
+        as soon as its object is complete rather than after the whole response.
+        Pass the collected evaluations to summarize_evaluations for the usual
+        result dict. Unlike extract_text_async, API errors are raised.
+        
+        Transcription-only prompts cannot be scored until the whole
+        transcription has arrived, so their evaluations are yielded together
+        at the end of the stream.
+        
+        The deadline covers the whole stream. A stream whose first chunk is
+        slower than usual gets one duplicate request under stream_hedging, and
+        whichever delivers a chunk first is read to the end; the other is
+        cancelled, so its usage (only reported at the end of a stream) is not
+        counted.
+        
+        Args:
+            image: The image to process (PIL Image, ImageBytes or file path)
+            reference_text: Optional reference text to compare against
+            bypass_cache: Skip the result cache lookup and always call the API
+            prompt_version: PromptVersion to use, defaults to the production prompt
+            usage: Optional record filled in with the call's timing, tokens and cost
+            deadline: Seconds allowed for the whole stream including any hedge,
+                defaults to the stream hedge policy's deadline
+            
+        Yields:
+            WordEvaluation objects in reference order
+            
+        Raises:
+            DeadlineExceeded: If the stream has not finished by the deadline
+        """
+        self._validate_image(image)
+        compiled, prompt = self._build_prompt(reference_text, prompt_version)
+        
+        if usage is None:
+            usage = OcrUsage(model=self.model)
+        started = time.perf_counter()
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = await self._run_blocking(self._cache_key, image, compiled, prompt, reference_text)
+            if not bypass_cache:
+                cached = await self._run_blocking(self.cache.get, cache_key)
+                if cached is not None:
+                    usage.cache_hit = True
+                    self._finish_usage(usage, started, 0)
+                    for eval_data in cached["evaluations"]:
+                        yield WordEvaluation(**eval_data)
+                    return
+        
+        word_evaluations = []
+        estimated_tokens = self._estimate_tokens(compiled, prompt, reference_text)
+        async with self.governor.slot_async():
+            await self.rate_limiter.acquire_async(estimated_tokens)
+            usage.queue_ms = self._elapsed_ms(started)
+            call_started = time.perf_counter()
+            parser = JsonArrayStreamParser()
+            transcribing = compiled.output_format == OUTPUT_TRANSCRIPTION
+            chunks = []
+            try:
+                stream, attempt_usage = await self._open_stream(
+                    image, compiled, prompt, reference_text, usage, estimated_tokens, deadline
+                )
+                usage.ttfb_ms = self._elapsed_ms(call_started)
+                async for chunk in stream:
+                    if transcribing:
+                        chunks.append(chunk)
+                        continue
+                    for eval_data in parser.feed(chunk):
+                        word_evaluation = WordEvaluation(**eval_data)
+                        word_evaluations.append(word_evaluation)
+                        yield word_evaluation
+            except APIError as e:
+                self.governor.record(e)
+                raise
+            self.governor.record(None)
+            usage.copy_tokens_from(attempt_usage)
+            self._finish_usage(usage, call_started, estimated_tokens)
+        
+        if transcribing:
+            result = await self._run_blocking(self._score_transcription_output, "".join(chunks), reference_text)
+            for eval_data in result["evaluations"]:
+                yield WordEvaluation(**eval_data)
+        else:
+            if not parser.done:
+                raise ValueError("Streamed OCR output ended before the JSON array was closed")
+            result = self.summarize_evaluations(word_evaluations)
+        
+        if cache_key is not None:
+            await self._run_blocking(self.cache.put, cache_key, result)
+    
+    async def _open_stream(
+        self,
+        image: Union[PIL.Image.Image, ImageBytes, str, Path],
+        compiled: CompiledPrompt,
+        prompt: str,
+        reference_text: Optional[str],
+        usage: OcrUsage,
+        estimated_tokens: int,
+        deadline: Optional[float],
+    ) -> Tuple[AsyncIterator[str], OcrUsage]:
+        """
+        Start a streaming call, hedged on time to first chunk.
+        
+        Returns:
+            The winning stream's chunks, ending by the deadline, and the usage
+            record its backend fills in
+        """
+        deadline = deadline if deadline is not None else self.stream_hedging.deadline_seconds
+        deadline_at = time.monotonic() + deadline if deadline else None
+        
+        async def attempt(hedge: bool):
+            attempt_usage = OcrUsage(model=self.model)
+            stream = self.backend.generate_stream_async(
+                image, prompt, reference_text, instructions=compiled.instructions, usage=attempt_usage
+            )
+            try:
+                first_chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                first_chunk = None
+            return stream, first_chunk, attempt_usage
+        
+        (stream, first_chunk, attempt_usage), usage.hedged = await self.stream_hedging.run_async(
+            attempt, deadline, admit_hedge=lambda: self.rate_limiter.try_acquire(estimated_tokens)
+        )
+        
+        async def chunks() -> AsyncIterator[str]:
+            if first_chunk is None:
+                return
+            yield first_chunk
+            while True:
+                timeout = None if deadline_at is None else max(deadline_at - time.monotonic(), 0)
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+                except StopAsyncIteration:
+                    return
+                except asyncio.TimeoutError:
+                    await stream.aclose()
+                    self.stream_hedging.deadline_exceeded(deadline)
+                yield chunk
+        
+        return chunks(), attempt_usage
+    
+    def close(self):
+        """Release backend resources such as uploaded files."""
+        self.hedging.close()
+        self.stream_hedging.close()
+        close = getattr(self.backend, "close", None)
+        if close is not None:
+            close()
+    
+    async def aclose(self):
+        """Async variant of close."""
+        self.hedging.close()
+        self.stream_hedging.close()
+        aclose = getattr(self.backend, "aclose", None)
+        if aclose is not None:
+            await aclose()
 
 def main():
     """Example usage of the GeminiOCR class."""
@@ -0,0 +1,326 @@
+import asyncio
+import concurrent.futures
+import math
+import os
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when an OCR call (including any hedge) misses its deadline."""
+
+
+class LatencyTracker:
+    """Thread-safe rolling window of latencies with percentile queries."""
+
+    def __init__(self, window: int = 1000):
+        """
+        Initialize the tracker.
+
+        Args:
+            window: Number of most recent samples kept
+        """
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def record(self, latency_ms: float):
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the nearest-rank p-th percentile, or None with no samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = max(math.ceil(p / 100 * len(samples)), 1)
+        return samples[rank - 1]
+
+    def summary(self) -> Dict[str, Optional[float]]:
+        """Return the p50/p95/p99 latencies and the sample count."""
+        return {
+            "count": len(self),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+class HedgePolicy:
+    """
+    Per-call deadlines plus hedged requests for tail latency.
+
+    When an attempt has been running longer than the configured percentile of
+    recent attempt latencies, one duplicate attempt is started and whichever
+    finishes first wins; the other is cancelled. Hedges are capped at
+    max_hedge_fraction of calls so a slow upstream is not flooded with
+    duplicates. Single-attempt latency (before hedging) and call latency
+    (after) are tracked separately so the effect can be measured. Cancelled
+    losers are excluded from the former, so its tail is a lower bound; run
+    with percentile=0 for an exact baseline.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        max_hedge_fraction: float = 0.05,
+        min_samples: int = 20,
+        deadline_seconds: Optional[float] = None,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            percentile: Attempt latency percentile after which to hedge, or 0 to disable hedging
+            max_hedge_fraction: Maximum ratio of hedges to calls
+            min_samples: Attempts observed before hedging starts
+            deadline_seconds: Default deadline for a whole call, or None for no deadline
+        """
+        self.percentile = percentile
+        self.max_hedge_fraction = max_hedge_fraction
+        self.min_samples = min_samples
+        self.deadline_seconds = deadline_seconds
+
+        self.attempt_latency = LatencyTracker()
+        self.call_latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        # Blocking losers left running for on_loser, referenced until they finish
+        self._losers: set = set()
+
+        self.stats = {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'deadline_exceeded': 0}
+
+    @classmethod
+    def from_env(cls, default_deadline: Optional[float] = None) -> "HedgePolicy":
+        """
+        Build a policy from OCR_HEDGE_PERCENTILE, OCR_HEDGE_MAX_FRACTION,
+        OCR_HEDGE_MIN_SAMPLES and OCR_DEADLINE_SECONDS.
+
+        Args:
+            default_deadline: Deadline used when OCR_DEADLINE_SECONDS is unset
+        """
+        deadline = os.getenv("OCR_DEADLINE_SECONDS")
+        return cls(
+            percentile=float(os.getenv("OCR_HEDGE_PERCENTILE", "95")),
+            max_hedge_fraction=float(os.getenv("OCR_HEDGE_MAX_FRACTION", "0.05")),
+            min_samples=int(os.getenv("OCR_HEDGE_MIN_SAMPLES", "20")),
+            deadline_seconds=float(deadline) if deadline else default_deadline,
+        )
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None if hedging is off or still warming up."""
+        if not self.percentile or len(self.attempt_latency) < max(self.min_samples, 1):
+            return None
+        return self.attempt_latency.percentile(self.percentile) / 1000
+
+    def _start_call(self):
+        with self._lock:
+            self.stats['calls'] += 1
+
+    def _take_hedge_budget(self, admit_hedge: Optional[Callable[[], bool]]) -> bool:
+        with self._lock:
+            if self.stats['hedges'] + 1 > self.max_hedge_fraction * self.stats['calls']:
+                return False
+            if admit_hedge is not None and not admit_hedge():
+                return False
+            self.stats['hedges'] += 1
+            return True
+
+    def _finish_call(self, started: float, attempt_starts: Dict, primary, winner):
+        """Record attempt, primary and call latencies once an attempt wins."""
+        now = time.monotonic()
+        # Only completed attempts are recorded: a cancelled loser's latency is
+        # unknown, and its elapsed time would drag the threshold into the tail
+        self.attempt_latency.record((now - attempt_starts[winner]) * 1000)
+        self.call_latency.record((now - started) * 1000)
+        if winner is not primary:
+            with self._lock:
+                self.stats['hedge_wins'] += 1
+
+    def deadline_exceeded(self, deadline: float):
+        """Count a missed deadline and raise DeadlineExceeded."""
+        with self._lock:
+            self.stats['deadline_exceeded'] += 1
+        raise DeadlineExceeded(f"OCR call exceeded its {deadline:g}s deadline")
+
+    @staticmethod
+    def _wait_timeout(started: float, delay: Optional[float], deadline_at: Optional[float]) -> Optional[float]:
+        """Time until the next hedge or deadline event, or None to wait indefinitely."""
+        now = time.monotonic()
+        timeouts = []
+        if delay is not None:
+            timeouts.append(max(started + delay - now, 0))
+        if deadline_at is not None:
+            timeouts.append(max(deadline_at - now, 0))
+        return min(timeouts) if timeouts else None
+
+    def _hand_over_loser(self, loser, on_loser: Callable[[T], None]):
+        """Call on_loser with a losing attempt's result once it completes successfully."""
+        def done(future):
+            self._losers.discard(future)
+            if not future.cancelled() and future.exception() is None:
+                on_loser(future.result())
+
+        self._losers.add(loser)
+        loser.add_done_callback(done)
+
+    async def run_async(
+        self,
+        attempt: Callable[[bool], Awaitable[T]],
+        deadline: Optional[float] = None,
+        admit_hedge: Optional[Callable[[], bool]] = None,
+    ) -> Tuple[T, bool]:
+        """
+        Run attempt, hedging it once if it is slow.
+
+        Args:
+            attempt: Coroutine factory called with hedge=False, then hedge=True for the duplicate
+            deadline: Seconds allowed for the call, defaults to deadline_seconds
+            admit_hedge: Called before hedging; returning False skips the hedge,
+                e.g. when a quota has no room for an extra request
+
+        Returns:
+            (result of the first successful attempt, whether the hedge won)
+
+        Raises:
+            DeadlineExceeded: If no attempt succeeded before the deadline
+        """
+        deadline = deadline if deadline is not None else self.deadline_seconds
+        self._start_call()
+        started = time.monotonic()
+        deadline_at = started + deadline if deadline else None
+        delay = self.hedge_delay()
+
+        primary = asyncio.ensure_future(attempt(False))
+        attempt_starts = {primary: started}
+        pending = {primary}
+        hedge = None
+        try:
+            while True:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=self._wait_timeout(started, delay, deadline_at),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                # Retrieve every failure so none is reported as unhandled
+                failures = [task for task in done if task.exception() is not None]
+                winners = [task for task in done if task.exception() is None]
+                if winners:
+                    winner = primary if primary in winners else winners[0]
+                    self._finish_call(started, attempt_starts, primary, winner)
+                    return winner.result(), winner is hedge
+                if failures and not pending:
+                    # Every attempt failed; surface the primary's error if it has one
+                    failed = primary if primary in failures else failures[0]
+                    raise failed.exception()
+                if done:
+                    # One attempt failed while the other is still running
+                    continue
+
+                if deadline_at is not None and time.monotonic() >= deadline_at:
+                    self.deadline_exceeded(deadline)
+                if hedge is None and delay is not None:
+                    delay = None
+                    if self._take_hedge_budget(admit_hedge):
+                        hedge = asyncio.ensure_future(attempt(True))
+                        attempt_starts[hedge] = time.monotonic()
+                        pending.add(hedge)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def run(
+        self,
+        attempt: Callable[[bool], T],
+        deadline: Optional[float] = None,
+        admit_hedge: Optional[Callable[[], bool]] = None,
+        on_loser: Optional[Callable[[T], None]] = None,
+    ) -> Tuple[T, bool]:
+        """
+        Blocking variant of run_async.
+
+        Attempts run on a private thread pool. A blocking call cannot be
+        interrupted, so a losing or timed-out attempt finishes in the
+        background; its result goes to on_loser if given, else it is discarded.
+        Callers that limit concurrency should count an attempt until it ends,
+        not until the call returns.
+        """
+        deadline = deadline if deadline is not None else self.deadline_seconds
+        # Without a hedge threshold or deadline there is nothing to wait on
+        if self.hedge_delay() is None and not deadline:
+            self._start_call()
+            started = time.monotonic()
+            result = attempt(False)
+            latency_ms = (time.monotonic() - started) * 1000
+            self.attempt_latency.record(latency_ms)
+            self.call_latency.record(latency_ms)
+            return result, False
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="ocr-hedge")
+
+        self._start_call()
+        started = time.monotonic()
+        deadline_at = started + deadline if deadline else None
+        delay = self.hedge_delay()
+
+        primary = self._executor.submit(attempt, False)
+        attempt_starts = {primary: started}
+        pending = {primary}
+        hedge = None
+        while True:
+            done, pending = concurrent.futures.wait(
+                pending,
+                timeout=self._wait_timeout(started, delay, deadline_at),
+                return_when=concurrent.futures.FIRST_COMPLETED,
+            )
+            failures = [future for future in done if future.exception() is not None]
+            winners = [future for future in done if future.exception() is None]
+            if winners:
+                winner = primary if primary in winners else winners[0]
+                self._finish_call(started, attempt_starts, primary, winner)
+                if on_loser is not None:
+                    for loser in [future for future in winners if future is not winner] + list(pending):
+                        self._hand_over_loser(loser, on_loser)
+                return winner.result(), winner is hedge
+            if failures and not pending:
+                failed = primary if primary in failures else failures[0]
+                raise failed.exception()
+            if done:
+                continue
+
+            if deadline_at is not None and time.monotonic() >= deadline_at:
+                self.deadline_exceeded(deadline)
+            if hedge is None and delay is not None:
+                delay = None
+                if self._take_hedge_budget(admit_hedge):
+                    hedge = self._executor.submit(attempt, True)
+                    attempt_starts[hedge] = time.monotonic()
+                    pending.add(hedge)
+
+    def get_stats(self) -> Dict:
+        """Return hedge counters and latency percentiles before and after hedging."""
+        with self._lock:
+            stats = dict(self.stats)
+        calls = stats['calls']
+        stats['hedge_fraction'] = stats['hedges'] / calls if calls else 0.0
+        stats['hedge_win_rate'] = stats['hedge_wins'] / stats['hedges'] if stats['hedges'] else 0.0
+        stats['hedge_delay_ms'] = self.hedge_delay() * 1000 if self.hedge_delay() is not None else None
+        stats['attempt_latency_ms'] = self.attempt_latency.summary()
+        stats['call_latency_ms'] = self.call_latency.summary()
+        return stats
+
+    def close(self):
+        """Shut down the thread pool used by run without waiting for stragglers."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
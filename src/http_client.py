@@ -0,0 +1,89 @@
+import os
+
+import aiohttp
+import requests
+from pydantic import BaseModel
+from requests.adapters import HTTPAdapter
+
+
+class DownloadSettings(BaseModel):
+    """Connection pool and timeout settings for image downloads."""
+    connect_timeout: float = 10.0
+    read_timeout: float = 60.0
+    max_connections: int = 100
+    max_connections_per_host: int = 16
+    keepalive_seconds: float = 60.0
+    memory_max_bytes: int = 8 * 1024 * 1024
+
+    @classmethod
+    def from_env(cls) -> "DownloadSettings":
+        """
+        Read IMAGE_DOWNLOAD_CONNECT_TIMEOUT, IMAGE_DOWNLOAD_READ_TIMEOUT,
+        IMAGE_DOWNLOAD_MAX_CONNECTIONS, IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST,
+        IMAGE_DOWNLOAD_KEEPALIVE_SECONDS and IMAGE_DOWNLOAD_MEMORY_MAX_MB.
+        """
+        return cls(
+            connect_timeout=float(os.getenv("IMAGE_DOWNLOAD_CONNECT_TIMEOUT", "10")),
+            read_timeout=float(os.getenv("IMAGE_DOWNLOAD_READ_TIMEOUT", "60")),
+            max_connections=int(os.getenv("IMAGE_DOWNLOAD_MAX_CONNECTIONS", "100")),
+            max_connections_per_host=int(os.getenv("IMAGE_DOWNLOAD_MAX_CONNECTIONS_PER_HOST", "16")),
+            keepalive_seconds=float(os.getenv("IMAGE_DOWNLOAD_KEEPALIVE_SECONDS", "60")),
+            memory_max_bytes=int(float(os.getenv("IMAGE_DOWNLOAD_MEMORY_MAX_MB", "8")) * 1024 * 1024),
+        )
+
+    @property
+    def requests_timeout(self) -> tuple:
+        """(connect, read) timeout for requests calls."""
+        return self.connect_timeout, self.read_timeout
+
+
+def create_async_session(settings: DownloadSettings) -> aiohttp.ClientSession:
+    """
+    Create a pooled aiohttp session for downloads.
+
+    Connections are kept alive and reused across downloads, capped in total
+    and per host, and DNS lookups are cached. Must be called from a running
+    event loop.
+
+    Args:
+        settings: Pool and timeout settings
+
+    Returns:
+        A session to reuse for every download and close when done
+    """
+    connector = aiohttp.TCPConnector(
+        limit=settings.max_connections,
+        limit_per_host=settings.max_connections_per_host,
+        keepalive_timeout=settings.keepalive_seconds,
+        ttl_dns_cache=300,
+    )
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=settings.connect_timeout,
+        sock_read=settings.read_timeout,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def create_sync_session(settings: DownloadSettings) -> requests.Session:
+    """
+    Create a pooled requests session for downloads.
+
+    requests keeps one pool per host, so the pool size is the per-host limit;
+    callers wait for a free connection rather than opening extra ones.
+    Sessions can be shared between download threads.
+
+    Args:
+        settings: Pool and timeout settings
+
+    Returns:
+        A session to reuse for every download and close when done
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,  # Hosts whose pools are kept
+        pool_maxsize=settings.max_connections_per_host,
+        pool_block=True,
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
@@ -0,0 +1,316 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, Optional, Union
+
+CHUNK_SIZE = 1 << 20
+
+
+class ImageBytes:
+    """
+    An image held in memory, such as a download on its way to OCR.
+
+    The bytes are kept as one immutable buffer that is handed to the OCR
+    request as is; hashing and store writes go through memoryview slices so
+    the buffer is never copied.
+    """
+
+    __slots__ = ("data", "mime_type", "name", "_digest")
+
+    def __init__(self, data: bytes, mime_type: str = "image/jpeg", name: Optional[str] = None):
+        """
+        Args:
+            data: The encoded image (JPEG, PNG, ...)
+            mime_type: MIME type of data
+            name: Where the bytes came from, for logging
+        """
+        self.data = data
+        self.mime_type = mime_type
+        self.name = name
+        self._digest: Optional[str] = None
+
+    @property
+    def view(self) -> memoryview:
+        return memoryview(self.data)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def digest(self) -> str:
+        """SHA-256 of the bytes, the same digest the store and hash_image() use for a file."""
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.view).hexdigest()
+        return self._digest
+
+
+class ImageStore:
+    """
+    Content-addressed, deduplicating store of image files.
+
+    Blobs are named by the SHA-256 of their bytes and fanned out over two
+    directory levels (ab/cd/abcd...), so identical images downloaded or
+    uploaded several times are kept once. The digest is the same one
+    hash_image() computes for a file, so it doubles as the image part of OCR
+    result cache keys.
+
+    A SQLite index next to the blobs counts the Image rows referring to each
+    blob; a blob is deleted once its count drops to zero. Blobs that were
+    stored but never referenced (e.g. an evaluation whose image was never
+    attached) are removed by sweep() once they are older than a grace period.
+    """
+
+    def __init__(self, root: Union[str, Path] = "image_store", grace_seconds: float = 3600):
+        """
+        Initialize the store.
+
+        Args:
+            root: Directory holding blobs and the index
+            grace_seconds: Age after which sweep() deletes unreferenced blobs
+        """
+        self.root = Path(root)
+        self.grace_seconds = grace_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._tmp_dir = self.root / "tmp"
+        self._tmp_dir.mkdir(exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.root / "index.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                refcount INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+        self.stats = {
+            'writes': 0,
+            'deduplicated': 0,
+            'deleted': 0,
+            'swept': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "ImageStore":
+        """
+        Build a store rooted at IMAGE_STORE_DIR (default image_store) that sweeps
+        unreferenced blobs after IMAGE_STORE_SWEEP_GRACE_SECONDS (default 3600).
+        """
+        return cls(
+            os.getenv("IMAGE_STORE_DIR", "image_store"),
+            grace_seconds=float(os.getenv("IMAGE_STORE_SWEEP_GRACE_SECONDS", "3600"))
+        )
+
+    def path(self, digest: str) -> Path:
+        """Fan-out path of a blob, whether or not it exists."""
+        return self.root / digest[:2] / digest[2:4] / digest
+
+    def digest_of(self, path: Union[str, Path]) -> Optional[str]:
+        """Return the digest if path is a blob in this store, else None."""
+        path = Path(path)
+        try:
+            path.resolve().relative_to(self.root.resolve())
+        except ValueError:
+            return None
+        digest = path.name
+        return digest if len(digest) == 64 and self.path(digest).resolve() == path.resolve() else None
+
+    def exists(self, digest: str) -> bool:
+        return self.path(digest).exists()
+
+    def put_stream(self, chunks: Iterable[bytes]) -> str:
+        """
+        Write a blob from byte chunks, hashing while writing.
+
+        The bytes go to a temporary file that is renamed into place, or
+        dropped if a blob with the same digest is already stored.
+
+        Args:
+            chunks: The image bytes, in order
+
+        Returns:
+            Digest of the stored blob
+        """
+        digest = hashlib.sha256()
+        temp_path = self._tmp_dir / f"{uuid.uuid4().hex}.part"
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    f.write(chunk)
+            return self._commit(temp_path, digest.hexdigest())
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def put_bytes(self, data: Union[bytes, memoryview]) -> str:
+        """Store in-memory image bytes and return their digest."""
+        view = memoryview(data)
+        return self.put_stream(view[i:i + CHUNK_SIZE] for i in range(0, len(view), CHUNK_SIZE))
+
+    def put_file(self, source: Union[str, Path], move: bool = False) -> str:
+        """
+        Add a file to the store and return its digest.
+
+        Already-stored content is not copied again.
+
+        Args:
+            source: The image file
+            move: Remove source once it is stored, so the image is kept on disk once
+        """
+        digest = hashlib.sha256()
+        with open(source, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        hex_digest = digest.hexdigest()
+        if self.exists(hex_digest):
+            stored = self._commit(None, hex_digest)
+            if move:
+                Path(source).unlink(missing_ok=True)
+            return stored
+
+        temp_path = self._tmp_dir / f"{uuid.uuid4().hex}.part"
+        try:
+            if move:
+                try:
+                    os.replace(source, temp_path)
+                except OSError:
+                    # Another filesystem; copy, and drop the source once stored
+                    shutil.copyfile(source, temp_path)
+            else:
+                shutil.copyfile(source, temp_path)
+            stored = self._commit(temp_path, hex_digest)
+            if move:
+                Path(source).unlink(missing_ok=True)
+            return stored
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    def _commit(self, temp_path: Optional[Path], digest: str) -> str:
+        """Move a written temp file to its blob path and register it."""
+        path = self.path(digest)
+        with self._lock:
+            if path.exists():
+                self.stats['deduplicated'] += 1
+            else:
+                if temp_path is None:
+                    raise FileNotFoundError(f"Blob {digest} was deleted while being stored")
+                path.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(temp_path, path)
+                self.stats['writes'] += 1
+            # Storing an unreferenced blob again restarts its grace period
+            self._conn.execute(
+                "INSERT INTO blobs (digest, size, refcount, created_at) VALUES (?, ?, 0, ?) "
+                "ON CONFLICT(digest) DO UPDATE SET created_at = excluded.created_at WHERE refcount = 0",
+                (digest, path.stat().st_size, time.time())
+            )
+            self._conn.commit()
+        return digest
+
+    def incref(self, digest: str) -> int:
+        """Record one more Image row using a blob and return the new count."""
+        with self._lock:
+            self._conn.execute("UPDATE blobs SET refcount = refcount + 1 WHERE digest = ?", (digest,))
+            self._conn.commit()
+            row = self._conn.execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        if row is None:
+            raise KeyError(f"Blob {digest} is not in the image store")
+        return row[0]
+
+    def decref(self, digest: str) -> int:
+        """
+        Record one fewer Image row using a blob, deleting it when none are left.
+
+        Returns:
+            The remaining count (0 if the blob was deleted or unknown)
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE blobs SET refcount = refcount - 1 WHERE digest = ? AND refcount > 0", (digest,)
+            )
+            row = self._conn.execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if row is not None and row[0] == 0:
+                self._conn.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                self.path(digest).unlink(missing_ok=True)
+                self.stats['deleted'] += 1
+            self._conn.commit()
+        return row[0] if row else 0
+
+    def sweep(self, grace_seconds: Optional[float] = None) -> int:
+        """
+        Delete blobs no Image row refers to that were stored more than grace_seconds ago.
+
+        The grace period leaves time for a blob written in the background to be
+        attached to its Image row. Leftover temporary files are removed too.
+
+        Args:
+            grace_seconds: Minimum age in seconds (defaults to the store's)
+
+        Returns:
+            Number of blobs deleted
+        """
+        cutoff = time.time() - (self.grace_seconds if grace_seconds is None else grace_seconds)
+        with self._lock:
+            digests = [
+                row[0] for row in self._conn.execute(
+                    "SELECT digest FROM blobs WHERE refcount = 0 AND created_at < ?", (cutoff,)
+                )
+            ]
+            for digest in digests:
+                self._conn.execute("DELETE FROM blobs WHERE digest = ? AND refcount = 0", (digest,))
+                self.path(digest).unlink(missing_ok=True)
+            self._conn.commit()
+            self.stats['swept'] += len(digests)
+        for temp_path in self._tmp_dir.glob("*.part"):
+            try:
+                if temp_path.stat().st_mtime < cutoff:
+                    temp_path.unlink()
+            except FileNotFoundError:
+                pass
+        return len(digests)
+
+    def refcount(self, digest: str) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT refcount FROM blobs WHERE digest = ?", (digest,)).fetchone()
+        return row[0] if row else 0
+
+    def open(self, digest: str) -> BinaryIO:
+        """Open a blob for reading; raises FileNotFoundError if it is not stored."""
+        return open(self.path(digest), 'rb')
+
+    def iter_chunks(self, digest: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Yield a blob's bytes in chunks without loading it whole."""
+        with self.open(digest) as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                yield chunk
+
+    def get_stats(self) -> Dict:
+        """Return write/dedupe counters plus blob count and stored bytes."""
+        with self._lock:
+            blobs, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+            return {**self.stats, 'blobs': blobs, 'bytes': size}
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
+
+
+_default_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    """Process-wide store configured from the environment, created on first use."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ImageStore.from_env()
+    return _default_store
@@ -0,0 +1,70 @@
+import json
+from typing import Any, List
+
+
+class JsonArrayStreamParser:
+    """
+    Incremental parser for a top-level JSON array of objects.
+
+    Text is fed in arbitrary chunks as it streams from the model. Each call to
+    feed returns the objects completed by that chunk, so callers can act on
+    array elements long before the closing bracket arrives.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._in_array = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        """
+        Consume a chunk of text.
+
+        Args:
+            chunk: The next piece of the streamed JSON
+
+        Returns:
+            Array elements completed within this chunk, in order
+        """
+        completed = []
+        for char in chunk:
+            if self.done:
+                break
+
+            if not self._in_array:
+                # Skip anything before the opening bracket (whitespace, code fences)
+                if char == '[':
+                    self._in_array = True
+                continue
+
+            if self._depth == 0:
+                # Between elements: only commas, whitespace or the closing bracket
+                if char == '{':
+                    self._depth = 1
+                    self._buffer = [char]
+                elif char == ']':
+                    self.done = True
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(json.loads("".join(self._buffer)))
+                    self._buffer = []
+
+        return completed
@@ -0,0 +1,272 @@
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.scoring import ILLEGIBLE, grapheme_clusters, normalize_text
+
+DEFAULT_RESAMPLES = 1000
+
+# Pairs per edit-distance batch, and bootstrap indices drawn per block,
+# keeping the padded matrices at a few tens of MB
+EDIT_DISTANCE_BATCH = 4096
+BOOTSTRAP_BLOCK_ELEMENTS = 4_000_000
+
+
+def encode_texts(texts: Sequence[str], tokenize: Callable[[str], List[str]], vocab: Dict[str, int]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tokenize texts and pack them into one flat id array plus offsets.
+
+    Each distinct text is tokenized once, since references and many
+    transcriptions repeat across evaluations.
+
+    Args:
+        texts: Normalized texts
+        tokenize: Splits a text into tokens (words or grapheme clusters)
+        vocab: Token to id mapping, extended in place with unseen tokens
+
+    Returns:
+        (int32 ids of all texts concatenated, int64 offsets of length len(texts) + 1)
+    """
+    encoded: Dict[str, List[int]] = {}
+    ids: List[int] = []
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+    for index, text in enumerate(texts):
+        tokens = encoded.get(text)
+        if tokens is None:
+            tokens = encoded[text] = [vocab.setdefault(token, len(vocab)) for token in tokenize(text)]
+        ids.extend(tokens)
+        offsets[index + 1] = len(ids)
+    return np.asarray(ids, dtype=np.int32), offsets
+
+
+def _pad(ids: np.ndarray, offsets: np.ndarray, rows: np.ndarray, fill: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Copy the selected packed sequences into a padded matrix."""
+    lengths = np.diff(offsets)[rows]
+    width = int(lengths.max()) if len(rows) else 0
+    padded = np.full((len(rows), width), fill, dtype=np.int32)
+    positions = np.arange(width)
+    mask = positions < lengths[:, None]
+    padded[mask] = ids[(offsets[rows][:, None] + positions)[mask]]
+    return padded, lengths
+
+
+def batch_edit_distance(
+    ref_ids: np.ndarray,
+    ref_offsets: np.ndarray,
+    hyp_ids: np.ndarray,
+    hyp_offsets: np.ndarray,
+    batch_size: int = EDIT_DISTANCE_BATCH,
+) -> np.ndarray:
+    """
+    Levenshtein distance of every reference/hypothesis pair.
+
+    Pairs are sorted by length and padded into batches, and the dynamic
+    program advances one reference token at a time across the whole batch.
+    Insertions are resolved per row with a running minimum, so each step is
+    a handful of array operations regardless of batch size.
+
+    Args:
+        ref_ids, ref_offsets: Packed reference sequences (see encode_texts)
+        hyp_ids, hyp_offsets: Packed hypothesis sequences, same count as references
+        batch_size: Pairs per batch
+
+    Returns:
+        int64 distance per pair
+    """
+    count = len(ref_offsets) - 1
+    distances = np.zeros(count, dtype=np.int64)
+    order = np.argsort(np.diff(ref_offsets) + np.diff(hyp_offsets), kind="stable")
+
+    for start in range(0, count, batch_size):
+        rows = order[start:start + batch_size]
+        refs, ref_lengths = _pad(ref_ids, ref_offsets, rows, fill=-2)
+        hyps, hyp_lengths = _pad(hyp_ids, hyp_offsets, rows, fill=-1)
+
+        columns = np.arange(hyps.shape[1] + 1, dtype=np.int32)
+        previous = np.broadcast_to(columns, (len(rows), len(columns))).copy()
+        current = np.empty_like(previous)
+        for i in range(refs.shape[1]):
+            current[:, 0] = previous[:, 0] + 1
+            np.minimum(
+                previous[:, :-1] + (hyps != refs[:, i:i + 1]),
+                previous[:, 1:] + 1,
+                out=current[:, 1:]
+            )
+            # current[j] = min over k <= j of current[k] + (j - k)
+            current = np.minimum.accumulate(current - columns, axis=1) + columns
+            # Pairs whose reference has ended keep their final row
+            previous = np.where((i < ref_lengths)[:, None], current, previous)
+            current = np.empty_like(previous)
+
+        distances[rows] = previous[np.arange(len(rows)), hyp_lengths]
+    return distances
+
+
+def bootstrap_ci(
+    ratios: Sequence[Tuple[np.ndarray, np.ndarray]],
+    n_resamples: int = DEFAULT_RESAMPLES,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> List[Tuple[Optional[float], Optional[float]]]:
+    """
+    Percentile bootstrap intervals for ratios of sums, resampling evaluations.
+
+    Every ratio is computed on the same resamples, so the evaluation indices
+    are drawn once and each resample's sums are a single matrix product.
+
+    Args:
+        ratios: (per-evaluation numerators, per-evaluation denominators) pairs,
+            e.g. edit distances and reference lengths
+        n_resamples: Bootstrap resamples
+        confidence: Interval coverage
+        seed: RNG seed, so cached and recomputed intervals agree
+
+    Returns:
+        (low, high) per ratio, or (None, None) with no evaluations
+    """
+    count = len(ratios[0][0]) if ratios else 0
+    if count == 0 or n_resamples <= 0:
+        return [(None, None)] * len(ratios)
+
+    # One column per numerator and denominator; a resample's sums are then its
+    # per-evaluation draw counts times this matrix
+    columns = np.column_stack([array for ratio in ratios for array in ratio]).astype(np.float64)
+    rng = np.random.default_rng(seed)
+    block = max(BOOTSTRAP_BLOCK_ELEMENTS // count, 1)
+    estimates: List[List[np.ndarray]] = [[] for _ in ratios]
+    for start in range(0, n_resamples, block):
+        size = min(block, n_resamples - start)
+        sample = rng.integers(0, count, size=(size, count))
+        sample += np.arange(size)[:, None] * count
+        draws = np.bincount(sample.ravel(), minlength=size * count).reshape(size, count)
+        sums = draws @ columns
+        for index, ratio_estimates in enumerate(estimates):
+            num, den = sums[:, 2 * index], sums[:, 2 * index + 1]
+            ratio_estimates.append(np.divide(num, den, out=np.zeros(size), where=den > 0))
+
+    tail = (1 - confidence) / 2 * 100
+    intervals = []
+    for ratio_estimates in estimates:
+        low, high = np.percentile(np.concatenate(ratio_estimates), [tail, 100 - tail])
+        intervals.append((float(low), float(high)))
+    return intervals
+
+
+def position_error_rates(word_matches: Sequence[Sequence[bool]]) -> List[float]:
+    """
+    Error rate at each reference word position across evaluations.
+
+    Args:
+        word_matches: Per evaluation, whether each reference word matched
+
+    Returns:
+        Fraction of evaluations getting the word at each position wrong
+    """
+    lengths = np.fromiter((len(matches) for matches in word_matches), dtype=np.int64, count=len(word_matches))
+    if not len(lengths) or not lengths.max():
+        return []
+
+    positions = np.arange(lengths.max())
+    mask = positions < lengths[:, None]
+    errors = np.zeros(mask.shape, dtype=np.int64)
+    errors[mask] = [not match for matches in word_matches for match in matches]
+    return (errors.sum(axis=0) / mask.sum(axis=0)).tolist()
+
+
+def compute_error_rates(
+    references: Sequence[Optional[str]],
+    transcriptions: Sequence[Optional[str]],
+    word_matches: Sequence[Sequence[bool]],
+    n_resamples: int = DEFAULT_RESAMPLES,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> Dict:
+    """
+    Corpus-level CER, WER and per-position error rates with bootstrap intervals.
+
+    CER and WER are total edit distance over total reference length, over
+    grapheme clusters and words respectively. Illegible markers count as one
+    wrong character, as in src.scoring.
+
+    Args:
+        references: Reference text per evaluation
+        transcriptions: Transcription per evaluation
+        word_matches: Stored per-word match flags per evaluation
+        n_resamples: Bootstrap resamples, 0 to skip intervals
+        confidence: Interval coverage
+        seed: Bootstrap RNG seed
+
+    Returns:
+        Dict with evaluations, reference_words, reference_characters, cer, cer_ci,
+        wer, wer_ci, mean_accuracy, mean_accuracy_ci and position_error_rates
+    """
+    references = [normalize_text(text) for text in references]
+    transcriptions = [normalize_text(text).replace(ILLEGIBLE, "\ufffd") for text in transcriptions]
+
+    vocab: Dict[str, int] = {}
+    ref_chars = encode_texts(references, grapheme_clusters, vocab)
+    hyp_chars = encode_texts(transcriptions, grapheme_clusters, vocab)
+    ref_words = encode_texts(references, str.split, vocab)
+    hyp_words = encode_texts(transcriptions, str.split, vocab)
+
+    char_errors = batch_edit_distance(*ref_chars, *hyp_chars)
+    word_errors = batch_edit_distance(*ref_words, *hyp_words)
+    char_totals = np.diff(ref_chars[1])
+    word_totals = np.diff(ref_words[1])
+
+    match_counts = np.array([sum(matches) for matches in word_matches], dtype=np.float64)
+    match_totals = np.array([len(matches) for matches in word_matches], dtype=np.float64)
+    accuracies = np.divide(match_counts, match_totals, out=np.zeros(len(match_counts)), where=match_totals > 0) * 100
+    ones = np.ones(len(accuracies))
+
+    ratios = [(char_errors, char_totals), (word_errors, word_totals), (accuracies, ones)]
+    values = [float(num.sum() / den.sum()) if den.sum() else None for num, den in ratios]
+    intervals = [
+        [low, high] if low is not None else None
+        for low, high in bootstrap_ci(ratios, n_resamples, confidence, seed)
+    ]
+
+    return {
+        "evaluations": len(references),
+        "reference_words": int(word_totals.sum()),
+        "reference_characters": int(char_totals.sum()),
+        "cer": values[0],
+        "cer_ci": intervals[0],
+        "wer": values[1],
+        "wer_ci": intervals[1],
+        "mean_accuracy": values[2],
+        "mean_accuracy_ci": intervals[2],
+        "position_error_rates": position_error_rates(word_matches),
+        "confidence": confidence,
+        "computed_at": datetime.utcnow(),
+    }
+
+
+class MetricsCache:
+    """
+    Error-rate results per scope (run, dataset or prompt version).
+
+    Each entry is stored with a fingerprint of the evaluations it was computed
+    from (count and latest update), and is recomputed once that changes.
+    """
+
+    def __init__(self):
+        self._entries: Dict[Hashable, Tuple[Hashable, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, scope: Hashable, fingerprint: Hashable) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(scope)
+        if entry is None or entry[0] != fingerprint:
+            return None
+        return entry[1]
+
+    def put(self, scope: Hashable, fingerprint: Hashable, metrics: Dict):
+        with self._lock:
+            self._entries[scope] = (fingerprint, metrics)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
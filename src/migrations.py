@@ -0,0 +1,138 @@
+import logging
+from datetime import datetime
+from typing import Callable, List, Set, Tuple
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection
+
+SCHEMA_MIGRATIONS_TABLE = "schema_migrations"
+
+# Association tables keyed on both columns; older databases created them without a key
+ASSOCIATION_KEYS = {
+    "dataset_images": ("dataset_id", "image_id"),
+    "evaluation_run_datasets": ("evaluation_run_id", "dataset_id"),
+}
+
+
+def _add_missing_columns(connection: Connection, metadata: MetaData):
+    """
+    Add model columns that existing tables lack.
+
+    create_all never alters a table that already exists, so columns added to
+    the models later (content_hash, retry_count, token counts, ...) were
+    missing from older databases. They are added as nullable columns; model
+    defaults are applied by the ORM on insert.
+    """
+    inspector = inspect(connection)
+    quote = connection.dialect.identifier_preparer.quote
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}"))
+            logging.info(f"Added column {table.name}.{column.name}")
+
+
+def _create_missing_indexes(connection: Connection, metadata: MetaData):
+    """Create the indexes declared on the models that existing tables lack."""
+    inspector = inspect(connection)
+    for table in metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+                logging.info(f"Created index {index.name}")
+
+
+def _add_association_keys(connection: Connection, metadata: MetaData):
+    """
+    Make each (left, right) pair of the association tables unique.
+
+    SQLite cannot add a primary key to an existing table, so tables created
+    without one get duplicate pairs removed and a unique index instead, which
+    gives lookups and inserts the same guarantees. The deduplication is plain
+    SQL, so it runs the same way on every backend.
+    """
+    inspector = inspect(connection)
+    for table_name, columns in ASSOCIATION_KEYS.items():
+        if not inspector.has_table(table_name):
+            continue
+        if inspector.get_pk_constraint(table_name).get('constrained_columns'):
+            continue
+        column_list = ", ".join(columns)
+        duplicates = connection.execute(text(
+            f"SELECT COUNT(*) FROM (SELECT {column_list} FROM {table_name} "
+            f"GROUP BY {column_list} HAVING COUNT(*) > 1) duplicate_pairs"
+        )).scalar()
+        if duplicates:
+            # Rebuild from the distinct pairs; the tables have no row id to keep one copy by
+            connection.execute(text(
+                f"CREATE TEMPORARY TABLE {table_name}_distinct AS SELECT DISTINCT {column_list} FROM {table_name}"
+            ))
+            connection.execute(text(f"DELETE FROM {table_name}"))
+            connection.execute(text(
+                f"INSERT INTO {table_name} ({column_list}) SELECT {column_list} FROM {table_name}_distinct"
+            ))
+            connection.execute(text(f"DROP TABLE {table_name}_distinct"))
+            logging.info(f"Removed duplicate pairs from {table_name}")
+        connection.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table_name} ON {table_name} ({column_list})"
+        ))
+        logging.info(f"Added unique key on {table_name} ({column_list})")
+
+
+# (version, description, migration); append new migrations with the next version
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection, MetaData], None]]] = [
+    (1, "add columns missing from tables created before the models gained them", _add_missing_columns),
+    (2, "indexes for evaluation, word evaluation and association lookups", _create_missing_indexes),
+    (3, "unique keys on dataset_images and evaluation_run_datasets", _add_association_keys),
+]
+
+
+def applied_versions(connection: Connection) -> Set[int]:
+    """Versions already recorded in the schema_migrations table."""
+    if not inspect(connection).has_table(SCHEMA_MIGRATIONS_TABLE):
+        return set()
+    result = connection.execute(text(f"SELECT version FROM {SCHEMA_MIGRATIONS_TABLE}"))
+    return {row[0] for row in result}
+
+
+def apply_migrations(connection: Connection, metadata: MetaData) -> List[int]:
+    """
+    Apply the migrations an existing database has not had yet.
+
+    Run after metadata.create_all, inside the same transaction, so a failed
+    migration leaves the schema and the recorded versions as they were. A new
+    database goes through every migration too; each only changes what is
+    missing, so on fresh tables they just record their version.
+
+    Args:
+        connection: A synchronous connection, e.g. from AsyncConnection.run_sync
+        metadata: The models' metadata
+
+    Returns:
+        Versions applied by this call
+    """
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_MIGRATIONS_TABLE} "
+        f"(version INTEGER PRIMARY KEY, description VARCHAR, applied_at TIMESTAMP)"
+    ))
+    done = applied_versions(connection)
+    applied = []
+    for version, description, migration in MIGRATIONS:
+        if version in done:
+            continue
+        migration(connection, metadata)
+        connection.execute(
+            text(f"INSERT INTO {SCHEMA_MIGRATIONS_TABLE} (version, description, applied_at) VALUES (:version, :description, :applied_at)"),
+            {"version": version, "description": description, "applied_at": datetime.utcnow()}
+        )
+        logging.info(f"Applied schema migration {version}: {description}")
+        applied.append(version)
+    return applied
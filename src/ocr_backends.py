@@ -0,0 +1,695 @@
+import asyncio
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, List, Optional, Protocol, TypeVar, Union, runtime_checkable
+
+import PIL.Image
+from google import genai
+from google.genai import types
+from google.genai.errors import ClientError, ServerError
+from io import BytesIO
+
+from src.evaluation_shards import iter_shard_records
+from src.image_store import ImageBytes
+from src.ocr_cache import hash_image
+from src.ocr_executor import OcrExecutor
+from src.ocr_usage import OcrUsage
+from src.prompt_registry import OUTPUT_TRANSCRIPTION, detect_output_format
+from src.scoring import transcription_from_evaluations
+
+ImageInput = Union[PIL.Image.Image, ImageBytes, str, Path]
+
+T = TypeVar("T")
+
+# Model used for all Gemini OCR requests
+DEFAULT_MODEL = "gemini-2.0-flash-exp"
+
+@runtime_checkable
+class OcrBackend(Protocol):
+    """
+    Interface for the model call behind GeminiOCR.
+
+    A backend takes an image, the static instruction block and the per-image
+    prompt and returns the raw JSON text produced by the model. Prompt
+    construction, caching and parsing stay in GeminiOCR so every backend goes
+    through the same pipeline. Backends may cache the instructions prefix.
+    When a usage record is passed, the backend fills in its token counts.
+    """
+
+    model: str
+
+    def generate(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> str:
+        """Run one OCR request and return the raw model output."""
+        ...
+
+    async def generate_async(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> str:
+        """Async variant of generate."""
+        ...
+
+    def generate_stream_async(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> AsyncIterator[str]:
+        """Yield the raw model output in chunks as it is produced."""
+        ...
+
+class UploadHandleCache:
+    """
+    TTL cache of Gemini file handles keyed by image content hash.
+
+    Lets one image evaluated under several prompts be uploaded once. Entries
+    expire before the server-side file does, and expired handles are returned
+    by pop_expired so the caller can delete the remote file.
+    """
+
+    def __init__(self, ttl_seconds: float = 24 * 3600):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_seconds: How long an uploaded handle is reused
+        """
+        self.ttl_seconds = ttl_seconds
+        self._handles: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'uploads': 0}
+
+    def get(self, content_hash: str) -> Optional[types.File]:
+        """Return a live handle for content_hash, or None."""
+        with self._lock:
+            entry = self._handles.get(content_hash)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self.stats['hits'] += 1
+            return entry[0]
+
+    def put(self, content_hash: str, handle: types.File):
+        """Remember a freshly uploaded handle."""
+        with self._lock:
+            self._handles[content_hash] = (handle, time.monotonic() + self.ttl_seconds)
+            self.stats['uploads'] += 1
+
+    def pop_expired(self) -> List[types.File]:
+        """Remove and return handles whose TTL has passed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._handles.items() if expires_at <= now]
+            return [self._handles.pop(key)[0] for key in expired]
+
+    def pop_all(self) -> List[types.File]:
+        """Remove and return every handle."""
+        with self._lock:
+            handles = [handle for handle, _ in self._handles.values()]
+            self._handles.clear()
+            return handles
+
+class GeminiBackend:
+    """OCR backend calling Google's Gemini API."""
+
+    def __init__(
+        self,
+        timeout: int = 60,
+        model: str = DEFAULT_MODEL,
+        inline_max_bytes: int = 4 * 1024 * 1024,
+        upload_ttl_seconds: float = 24 * 3600,
+        context_cache_ttl_seconds: float = 3600,
+        executor: Optional[OcrExecutor] = None,
+    ):
+        """
+        Initialize the Gemini client.
+
+        Args:
+            timeout: Timeout in seconds for API calls
+            model: Gemini model name
+            inline_max_bytes: Image files up to this size are sent inline as bytes
+                instead of through the Files API
+            upload_ttl_seconds: How long uploaded file handles are reused
+            context_cache_ttl_seconds: Lifetime of provider-side context caches
+                holding the instruction prefix, or 0 to send it with every call
+            executor: Pool for the blocking image work of async calls (encoding,
+                file reads, hashing). Without one it runs on the event loop.
+        """
+        if not os.getenv("GOOGLE_API_KEY"):
+            raise ValueError("GOOGLE_API_KEY environment variable is not set")
+
+        self.timeout = timeout
+        self.model = model
+        self.inline_max_bytes = inline_max_bytes
+        self.uploads = UploadHandleCache(upload_ttl_seconds)
+        self.executor = executor
+        self.client = genai.Client(
+            api_key=os.getenv("GOOGLE_API_KEY"),
+            http_options={"timeout": timeout * 1000}
+        )
+
+        # Async uploads in flight, so concurrent requests for one image share an upload
+        self._pending_uploads: Dict[str, asyncio.Future] = {}
+
+        # Context caches holding instruction prefixes, keyed by prefix hash
+        self.context_cache_ttl_seconds = context_cache_ttl_seconds
+        self._context_caches: Dict[str, tuple] = {}
+        self._uncacheable_prefixes = set()
+        self._context_cache_lock = threading.Lock()
+        self._context_cache_async_lock: Optional[asyncio.Lock] = None
+        self.context_cache_stats = {'hits': 0, 'creates': 0, 'failures': 0}
+
+    def _process_image(self, image: ImageInput) -> Union[types.Part, types.File]:
+        """
+        Process an image into a format suitable for the Gemini API.
+
+        PIL images and images up to inline_max_bytes are sent inline; in-memory
+        bytes go into the request without being copied. Larger images are
+        uploaded once per content hash and the handle is reused.
+
+        Args:
+            image: Can be a PIL Image, in-memory ImageBytes or a file path (str or Path)
+
+        Returns:
+            Processed image part for Gemini API
+        """
+        if isinstance(image, PIL.Image.Image):
+            return self._pil_to_part(image)
+        if self._is_inline(image):
+            return self._inline_part(image)
+
+        content_hash = hash_image(image)
+        handle = self.uploads.get(content_hash)
+        if handle is None:
+            # Upload file to Gemini
+            handle = self.client.files.upload(**self._upload_args(image))
+            self.uploads.put(content_hash, handle)
+            self._delete_expired_uploads()
+        return handle
+
+    async def _run_blocking(self, fn: Callable[..., T], *args) -> T:
+        """Run blocking work of an async call on the executor, or inline without one."""
+        if self.executor is None:
+            return fn(*args)
+        return await self.executor.run(fn, *args)
+
+    async def _process_image_async(self, image: ImageInput) -> Union[types.Part, types.File]:
+        """
+        Async variant of _process_image using the SDK's async file API.
+
+        Encoding, file reads and hashing run on the executor.
+        """
+        if isinstance(image, PIL.Image.Image):
+            return await self._run_blocking(self._pil_to_part, image)
+        if await self._run_blocking(self._is_inline, image):
+            return await self._run_blocking(self._inline_part, image)
+
+        content_hash = await self._run_blocking(hash_image, image)
+        handle = self.uploads.get(content_hash)
+        if handle is not None:
+            return handle
+
+        pending = self._pending_uploads.get(content_hash)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        pending = asyncio.get_running_loop().create_future()
+        self._pending_uploads[content_hash] = pending
+        try:
+            # Upload file to Gemini
+            handle = await self.client.aio.files.upload(**self._upload_args(image))
+            self.uploads.put(content_hash, handle)
+            pending.set_result(handle)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            # Mark as retrieved so an upload nobody else waited on does not warn
+            pending.exception()
+            raise
+        finally:
+            del self._pending_uploads[content_hash]
+
+        for expired in self.uploads.pop_expired():
+            await self._delete_upload_async(expired)
+        return handle
+
+    def _is_inline(self, image: Union[ImageBytes, str, Path]) -> bool:
+        """Whether an image is small enough to send inline."""
+        if isinstance(image, ImageBytes):
+            return len(image) <= self.inline_max_bytes
+        return os.path.getsize(str(image)) <= self.inline_max_bytes
+
+    @staticmethod
+    def _inline_part(image: Union[ImageBytes, str, Path]) -> types.Part:
+        """Wrap in-memory bytes, or read an image file, into an inline bytes part."""
+        if isinstance(image, ImageBytes):
+            return types.Part.from_bytes(data=image.data, mime_type=image.mime_type)
+        file_path = str(image)
+        mime_type = mimetypes.guess_type(file_path)[0] or "image/jpeg"
+        with open(file_path, 'rb') as f:
+            return types.Part.from_bytes(data=f.read(), mime_type=mime_type)
+
+    @staticmethod
+    def _upload_args(image: Union[ImageBytes, str, Path]) -> Dict:
+        """Files API upload arguments for a file path or in-memory bytes."""
+        if isinstance(image, ImageBytes):
+            return {"file": BytesIO(image.data), "config": {"mime_type": image.mime_type}}
+        return {"file": str(image)}
+
+    def _delete_expired_uploads(self):
+        """Delete remote files whose cached handle has expired."""
+        for handle in self.uploads.pop_expired():
+            try:
+                self.client.files.delete(name=handle.name)
+            except Exception as e:
+                logging.warning(f"Failed to delete uploaded file {handle.name}: {e}")
+
+    async def _delete_upload_async(self, handle: types.File):
+        """Delete one remote file, logging rather than raising on failure."""
+        try:
+            await self.client.aio.files.delete(name=handle.name)
+        except Exception as e:
+            logging.warning(f"Failed to delete uploaded file {handle.name}: {e}")
+
+    def _pop_context_caches(self) -> List[str]:
+        with self._context_cache_lock:
+            names = [name for name, _ in self._context_caches.values()]
+            self._context_caches.clear()
+            return names
+
+    def close(self):
+        """Delete every file and context cache this backend created."""
+        for handle in self.uploads.pop_all():
+            try:
+                self.client.files.delete(name=handle.name)
+            except Exception as e:
+                logging.warning(f"Failed to delete uploaded file {handle.name}: {e}")
+        for name in self._pop_context_caches():
+            try:
+                self.client.caches.delete(name=name)
+            except Exception as e:
+                logging.warning(f"Failed to delete context cache {name}: {e}")
+
+    async def aclose(self):
+        """Async variant of close."""
+        for handle in self.uploads.pop_all():
+            await self._delete_upload_async(handle)
+        for name in self._pop_context_caches():
+            try:
+                await self.client.aio.caches.delete(name=name)
+            except Exception as e:
+                logging.warning(f"Failed to delete context cache {name}: {e}")
+
+    @staticmethod
+    def _pil_to_part(image: PIL.Image.Image) -> types.Part:
+        """Convert a PIL Image to an inline WEBP part."""
+        image_bytes = BytesIO()
+        image.save(image_bytes, format="WEBP")
+        return types.Part.from_bytes(
+            data=image_bytes.getvalue(),
+            mime_type="image/webp"
+        )
+
+    def _lookup_context_cache(self, prefix_hash: str) -> tuple:
+        """
+        Check for a live context cache. Must hold a context cache lock.
+
+        Returns:
+            (cache name or None, whether a new cache should be created)
+        """
+        entry = self._context_caches.get(prefix_hash)
+        if entry is not None and entry[1] > time.monotonic():
+            self.context_cache_stats['hits'] += 1
+            return entry[0], False
+        should_create = prefix_hash not in self._uncacheable_prefixes
+        return None, should_create
+
+    def _context_cache_config(self, instructions: str) -> types.CreateCachedContentConfig:
+        return types.CreateCachedContentConfig(
+            system_instruction=instructions,
+            ttl=f"{int(self.context_cache_ttl_seconds)}s"
+        )
+
+    def _remember_context_cache(self, prefix_hash: str, cached: Optional[types.CachedContent],
+                                error: Optional[Exception] = None) -> Optional[str]:
+        """Record the outcome of a cache creation. Must hold a context cache lock."""
+        if cached is None:
+            # Too short for the model's minimum, or caching unsupported; stop trying
+            self._uncacheable_prefixes.add(prefix_hash)
+            self.context_cache_stats['failures'] += 1
+            logging.warning(f"Context caching unavailable, sending instructions inline: {error}")
+            return None
+
+        # Reuse until shortly before the server-side expiry
+        expires_at = time.monotonic() + self.context_cache_ttl_seconds * 0.9
+        self._context_caches[prefix_hash] = (cached.name, expires_at)
+        self.context_cache_stats['creates'] += 1
+        return cached.name
+
+    def _context_cache_name(self, instructions: Optional[str]) -> Optional[str]:
+        """Return a context cache name holding instructions, creating one if needed."""
+        if not instructions or not self.context_cache_ttl_seconds:
+            return None
+
+        prefix_hash = hashlib.sha256(instructions.encode('utf-8')).hexdigest()
+        with self._context_cache_lock:
+            name, should_create = self._lookup_context_cache(prefix_hash)
+            if not should_create:
+                return name
+            try:
+                cached = self.client.caches.create(
+                    model=self.model, config=self._context_cache_config(instructions)
+                )
+            except Exception as e:
+                return self._remember_context_cache(prefix_hash, None, e)
+            return self._remember_context_cache(prefix_hash, cached)
+
+    async def _context_cache_name_async(self, instructions: Optional[str]) -> Optional[str]:
+        """Async variant of _context_cache_name."""
+        if not instructions or not self.context_cache_ttl_seconds:
+            return None
+
+        if self._context_cache_async_lock is None:
+            self._context_cache_async_lock = asyncio.Lock()
+
+        prefix_hash = hashlib.sha256(instructions.encode('utf-8')).hexdigest()
+        async with self._context_cache_async_lock:
+            name, should_create = self._lookup_context_cache(prefix_hash)
+            if not should_create:
+                return name
+            try:
+                cached = await self.client.aio.caches.create(
+                    model=self.model, config=self._context_cache_config(instructions)
+                )
+            except Exception as e:
+                return self._remember_context_cache(prefix_hash, None, e)
+            return self._remember_context_cache(prefix_hash, cached)
+
+    @staticmethod
+    def _generation_config(instructions: Optional[str], cached_content: Optional[str]) -> Dict:
+        """Generation settings shared by the sync and async calls."""
+        config = {
+            "temperature": 0,
+            "response_mime_type": "application/json",
+        }
+        if cached_content:
+            config["cached_content"] = cached_content
+        elif instructions:
+            config["system_instruction"] = instructions
+        return config
+
+    def generate(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> str:
+        media_part = self._process_image(image)
+        cached_content = self._context_cache_name(instructions)
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=[media_part, prompt],
+            config=self._generation_config(instructions, cached_content),
+        )
+        if usage is not None:
+            usage.record_usage_metadata(response.usage_metadata)
+        return response.candidates[0].content.parts[0].text
+
+    async def generate_async(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> str:
+        media_part = await self._process_image_async(image)
+        cached_content = await self._context_cache_name_async(instructions)
+        response = await self.client.aio.models.generate_content(
+            model=self.model,
+            contents=[media_part, prompt],
+            config=self._generation_config(instructions, cached_content),
+        )
+        if usage is not None:
+            usage.record_usage_metadata(response.usage_metadata)
+        return response.candidates[0].content.parts[0].text
+
+    async def generate_stream_async(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> AsyncIterator[str]:
+        media_part = await self._process_image_async(image)
+        cached_content = await self._context_cache_name_async(instructions)
+        stream = await self.client.aio.models.generate_content_stream(
+            model=self.model,
+            contents=[media_part, prompt],
+            config=self._generation_config(instructions, cached_content),
+        )
+        async for chunk in stream:
+            # Counts are cumulative; the final chunk carries the totals
+            if usage is not None and chunk.usage_metadata is not None:
+                usage.record_usage_metadata(chunk.usage_metadata)
+            if chunk.text:
+                yield chunk.text
+
+class ReplayBackend:
+    """
+    Deterministic local backend that replays recorded OCR responses.
+
+    Recordings are the evaluation JSON files written by ImageProcessor, matched
+    on reference text. A reference with no recording gets a synthetic response
+    in which every word matches. Latency, generic server errors and 429 rate
+    limit errors are injected from a seeded RNG so load tests are repeatable.
+    """
+
+    def __init__(
+        self,
+        recordings_dir: Union[str, Path] = "evaluations",
+        latency_ms: float = 0,
+        latency_jitter_ms: float = 0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        seed: int = 0,
+        model: str = "replay",
+        stream_chunk_chars: int = 64,
+        uncached_prefix_latency_ms: float = 0,
+    ):
+        """
+        Initialize the replay backend.
+
+        Args:
+            recordings_dir: Directory containing evaluation_*.json recordings
+                or evaluation JSONL shards
+            latency_ms: Mean simulated latency per call
+            latency_jitter_ms: Uniform jitter applied around latency_ms
+            error_rate: Fraction of calls failing with a 503 ServerError
+            rate_limit_rate: Fraction of calls failing with a 429 ClientError
+            seed: Seed for the latency and error RNG
+            model: Model name reported to the pipeline
+            stream_chunk_chars: Size of the chunks yielded by generate_stream_async
+            uncached_prefix_latency_ms: Extra latency charged the first time an
+                instruction prefix is seen, mimicking provider-side context caching
+        """
+        self.model = model
+        self.stream_chunk_chars = stream_chunk_chars
+        self.uncached_prefix_latency_ms = uncached_prefix_latency_ms
+        self._prefix_cache = set()
+        self._prefix_lock = threading.Lock()
+        self.context_cache_stats = {'hits': 0, 'creates': 0, 'failures': 0}
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self._random = random.Random(seed)
+        self.recordings = self._load_recordings(Path(recordings_dir))
+
+        logging.info(f"ReplayBackend loaded {len(self.recordings)} recordings from {recordings_dir}")
+
+    @staticmethod
+    def _normalize(text: Optional[str]) -> str:
+        """Collapse whitespace so line breaks in the reference do not matter."""
+        return " ".join((text or "").split())
+
+    def _load_recordings(self, recordings_dir: Path) -> Dict[str, List[Dict]]:
+        """Index recorded word evaluations by normalized reference text."""
+        recordings = {}
+        if not recordings_dir.is_dir():
+            return recordings
+
+        for path in sorted(recordings_dir.glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                reference_text = data["image_info"]["reference_text"]
+                word_evaluations = data["evaluation"]["word_evaluations"]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                logging.warning(f"Skipping replay recording {path}: {e}")
+                continue
+            recordings[self._normalize(reference_text)] = word_evaluations
+
+        # Evaluations written by ImageProcessor to JSONL shards; later records win
+        for data in iter_shard_records(recordings_dir):
+            try:
+                recordings[self._normalize(data["image_info"]["reference_text"])] = (
+                    data["evaluation"]["word_evaluations"]
+                )
+            except (KeyError, TypeError) as e:
+                logging.warning(f"Skipping replay recording in {recordings_dir}: {e}")
+
+        return recordings
+
+    def _prefix_cached(self, instructions: Optional[str]) -> bool:
+        """Return whether a prefix was seen before, remembering it if not."""
+        if not instructions:
+            return False
+        prefix_hash = hashlib.sha256(instructions.encode('utf-8')).hexdigest()
+        with self._prefix_lock:
+            if prefix_hash in self._prefix_cache:
+                self.context_cache_stats['hits'] += 1
+                return True
+            self._prefix_cache.add(prefix_hash)
+            self.context_cache_stats['creates'] += 1
+            return False
+
+    def _next_outcome(self, extra_latency_ms: float = 0) -> float:
+        """Draw this call's latency in seconds and raise any injected error."""
+        latency_ms = self.latency_ms + extra_latency_ms
+        if self.latency_jitter_ms:
+            latency_ms += self._random.uniform(-self.latency_jitter_ms, self.latency_jitter_ms)
+
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            raise ClientError(429, {"error": {
+                "code": 429,
+                "message": "Resource has been exhausted (e.g. check quota).",
+                "status": "RESOURCE_EXHAUSTED"
+            }})
+        if roll < self.rate_limit_rate + self.error_rate:
+            raise ServerError(503, {"error": {
+                "code": 503,
+                "message": "The model is overloaded. Please try again later.",
+                "status": "UNAVAILABLE"
+            }})
+
+        return max(latency_ms, 0) / 1000
+
+    def _response_for(self, reference_text: Optional[str], instructions: Optional[str] = None) -> str:
+        """
+        Return the recorded response for a reference, or a synthetic exact match.
+
+        Transcription-only prompts get the recording's transcribed words as
+        {"transcription": ...}.
+        """
+        recorded = self.recordings.get(self._normalize(reference_text))
+        if recorded is None:
+            recorded = [
+                {
+                    "reference_word": word,
+                    "transcribed_word": word,
+                    "match": True,
+                    "reason_diff": "Exact match."
+                }
+                for word in self._normalize(reference_text).split()
+            ]
+
+        if instructions and detect_output_format(instructions) == OUTPUT_TRANSCRIPTION:
+            return json.dumps({"transcription": transcription_from_evaluations(recorded)}, ensure_ascii=False)
+
+        return json.dumps(recorded, ensure_ascii=False)
+
+    def _simulate_call(
+        self, prompt: str, reference_text: Optional[str],
+        instructions: Optional[str], usage: Optional[OcrUsage]
+    ) -> tuple:
+        """
+        Draw the outcome of one call.
+
+        Returns:
+            (latency in seconds, raw output)
+        """
+        prefix_cached = self._prefix_cached(instructions)
+        extra_latency_ms = self.uncached_prefix_latency_ms if instructions and not prefix_cached else 0
+        latency = self._next_outcome(extra_latency_ms)
+        output = self._response_for(reference_text, instructions)
+
+        if usage is not None:
+            # Same ~3 characters per token and 258 tokens per image as the API estimate
+            instruction_tokens = len(instructions or "") // 3
+            usage.prompt_tokens = instruction_tokens + len(prompt) // 3 + 258
+            usage.cached_tokens = instruction_tokens if prefix_cached else 0
+            usage.candidates_tokens = len(output) // 3
+            usage.total_tokens = usage.prompt_tokens + usage.candidates_tokens
+
+        return latency, output
+
+    def generate(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> str:
+        latency, output = self._simulate_call(prompt, reference_text, instructions, usage)
+        time.sleep(latency)
+        return output
+
+    async def generate_async(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> str:
+        latency, output = self._simulate_call(prompt, reference_text, instructions, usage)
+        await asyncio.sleep(latency)
+        return output
+
+    async def generate_stream_async(
+        self, image: ImageInput, prompt: str, reference_text: Optional[str] = None,
+        instructions: Optional[str] = None, usage: Optional[OcrUsage] = None
+    ) -> AsyncIterator[str]:
+        # Spread the call's latency evenly across the chunks
+        latency, output = self._simulate_call(prompt, reference_text, instructions, usage)
+        chunks = [
+            output[i:i + self.stream_chunk_chars]
+            for i in range(0, len(output), self.stream_chunk_chars)
+        ]
+        for chunk in chunks:
+            await asyncio.sleep(latency / len(chunks))
+            yield chunk
+
+def create_backend(timeout: int = 60, executor: Optional[OcrExecutor] = None) -> OcrBackend:
+    """
+    Create the OCR backend selected by the OCR_BACKEND environment variable.
+
+    "gemini" (default) calls the Gemini API. "replay" serves recorded responses and
+    reads OCR_REPLAY_DIR, OCR_REPLAY_LATENCY_MS, OCR_REPLAY_LATENCY_JITTER_MS,
+    OCR_REPLAY_ERROR_RATE, OCR_REPLAY_429_RATE and OCR_REPLAY_SEED.
+
+    Args:
+        timeout: Timeout in seconds for API calls
+        executor: Pool for the Gemini backend's blocking image work in async calls
+
+    Returns:
+        The configured backend
+    """
+    backend_name = os.getenv("OCR_BACKEND", "gemini").lower()
+
+    if backend_name == "gemini":
+        return GeminiBackend(
+            timeout=timeout,
+            model=os.getenv("GEMINI_MODEL", DEFAULT_MODEL),
+            inline_max_bytes=int(os.getenv("GEMINI_INLINE_MAX_BYTES", str(4 * 1024 * 1024))),
+            upload_ttl_seconds=float(os.getenv("GEMINI_UPLOAD_TTL_SECONDS", str(24 * 3600))),
+            context_cache_ttl_seconds=float(os.getenv("GEMINI_CONTEXT_CACHE_TTL_SECONDS", "3600")),
+            executor=executor
+        )
+    if backend_name == "replay":
+        return ReplayBackend(
+            recordings_dir=os.getenv("OCR_REPLAY_DIR", "evaluations"),
+            latency_ms=float(os.getenv("OCR_REPLAY_LATENCY_MS", "0")),
+            latency_jitter_ms=float(os.getenv("OCR_REPLAY_LATENCY_JITTER_MS", "0")),
+            error_rate=float(os.getenv("OCR_REPLAY_ERROR_RATE", "0")),
+            rate_limit_rate=float(os.getenv("OCR_REPLAY_429_RATE", "0")),
+            seed=int(os.getenv("OCR_REPLAY_SEED", "0")),
+            uncached_prefix_latency_ms=float(os.getenv("OCR_REPLAY_UNCACHED_PREFIX_LATENCY_MS", "0"))
+        )
+
+    raise ValueError(f"Unknown OCR_BACKEND: {backend_name}. Supported backends: gemini, replay")
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import PIL.Image
+
+from src.image_store import ImageBytes
+
+
+def hash_image(image: Union[PIL.Image.Image, ImageBytes, str, Path]) -> str:
+    """
+    Compute a SHA-256 content hash for an image.
+
+    Args:
+        image: A PIL Image, in-memory image bytes or a path to an image file
+
+    Returns:
+        Hex digest of the image content
+    """
+    if isinstance(image, ImageBytes):
+        return image.digest()
+    digest = hashlib.sha256()
+    if isinstance(image, PIL.Image.Image):
+        digest.update(f"{image.mode}:{image.size}".encode())
+        digest.update(image.tobytes())
+    else:
+        with open(image, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text(text: Optional[str]) -> str:
+    """Compute a SHA-256 hex digest for a (possibly empty) string."""
+    return hashlib.sha256((text or "").encode('utf-8')).hexdigest()
+
+
+class OcrResultCache:
+    """
+    Content-addressed cache of OCR results.
+
+    Results are keyed by image hash, prompt hash, model and reference text. Lookups
+    go to an in-memory LRU tier first and fall back to an on-disk SQLite tier,
+    which is evicted least-recently-used first once it exceeds max_disk_bytes.
+    """
+
+    def __init__(self, db_path: Union[str, Path] = "ocr_cache.db",
+                 max_memory_entries: int = 1024, max_disk_bytes: int = 512 * 1024 * 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: Path of the SQLite file backing the disk tier
+            max_memory_entries: Maximum number of results kept in memory
+            max_disk_bytes: Size budget for stored results on disk
+        """
+        self.db_path = str(db_path)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ocr_results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_ocr_results_last_access ON ocr_results (last_access)"
+        )
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM ocr_results"
+        ).fetchone()[0]
+
+        self.stats = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'evictions': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> Optional["OcrResultCache"]:
+        """
+        Build a cache from environment variables, or return None if disabled.
+
+        OCR_CACHE_ENABLED (default "true"), OCR_CACHE_PATH (default "ocr_cache.db"),
+        OCR_CACHE_MEMORY_ENTRIES (default 1024) and OCR_CACHE_MAX_MB (default 512).
+        """
+        if os.getenv("OCR_CACHE_ENABLED", "true").lower() in ("0", "false", "no"):
+            return None
+        return cls(
+            db_path=os.getenv("OCR_CACHE_PATH", "ocr_cache.db"),
+            max_memory_entries=int(os.getenv("OCR_CACHE_MEMORY_ENTRIES", "1024")),
+            max_disk_bytes=int(os.getenv("OCR_CACHE_MAX_MB", "512")) * 1024 * 1024
+        )
+
+    @staticmethod
+    def make_key(image_hash: str, prompt: str, model: str, reference_text: Optional[str]) -> str:
+        """Build the cache key for one OCR request."""
+        parts = [image_hash, hash_text(prompt), model, hash_text(reference_text)]
+        return hashlib.sha256("|".join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the cached result for key, or None on a miss."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.stats['hits'] += 1
+                self.stats['memory_hits'] += 1
+                return self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value FROM ocr_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE ocr_results SET last_access = ? WHERE key = ?", (time.time(), key)
+            )
+            self._conn.commit()
+            result = json.loads(row[0])
+            self._remember(key, result)
+            self.stats['hits'] += 1
+            self.stats['disk_hits'] += 1
+            return result
+
+    def put(self, key: str, result: Dict):
+        """Store a result in both tiers, evicting old disk entries if over budget."""
+        value = json.dumps(result, ensure_ascii=False)
+        size = len(value.encode('utf-8'))
+
+        with self._lock:
+            self._remember(key, result)
+
+            previous = self._conn.execute(
+                "SELECT size FROM ocr_results WHERE key = ?", (key,)
+            ).fetchone()
+            if previous:
+                self._disk_bytes -= previous[0]
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time())
+            )
+            self._disk_bytes += size
+            self.stats['writes'] += 1
+            self._evict()
+            self._conn.commit()
+
+    def _remember(self, key: str, result: Dict):
+        """Insert into the memory tier, dropping the least recently used entry if full."""
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Delete least recently used disk entries until within max_disk_bytes."""
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM ocr_results ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM ocr_results WHERE key = ?", (key,))
+                self._memory.pop(key, None)
+                self._disk_bytes -= size
+                self.stats['evictions'] += 1
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+
+    def get_stats(self) -> Dict:
+        """Return hit/miss counters along with current tier sizes."""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_bytes': self._disk_bytes
+            }
+
+    def clear(self):
+        """Remove every cached result from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM ocr_results")
+            self._conn.commit()
+            self._disk_bytes = 0
+
+    def close(self):
+        """Close the underlying SQLite connection."""
+        with self._lock:
+            self._conn.close()
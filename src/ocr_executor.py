@@ -0,0 +1,120 @@
+import asyncio
+import concurrent.futures
+import os
+import threading
+import time
+from typing import Callable, Dict, TypeVar
+
+from src.hedging import LatencyTracker
+
+T = TypeVar("T")
+
+
+class OcrExecutor:
+    """
+    Thread pool reserved for the blocking parts of OCR and image handling.
+
+    Result cache lookups, image hashing, response parsing and image store
+    writes run here instead of on the event loop or its default executor.
+    The pool is sized for the OCR pipeline, so a burst of evaluations cannot
+    starve other users of the default executor (file responses, DB work),
+    and they cannot starve OCR. Queue depth and the time work waits for a
+    thread are tracked, to show when the pool is too small.
+    """
+
+    def __init__(self, max_workers: int = 8, name: str = "ocr"):
+        """
+        Initialize the executor.
+
+        Args:
+            max_workers: Threads in the pool
+            name: Thread name prefix
+        """
+        self.max_workers = max(max_workers, 1)
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.wait_latency = LatencyTracker()
+        self.run_latency = LatencyTracker()
+        self._closed = False
+
+        self.stats = {
+            'queued': 0,
+            'running': 0,
+            'max_queued': 0,
+            'completed': 0,
+            'failed': 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "OcrExecutor":
+        """Build an executor with OCR_EXECUTOR_WORKERS threads (default 8)."""
+        return cls(max_workers=int(os.getenv("OCR_EXECUTOR_WORKERS", "8")))
+
+    def _call(self, submitted: float, fn: Callable[..., T], args, kwargs) -> T:
+        """Run one job on a pool thread, recording how long it waited and ran."""
+        started = time.perf_counter()
+        with self._lock:
+            self.stats['queued'] -= 1
+            self.stats['running'] += 1
+        self.wait_latency.record((started - submitted) * 1000)
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            with self._lock:
+                self.stats['failed'] += 1
+            raise
+        else:
+            with self._lock:
+                self.stats['completed'] += 1
+        finally:
+            self.run_latency.record((time.perf_counter() - started) * 1000)
+            with self._lock:
+                self.stats['running'] -= 1
+        return result
+
+    def _dropped(self, future: concurrent.futures.Future):
+        """Uncount a job that was cancelled before a thread picked it up."""
+        if future.cancelled():
+            with self._lock:
+                self.stats['queued'] -= 1
+
+    async def run(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        """
+        Run a blocking function on the pool and await its result.
+
+        Raises:
+            RuntimeError: If the executor has been shut down
+        """
+        if self._closed:
+            raise RuntimeError("OCR executor has been shut down")
+        with self._lock:
+            self.stats['queued'] += 1
+            self.stats['max_queued'] = max(self.stats['max_queued'], self.stats['queued'])
+        future = self._pool.submit(self._call, time.perf_counter(), fn, args, kwargs)
+        # Queued jobs dropped by shutdown never reach _call
+        future.add_done_callback(self._dropped)
+        return await asyncio.wrap_future(future)
+
+    def get_stats(self) -> Dict:
+        """Return queue depth, job counters and wait/run latency percentiles."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['workers'] = self.max_workers
+        stats['wait_ms'] = self.wait_latency.summary()
+        stats['run_ms'] = self.run_latency.summary()
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """
+        Stop accepting work and drop queued jobs.
+
+        Args:
+            wait: Block until running jobs have finished
+        """
+        self._closed = True
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    async def aclose(self):
+        """Shut down without blocking the event loop while running jobs finish."""
+        self._closed = True
+        await asyncio.to_thread(self._pool.shutdown, True, cancel_futures=True)
@@ -0,0 +1,97 @@
+import json
+import os
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+# USD per million tokens: (uncached input, output, cached input).
+# Override or extend with OCR_MODEL_PRICES='{"model": [input, output, cached]}'.
+MODEL_PRICES: Dict[str, tuple] = {
+    "gemini-2.5-pro": (1.25, 10.00, 0.31),
+    "gemini-2.5-flash-lite": (0.10, 0.40, 0.025),
+    "gemini-2.5-flash": (0.30, 2.50, 0.075),
+    "gemini-2.0-flash-lite": (0.075, 0.30, 0.01875),
+    "gemini-2.0-flash": (0.10, 0.40, 0.025),
+    "gemini-1.5-pro": (1.25, 5.00, 0.3125),
+    "gemini-1.5-flash": (0.075, 0.30, 0.01875),
+}
+
+
+def price_for_model(model: str) -> Optional[tuple]:
+    """
+    Look up the per-million-token prices for a model.
+
+    Versioned names such as "gemini-2.0-flash-exp" use the price of the
+    longest matching prefix.
+
+    Args:
+        model: Model name as sent to the API
+
+    Returns:
+        (input, output, cached input) prices, or None for an unknown model
+    """
+    prices = dict(MODEL_PRICES)
+    overrides = os.getenv("OCR_MODEL_PRICES")
+    if overrides:
+        prices.update({name: tuple(values) for name, values in json.loads(overrides).items()})
+
+    matches = [name for name in prices if model.startswith(name)]
+    if not matches:
+        return None
+    return prices[max(matches, key=len)]
+
+
+class OcrUsage(BaseModel):
+    """Timing, token counts and cost of a single OCR call."""
+    model: str
+    cache_hit: bool = False
+    hedged: bool = False
+    queue_ms: int = 0
+    latency_ms: Optional[int] = None
+    ttfb_ms: Optional[int] = None
+    prompt_tokens: int = 0
+    candidates_tokens: int = 0
+    cached_tokens: int = 0
+    total_tokens: int = 0
+    cost_estimate: Optional[float] = None
+
+    def record_usage_metadata(self, usage_metadata) -> None:
+        """Copy token counts from a Gemini response's usage_metadata."""
+        if usage_metadata is None:
+            return
+        self.prompt_tokens = usage_metadata.prompt_token_count or 0
+        # Thinking tokens are billed as output
+        self.candidates_tokens = (
+            (usage_metadata.candidates_token_count or 0)
+            + (getattr(usage_metadata, "thoughts_token_count", None) or 0)
+        )
+        self.cached_tokens = usage_metadata.cached_content_token_count or 0
+        self.total_tokens = usage_metadata.total_token_count or (self.prompt_tokens + self.candidates_tokens)
+
+    def copy_tokens_from(self, other: "OcrUsage") -> None:
+        """Take the token counts of the attempt that produced the result."""
+        self.prompt_tokens = other.prompt_tokens
+        self.candidates_tokens = other.candidates_tokens
+        self.cached_tokens = other.cached_tokens
+        self.total_tokens = other.total_tokens
+
+    def compute_cost(self) -> Optional[float]:
+        """Set and return cost_estimate in USD from the model's price table entry."""
+        if self.cache_hit:
+            self.cost_estimate = 0.0
+            return self.cost_estimate
+
+        prices = price_for_model(self.model)
+        if prices is None:
+            self.cost_estimate = None
+            return None
+
+        input_price, output_price, cached_price = prices
+        # prompt_tokens includes the cached tokens, which are billed at the cached rate
+        uncached_prompt_tokens = max(self.prompt_tokens - self.cached_tokens, 0)
+        self.cost_estimate = (
+            uncached_prompt_tokens * input_price
+            + self.cached_tokens * cached_price
+            + self.candidates_tokens * output_price
+        ) / 1_000_000
+        return self.cost_estimate
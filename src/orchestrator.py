@@ -1,15 +1,27 @@
 import csv
 import os
-import requests
 import json
 from datetime import datetime
 import shutil
 import logging
-from typing import Dict, List, Optional, Tuple
+import mimetypes
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
 from pathlib import Path
 import asyncio
 import aiohttp
+from src.csv_stream import CsvSink, read_header, read_rows
+from src.download_cache import DownloadCache
+from src.evaluation_shards import EvaluationShards
 from src.gemini_ocr import GeminiOCR
+from src.http_client import DownloadSettings, create_async_session, create_sync_session
+from src.image_store import ImageBytes, get_image_store
+from src.ocr_executor import OcrExecutor
+from src.ocr_usage import OcrUsage
+from src.prompt_registry import OUTPUT_TRANSCRIPTION
+from src.retry_policy import RetryBudget, RetryPolicy, check_ocr_result, is_retryable
+from src.rate_limiter import RateLimiter
+from src.run_journal import RunJournal
+from src.sharding import launch_shards, merge_shards, parse_shard, shard_base_path, shard_label, shard_of
 
 # Configure logging
 logging.basicConfig(
@@ -21,6 +33,16 @@ logging.basicConfig(
     ]
 )
 
+# Columns ImageProcessor adds to each row of the updated and failed CSVs
+RESULT_COLUMNS = [
+    'OCR Output (Gemini - Flash)', 'Word Evaluations', 'Accuracy', 'Correct Words',
+    'Total Words', 'Evaluation JSON', 'Local Image', 'Processing Status', 'Retries'
+]
+
+# Rows the concurrent pipeline holds per worker, in flight or waiting for an
+# earlier row to finish so results can be written in input order
+ROWS_IN_MEMORY_PER_WORKER = 8
+
 class OcrOrchestrator:
     """Async orchestrator for OCR evaluations."""
     
@@ -35,62 +57,225 @@ class OcrOrchestrator:
         for directory in [self.images_dir, self.evaluations_dir]:
             directory.mkdir(parents=True, exist_ok=True)
         
+        # Blocking OCR and image work runs on a pool of its own, not the default executor
+        self.executor = OcrExecutor.from_env()
+        
         # Initialize OCR
-        self.ocr = GeminiOCR()
+        self.ocr = GeminiOCR(executor=self.executor)
+        
+        # One pooled HTTP session for all downloads, opened by start()
+        self.download_settings = DownloadSettings.from_env()
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        self.download_cache = DownloadCache.from_env(self.images_dir)
+        
+        # Background writes of in-memory downloads to the image store, by digest
+        self._pending_persists: Dict[str, asyncio.Task] = {}
+        
+        # Retries with backoff, and per-upstream circuit breakers shared by all evaluations
+        self.retry_policy = RetryPolicy.from_env()
         
         logging.info("Initialized OcrOrchestrator")
     
+    async def start(self):
+        """Open the pooled download session. Called lazily by the first download if not called."""
+        if self.http_session is None or self.http_session.closed:
+            self.http_session = create_async_session(self.download_settings)
+    
+    async def close(self):
+        """
+        Finish pending image store writes and release the download session and
+        OCR resources, then shut the OCR executor down once its running jobs finish.
+        """
+        if self._pending_persists:
+            await asyncio.gather(*self._pending_persists.values(), return_exceptions=True)
+        if self.http_session is not None:
+            await self.http_session.close()
+            self.http_session = None
+        if self.download_cache is not None:
+            self.download_cache.close()
+        await self.ocr.aclose()
+        await self.executor.aclose()
+    
     async def download_image_async(self, url: str, image_id: str) -> Optional[str]:
-        """Download image asynchronously"""
+        """Download image asynchronously to a file, revalidating cached copies"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    response.raise_for_status()
-                    
+            return await self.fetch_image_async(url, image_id, in_memory=False)
+        except Exception:
+            return None
+    
+    async def fetch_image_async(
+        self, url: str, image_id: str, in_memory: bool = True
+    ) -> Union[ImageBytes, str]:
+        """
+        Fetch an image over the shared session.
+        
+        With in_memory, responses up to download_settings.memory_max_bytes are
+        returned as ImageBytes without touching the disk; larger or unsized
+        responses that outgrow the limit spill to a file. A cached copy that the
+        server reports unchanged (304) is returned as its path. File writes and
+        download cache lookups run on the OCR executor, off the event loop.
+        
+        Returns:
+            ImageBytes or a local file path; download errors are raised
+        """
+        cache = self.download_cache
+        memory_max_bytes = self.download_settings.memory_max_bytes if in_memory else 0
+        try:
+            await self.start()
+            headers = await self.executor.run(cache.validators, url) if cache is not None else {}
+            async with self.http_session.get(url, headers=headers) as response:
+                if response.status == 304 and cache is not None:
+                    cached_path = await self.executor.run(cache.not_modified, url)
+                    if cached_path is None:
+                        raise Exception("Cached image was evicted during revalidation")
+                    logging.info(f"Image {image_id} not modified, using {cached_path}")
+                    return cached_path
+                response.raise_for_status()
+                
+                # Keep small images in memory; chunks read past the limit go to the file
+                chunks: List[bytes] = []
+                if memory_max_bytes and (response.content_length or 0) <= memory_max_bytes:
+                    size = 0
+                    async for chunk in response.content.iter_chunked(65536):
+                        chunks.append(chunk)
+                        size += len(chunk)
+                        if size > memory_max_bytes:
+                            break
+                    else:
+                        mime_type = response.content_type
+                        if not mime_type.startswith("image/"):
+                            mime_type = mimetypes.guess_type(url)[0] or "image/jpeg"
+                        logging.info(f"Downloaded image {image_id} into memory ({size} bytes)")
+                        return ImageBytes(b"".join(chunks), mime_type=mime_type, name=url)
+                
+                if cache is not None:
+                    filepath = cache.temp_path(url)
+                else:
                     # Create unique filename
                     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                     filename = f"image_{image_id}_{timestamp}.jpg"
                     filepath = self.images_dir / filename
-                    
-                    # Write file
-                    with open(filepath, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(8192):
-                            f.write(chunk)
-                    
-                    logging.info(f"Downloaded image {image_id} to {filepath}")
-                    return str(filepath)
-                    
+                
+                # Write file
+                f = await self.executor.run(open, filepath, 'wb')
+                try:
+                    if chunks:
+                        await self.executor.run(f.write, b"".join(chunks))
+                    async for chunk in response.content.iter_chunked(65536):
+                        await self.executor.run(f.write, chunk)
+                finally:
+                    await self.executor.run(f.close)
+                
+                if cache is not None:
+                    filepath = await self.executor.run(
+                        cache.store,
+                        url, filepath, response.headers.get('ETag'), response.headers.get('Last-Modified')
+                    )
+                
+                logging.info(f"Downloaded image {image_id} to {filepath}")
+                return str(filepath)
+                
         except Exception as e:
             logging.error(f"Failed to download image {image_id}: {str(e)}")
-            return None
+            raise
+    
+    def persist_image(self, image: ImageBytes) -> str:
+        """
+        Write an in-memory image to the image store in the background.
+        
+        Returns:
+            The image's digest; await wait_persisted(digest) before relying on the blob
+        """
+        digest = image.digest()
+        if digest not in self._pending_persists:
+            task = asyncio.create_task(self.executor.run(get_image_store().put_bytes, image.data))
+            self._pending_persists[digest] = task
+            task.add_done_callback(lambda _: self._pending_persists.pop(digest, None))
+        return digest
+    
+    async def wait_persisted(self, digest: str) -> bool:
+        """Wait for a background store write started by persist_image; True if the blob is stored."""
+        task = self._pending_persists.get(digest)
+        if task is not None:
+            try:
+                await asyncio.shield(task)
+            except Exception as e:
+                logging.error(f"Failed to store image {digest}: {str(e)}")
+                return False
+        return get_image_store().exists(digest)
     
-    async def process_single_evaluation(self, image_url: str, reference_text: str, image_number: str) -> Dict:
-        """Process a single image evaluation asynchronously"""
+    async def process_single_evaluation(
+        self,
+        image_url: str,
+        reference_text: str,
+        image_number: str,
+        bypass_cache: bool = False,
+        prompt_version: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        persist_image: bool = False
+    ) -> Dict:
+        """
+        Process a single image evaluation asynchronously.
+        
+        When progress_callback is given, OCR output is streamed and the callback is
+        awaited with (words evaluated, words in reference) after every word.
+        prompt_version selects a PromptVersion already loaded into ocr.prompts.
+        
+        Normal-sized images go from the download straight into the OCR request
+        without being written to disk. With persist_image they are also written
+        to the image store in the background, and the result carries their
+        content_hash (see wait_persisted).
+        
+        Transient download and OCR errors are retried under retry_policy; the
+        result's 'retries' counts them, whether or not the evaluation succeeded.
+        """
+        counts = {'retries': 0}
         try:
             logging.info(f"Processing evaluation for image {image_number}")
             
             # Download image
-            local_image_path = await self.download_image_async(image_url, image_number)
-            if not local_image_path:
-                return {
-                    'success': False,
-                    'error': 'Failed to download image'
-                }
+            image = await self.retry_policy.call_async(
+                lambda: self.fetch_image_async(image_url, image_number), 'download', counts=counts
+            )
+            local_image_path = image if isinstance(image, str) else None
+            content_hash = None
+            if isinstance(image, ImageBytes) and persist_image:
+                content_hash = self.persist_image(image)
             
-            # Run OCR in thread pool since it's sync
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None, 
-                self.ocr.extract_text, 
-                local_image_path, 
-                reference_text
+            # Transcription-only prompts are scored once the whole text is in,
+            # so there is nothing to stream word by word
+            streaming = (
+                progress_callback is not None
+                and self.ocr.prompts.get(prompt_version).output_format != OUTPUT_TRANSCRIPTION
             )
             
-            if not result:
-                return {
-                    'success': False,
-                    'error': 'OCR returned no result'
-                }
+            async def stream_ocr() -> Dict:
+                # A retried stream starts over, so progress restarts from the first word
+                total_reference_words = len(reference_text.split())
+                word_evaluations = []
+                usage = OcrUsage(model=self.ocr.model)
+                async for word_evaluation in self.ocr.extract_text_stream(
+                    image, reference_text,
+                    bypass_cache=bypass_cache, prompt_version=prompt_version, usage=usage
+                ):
+                    word_evaluations.append(word_evaluation)
+                    await progress_callback(len(word_evaluations), total_reference_words)
+                result = self.ocr.summarize_evaluations(word_evaluations)
+                result['usage'] = usage.dict()
+                return result
+            
+            async def call_ocr() -> Dict:
+                return check_ocr_result(await self.ocr.extract_text_async(
+                    image, reference_text,
+                    bypass_cache=bypass_cache, prompt_version=prompt_version
+                ))
+            
+            # Run OCR on the native async client; concurrency is bounded by GeminiOCR
+            result = await self.retry_policy.call_async(
+                stream_ocr if streaming else call_ocr, 'ocr', counts=counts
+            )
+            if not streaming and progress_callback is not None:
+                await progress_callback(result['total_words'], result['total_words'])
             
             # Return evaluation data
             return {
@@ -102,88 +287,161 @@ class OcrOrchestrator:
                     'correct_words': result.get('correct_words', 0),
                     'total_words': result.get('total_words', 0)
                 },
-                'local_image_path': local_image_path
+                'usage': result.get('usage'),
+                'local_image_path': local_image_path,
+                'content_hash': content_hash,
+                'retries': counts['retries']
             }
             
         except Exception as e:
             logging.error(f"Error processing evaluation for image {image_number}: {str(e)}")
             return {
                 'success': False,
-                'error': str(e)
+                'error': str(e),
+                'retryable': is_retryable(e),
+                'retries': counts['retries']
             }
 
 # Maintain backward compatibility with existing ImageProcessor
 class ImageProcessor:
     """Orchestrator for processing images from a CSV file using Gemini OCR."""
     
-    def __init__(self, csv_path: str, max_retries: int = 3):
+    def __init__(
+        self,
+        csv_path: str,
+        max_retries: Optional[int] = None,
+        bypass_cache: bool = False,
+        workers: int = 1,
+        progress_interval: float = 10.0,
+        resume: bool = False,
+        shard: Optional[Tuple[int, int]] = None
+    ):
         """
         Initialize the image processor.
         
         Args:
             csv_path: Path to the CSV file containing image URLs
-            max_retries: Maximum number of retries for failed processing
+            max_retries: Attempts per download or OCR call, including the first
+                (default RETRY_MAX_ATTEMPTS, 3). Only transient errors are retried.
+            bypass_cache: Always call the OCR API instead of reusing cached results
+            workers: Rows processed concurrently. 1 (default) processes rows one at a
+                time; more runs the download/OCR pipeline in process_csv_async.
+            progress_interval: Seconds between throughput reports in concurrent mode
+            resume: Skip rows that already succeeded according to the run journal
+                left by an earlier, interrupted run over the same CSV
+            shard: (index, count) to process only the rows of one of count shards,
+                as partitioned by shard_of(). The shard writes its own outputs and
+                journal, uses 1/count of the Gemini quotas, and merge_shards()
+                combines the outputs once every shard has finished.
         """
         self.csv_path = csv_path
-        self.max_retries = max_retries
+        self.retry_policy = RetryPolicy.from_env(max_attempts=max_retries)
+        self.max_retries = self.retry_policy.max_attempts
+        self.retry_budget: Optional[RetryBudget] = None
+        self.bypass_cache = bypass_cache
+        self.workers = max(workers, 1)
+        self.progress_interval = progress_interval
+        self.resume = resume
+        self.shard = shard
+        self.output_base = shard_base_path(csv_path, *shard) if shard else os.path.splitext(csv_path)[0]
+        self.journal_path = f"{self.output_base}_journal.db"
+        self.journal: Optional[RunJournal] = None
         
         # Set up directories relative to the workspace root
         workspace_root = Path(os.getcwd())
+        self.workspace_root = workspace_root
         self.images_dir = workspace_root / "images"
         self.evaluations_dir = workspace_root / "evaluations"
         self.failed_dir = workspace_root / "failed"
+        if shard:
+            # Shards running side by side keep separate caches and evaluation indexes
+            self.images_dir = self.images_dir / shard_label(*shard)
+            self.evaluations_dir = self.evaluations_dir / shard_label(*shard)
         
         # Create necessary directories
         for directory in [self.images_dir, self.evaluations_dir, self.failed_dir]:
             directory.mkdir(parents=True, exist_ok=True)
         
-        # Initialize OCR
-        self.ocr = GeminiOCR()
+        # Blocking downloads and OCR image work run on pools of their own, not the
+        # default executor; downloads get one thread per concurrent row
+        self.executor = OcrExecutor.from_env()
+        self.download_executor = OcrExecutor(max_workers=self.workers, name="download")
+        
+        # Initialize OCR; a shard takes its part of the quotas shared by all shards
+        rate_limiter = RateLimiter.from_env(share=1 / shard[1]) if shard else None
+        self.ocr = GeminiOCR(rate_limiter=rate_limiter, executor=self.executor)
+        
+        # Pooled keep-alive session shared by all download threads
+        self.download_settings = DownloadSettings.from_env()
+        self.http_session = create_sync_session(self.download_settings)
+        self.download_cache = DownloadCache.from_env(self.images_dir)
+        self.evaluation_shards = EvaluationShards.from_env(self.evaluations_dir)
         
         # Track processing statistics
         self.stats = {
             'total': 0,
+            'resumed': 0,
             'successful': 0,
             'failed': 0,
-            'retries': 0
+            'retries': 0,
+            'ocr_latency_ms': 0,
+            'tokens': 0,
+            'cost': 0.0
         }
         
-        # Track failed entries for retry
-        self.failed_entries: List[Dict] = []
-        
         logging.info(f"Initialized ImageProcessor with CSV: {csv_path}")
         logging.info(f"Images directory: {self.images_dir}")
         logging.info(f"Evaluations directory: {self.evaluations_dir}")
         logging.info(f"Max retries: {self.max_retries}")
+        logging.info(f"Workers: {self.workers}")
+        if shard:
+            logging.info(f"Shard: {shard[0]}/{shard[1]}")
     
-    def download_image(self, url: str, image_id: str) -> Optional[str]:
-        """Download image and save with unique name"""
+    def download_image(self, url: str, image_id: str) -> str:
+        """Download image, or revalidate the cached copy with a conditional GET; errors are raised"""
+        cache = self.download_cache
         try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-            
-            # Create unique filename using image ID and timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"image_{image_id}_{timestamp}.jpg"
-            filepath = self.images_dir / filename
-            
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
+            headers = cache.validators(url) if cache is not None else {}
+            with self.http_session.get(
+                url, stream=True, headers=headers, timeout=self.download_settings.requests_timeout
+            ) as response:
+                if response.status_code == 304 and cache is not None:
+                    cached_path = cache.not_modified(url)
+                    if cached_path is None:
+                        raise Exception("Cached image was evicted during revalidation")
+                    logging.info(f"Image {image_id} not modified, using {cached_path}")
+                    return cached_path
+                response.raise_for_status()
+                
+                if cache is not None:
+                    filepath = cache.temp_path(url)
+                else:
+                    # Create unique filename using image ID and timestamp
+                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                    filename = f"image_{image_id}_{timestamp}.jpg"
+                    filepath = self.images_dir / filename
+                
+                with open(filepath, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        f.write(chunk)
+                
+                if cache is not None:
+                    filepath = cache.store(
+                        url, filepath, response.headers.get('ETag'), response.headers.get('Last-Modified')
+                    )
             
             logging.info(f"Successfully downloaded image {image_id} to {filepath}")
             return str(filepath)
             
         except Exception as e:
             logging.error(f"Failed to download image {image_id}: {str(e)}")
-            return None
+            raise
     
-    def save_evaluation_json(self, image_number: str, image_url: str, reference_text: str, 
-                           transcribed_text: str, evaluations: List[Dict], local_image_path: str) -> str:
-        """Save evaluation results to JSON file"""
+    def save_evaluation(self, image_number: str, image_url: str, reference_text: str,
+                        transcribed_text: str, evaluations: List[Dict], local_image_path: str,
+                        usage: Optional[Dict] = None) -> str:
+        """Append the evaluation record to the current JSONL shard and return its location"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"evaluation_{image_number}_{timestamp}.json"
-        filepath = self.evaluations_dir / filename
         
         # Calculate accuracy metrics
         total_words = len(evaluations)
@@ -205,135 +463,449 @@ class ImageProcessor:
                     "total_words": total_words,
                     "correct_words": correct_words,
                     "accuracy": accuracy
-                }
+                },
+                "usage": usage
             }
         }
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        location = self.evaluation_shards.append(image_number, data)
+        if self.shard:
+            location = f"{shard_label(*self.shard)}/{location}"
+        logging.info(f"Saved evaluation for image {image_number} to {location}")
+        return location
+    
+    def save_evaluation_json(self, *args, **kwargs) -> str:
+        """Former name of save_evaluation, kept for existing callers; returns the record's location"""
+        return self.save_evaluation(*args, **kwargs)
+    
+    def _record_success(self, row: Dict, result: Dict, local_image_path: str) -> Dict:
+        """Save the evaluation JSON, add usage to stats and fill in the row's result columns"""
+        image_number = row['#']
+        evaluation_location = self.save_evaluation(
+            image_number, row['Link'], row['Text'],
+            result['full_text'], result['evaluations'],
+            local_image_path, usage=result.get('usage')
+        )
+        
+        usage = result.get('usage') or {}
+        self.stats['ocr_latency_ms'] += usage.get('latency_ms') or 0
+        self.stats['tokens'] += usage.get('total_tokens') or 0
+        self.stats['cost'] += usage.get('cost_estimate') or 0.0
+        
+        # Update row with results
+        row['OCR Output (Gemini - Flash)'] = result['full_text']
+        row['Word Evaluations'] = json.dumps(result['evaluations'], ensure_ascii=False)
+        row['Accuracy'] = f"{result['accuracy']:.2f}%"
+        row['Correct Words'] = result['correct_words']
+        row['Total Words'] = result['total_words']
+        row['Evaluation JSON'] = evaluation_location
+        row['Local Image'] = str(Path(local_image_path).relative_to(self.images_dir))
+        
+        logging.info(f"Successfully processed image {image_number}")
+        return row
+    
+    def _finish_row(self, success: bool, row: Dict, retries: int = 0) -> Tuple[bool, Dict]:
+        """Count the row's retries and journal it so an interrupted run can resume after it"""
+        row['Retries'] = retries
+        self.stats['retries'] += retries
+        if self.journal is not None:
+            self.journal.record(success, row)
+        return success, row
+    
+    def _record_failure(self, row: Dict, error: Exception, local_image_path: Optional[str], attempts: int) -> Dict:
+        """Move the image to the failed directory and mark the row as failed"""
+        # Move failed image to failed directory if it exists; cached images
+        # stay in the download cache, so copy those instead
+        if local_image_path and os.path.exists(local_image_path):
+            failed_path = self.failed_dir / Path(local_image_path).name
+            if self.download_cache is not None:
+                shutil.copy2(local_image_path, failed_path)
+            else:
+                shutil.move(local_image_path, failed_path)
+            # failed/ sits beside images/, not inside it
+            row['Local Image'] = str(failed_path.relative_to(self.workspace_root))
         
-        logging.info(f"Saved evaluation for image {image_number} to {filepath}")
-        return filename
+        if is_retryable(error):
+            row['Processing Status'] = f"Failed after {attempts} attempts: {str(error)}"
+        else:
+            row['Processing Status'] = f"Failed (not retryable): {str(error)}"
+        return row
     
-    def process_single_image(self, row: Dict, retry_count: int = 0) -> Tuple[bool, Dict]:
-        """Process a single image with retry logic"""
+    def process_single_image(self, row: Dict) -> Tuple[bool, Dict]:
+        """Process a single image, retrying transient download and OCR errors"""
         image_number = row['#']
         image_url = row['Link']
         reference_text = row['Text']
+        local_image_path = None
+        download_counts, ocr_counts = {'retries': 0}, {'retries': 0}
         
-        logging.info(f"Processing image {image_number} (attempt {retry_count + 1}/{self.max_retries})")
+        logging.info(f"Processing image {image_number}")
         
         try:
             # Download image
-            local_image_path = self.download_image(image_url, image_number)
-            if not local_image_path:
-                raise Exception("Failed to download image")
+            local_image_path = self.retry_policy.call(
+                lambda: self.download_image(image_url, image_number),
+                'download', self.retry_budget, download_counts
+            )
             
             # Process image
-            result = self.ocr.extract_text(local_image_path, reference_text)
-            if not result:
-                raise Exception("OCR returned no result")
-            
-            # Save evaluation
-            evaluation_file = self.save_evaluation_json(
-                image_number, image_url, reference_text,
-                result['full_text'], result['evaluations'],
-                local_image_path
+            result = self.retry_policy.call(
+                lambda: check_ocr_result(
+                    self.ocr.extract_text(local_image_path, reference_text, bypass_cache=self.bypass_cache)
+                ),
+                'ocr', self.retry_budget, ocr_counts
             )
-            
-            # Update row with results
-            row['OCR Output (Gemini - Flash)'] = result['full_text']
-            row['Word Evaluations'] = json.dumps(result['evaluations'], ensure_ascii=False)
-            row['Accuracy'] = f"{result['accuracy']:.2f}%"
-            row['Correct Words'] = result['correct_words']
-            row['Total Words'] = result['total_words']
-            row['Evaluation JSON'] = evaluation_file
-            row['Local Image'] = str(Path(local_image_path).relative_to(self.images_dir))
-            
-            logging.info(f"Successfully processed image {image_number}")
-            return True, row
+            success, row = True, self._record_success(row, result, local_image_path)
             
         except Exception as e:
             logging.error(f"Error processing image {image_number}: {str(e)}")
+            counts = ocr_counts if local_image_path else download_counts
+            success, row = False, self._record_failure(row, e, local_image_path, counts['retries'] + 1)
+        
+        row['Retries'] = download_counts['retries'] + ocr_counts['retries']
+        return success, row
+    
+    async def _download_stage(self, rows_queue: asyncio.Queue, ocr_queue: asyncio.Queue, progress: Dict):
+        """Download worker: take rows, download their images and hand them to the OCR stage"""
+        while True:
+            index, row = await rows_queue.get()
+            progress['in_flight'] += 1
+            counts = {'retries': 0}
+            local_image_path, error = None, None
+            try:
+                # requests is blocking; keep it off the event loop
+                local_image_path = await self.retry_policy.call_async(
+                    lambda: self.download_executor.run(self.download_image, row['Link'], row['#']),
+                    'download', self.retry_budget, counts
+                )
+            except Exception as e:
+                error = e
+            await ocr_queue.put((index, row, local_image_path, error, counts['retries']))
+            rows_queue.task_done()
+    
+    async def _ocr_stage(self, ocr_queue: asyncio.Queue, complete: Callable[[int, Tuple[bool, Dict]], None], progress: Dict):
+        """OCR worker: evaluate downloaded images and pass each row's result to complete with its index"""
+        while True:
+            index, row, local_image_path, error, download_retries = await ocr_queue.get()
+            counts = {'retries': 0}
+            try:
+                if error is None:
+                    try:
+                        result = await self.retry_policy.call_async(
+                            lambda: self._extract_checked_async(local_image_path, row['Text']),
+                            'ocr', self.retry_budget, counts
+                        )
+                        outcome = self._finish_row(
+                            True, self._record_success(row, result, local_image_path),
+                            download_retries + counts['retries']
+                        )
+                    except Exception as e:
+                        logging.error(f"Error processing image {row['#']}: {str(e)}")
+                        error = e
+                        attempts = counts['retries'] + 1
+                else:
+                    attempts = download_retries + 1
+                if error is not None:
+                    progress['failed'] += 1
+                    outcome = self._finish_row(
+                        False, self._record_failure(row, error, local_image_path, attempts),
+                        download_retries + counts['retries']
+                    )
+            except Exception as e:
+                logging.error(f"Error recording result for image {row['#']}: {str(e)}")
+                row['Processing Status'] = f"Failed: {str(e)}"
+                outcome = self._finish_row(False, row, download_retries + counts['retries'])
+            finally:
+                progress['in_flight'] -= 1
+                progress['done'] += 1
+            complete(index, outcome)
+            ocr_queue.task_done()
+    
+    async def _extract_checked_async(self, local_image_path: str, reference_text: str) -> Dict:
+        """One async OCR attempt, raising on an error result"""
+        return check_ocr_result(await self.ocr.extract_text_async(
+            local_image_path, reference_text, bypass_cache=self.bypass_cache
+        ))
+    
+    async def _report_progress(self, progress: Dict, started: float):
+        """Log throughput, rows in flight and failures until cancelled"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            elapsed = loop.time() - started
+            logging.info(
+                f"Progress: {progress['done']}/{progress['read']} rows read, "
+                f"{progress['done'] / elapsed:.2f} rows/s, "
+                f"{progress['in_flight']} in flight, {progress['failed']} failed"
+            )
+    
+    def _start_row(self, row: Dict) -> Optional[Dict]:
+        """
+        Check a row against the journal before processing it.
+        
+        Returns:
+            The journaled result if resuming and the row already succeeded with
+            the same input; None if it must be processed, in which case the
+            run's retry budget grows to cover it
+        """
+        if self.resume:
+            entry = self.journal.get(row)
+            if entry and entry['success']:
+                self.stats['resumed'] += 1
+                return entry['row']
+        self.retry_budget.add_calls(1)
+        return None
+    
+    async def process_rows_async(
+        self, rows: Iterable[Dict], on_result: Optional[Callable[[bool, Dict], None]] = None
+    ) -> Optional[List[Tuple[bool, Dict]]]:
+        """
+        Process rows through a concurrent download -> OCR pipeline.
+        
+        workers download tasks and workers OCR tasks are connected by bounded
+        queues, so downloads run ahead of OCR by at most a few rows per worker.
+        rows is consumed lazily and at most ROWS_IN_MEMORY_PER_WORKER rows per
+        worker are held at a time, so a generator over a CSV of any length is
+        processed in bounded memory. Results are delivered in input order
+        regardless of completion order; rows finishing early wait for the ones
+        before them.
+        
+        Args:
+            rows: CSV rows to process, such as read_rows() over the input file
+            on_result: Called with (success, processed row) for each row, in input order
             
-            if retry_count < self.max_retries - 1:
-                logging.info(f"Retrying image {image_number} (attempt {retry_count + 2})")
-                return self.process_single_image(row, retry_count + 1)
-            else:
-                # Move failed image to failed directory if it exists
-                if 'local_image_path' in locals() and os.path.exists(local_image_path):
-                    failed_path = self.failed_dir / Path(local_image_path).name
-                    shutil.move(local_image_path, failed_path)
-                    row['Local Image'] = str(failed_path.relative_to(self.images_dir))
-                
-                row['Processing Status'] = f"Failed after {self.max_retries} attempts: {str(e)}"
-                return False, row
+        Returns:
+            (success, processed row) per input row, in input order, if on_result is None
+        """
+        results: List[Tuple[bool, Dict]] = []
+        deliver = on_result or (lambda success, row: results.append((success, row)))
+        
+        rows_queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        ocr_queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        window = asyncio.Semaphore(self.workers * ROWS_IN_MEMORY_PER_WORKER)
+        finished: Dict[int, Tuple[bool, Dict]] = {}
+        next_index = 0
+        progress = {'read': 0, 'done': 0, 'in_flight': 0, 'failed': 0}
+        started = asyncio.get_running_loop().time()
+        
+        def complete(index: int, outcome: Tuple[bool, Dict]):
+            """Hold a finished row until every row before it has been delivered"""
+            nonlocal next_index
+            finished[index] = outcome
+            while next_index in finished:
+                deliver(*finished.pop(next_index))
+                next_index += 1
+                window.release()
+        
+        async def feed():
+            # Take a slot before reading, so no row is read until it fits in memory
+            row_iterator = iter(rows)
+            index = 0
+            while True:
+                await window.acquire()
+                row = next(row_iterator, None)
+                if row is None:
+                    break
+                progress['read'] += 1
+                resumed = self._start_row(row)
+                if resumed is not None:
+                    progress['done'] += 1
+                    complete(index, (True, resumed))
+                else:
+                    await rows_queue.put((index, row))
+                index += 1
+            await rows_queue.join()
+            await ocr_queue.join()
+        
+        workers = [
+            asyncio.create_task(self._download_stage(rows_queue, ocr_queue, progress))
+            for _ in range(self.workers)
+        ] + [
+            asyncio.create_task(self._ocr_stage(ocr_queue, complete, progress))
+            for _ in range(self.workers)
+        ] + [asyncio.create_task(self._report_progress(progress, started))]
+        feeder = asyncio.create_task(feed())
+        
+        try:
+            # Workers only stop by raising, e.g. when writing a result fails
+            done, _ = await asyncio.wait([feeder, *workers], return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        finally:
+            for task in workers + [feeder]:
+                task.cancel()
+            await asyncio.gather(*workers, feeder, return_exceptions=True)
+        
+        elapsed = asyncio.get_running_loop().time() - started
+        if elapsed > 0:
+            logging.info(
+                f"Processed {progress['read']} rows in {elapsed:.1f}s ({progress['read'] / elapsed:.2f} rows/s)"
+            )
+        return results if on_result is None else None
     
     def process_csv(self):
-        """Process all images in CSV with retry logic"""
-        logging.info("Starting CSV processing")
+        """
+        Process all images in CSV with retry logic.
         
-        # Read CSV
-        with open(self.csv_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
+        Rows are read lazily and written to the updated CSV, and failed rows to
+        the failed CSV, as they finish and in input order. Neither the input
+        nor the results are held in memory, so manifests of any length can be
+        processed; the outputs only replace earlier ones once the run completes.
+        """
+        logging.info("Starting CSV processing")
+        output_csv = f"{self.output_base}_updated.csv"
+        failed_csv = f"{self.output_base}_failed.csv"
         
-        self.stats['total'] = len(rows)
-        logging.info(f"Found {self.stats['total']} images to process")
+        # Output columns are fixed up front, since rows are written before later ones are seen
+        fieldnames = list(dict.fromkeys(read_header(self.csv_path) + RESULT_COLUMNS))
+        updated_sink = CsvSink(output_csv, fieldnames)
+        failed_sink = CsvSink(failed_csv, fieldnames)
         
-        # Process each row
-        processed_rows = []
-        for row in rows:
-            success, processed_row = self.process_single_image(row)
-            processed_rows.append(processed_row)
-            
+        def write_result(success: bool, row: Dict):
+            self.stats['total'] += 1
+            updated_sink.write(row)
             if success:
                 self.stats['successful'] += 1
             else:
                 self.stats['failed'] += 1
-                self.failed_entries.append(processed_row)
-        
-        # Save updated CSV
-        output_csv = f"{os.path.splitext(self.csv_path)[0]}_updated.csv"
-        with open(output_csv, 'w', encoding='utf-8', newline='') as f:
-            writer = csv.DictWriter(f, fieldnames=processed_rows[0].keys())
-            writer.writeheader()
-            writer.writerows(processed_rows)
-        
-        # Save failed entries for retry
-        if self.failed_entries:
-            failed_csv = f"{os.path.splitext(self.csv_path)[0]}_failed.csv"
-            with open(failed_csv, 'w', encoding='utf-8', newline='') as f:
-                writer = csv.DictWriter(f, fieldnames=self.failed_entries[0].keys())
-                writer.writeheader()
-                writer.writerows(self.failed_entries)
+                failed_sink.write(row)
+        
+        # Every finished row is journaled as it completes; with resume, rows that
+        # already succeeded with the same input are not processed again
+        self.journal = RunJournal(self.journal_path, resume=self.resume)
+        self.retry_budget = RetryBudget.for_calls(0)
+        try:
+            if self.resume:
+                logging.info(f"Resuming from {self.journal_path}")
+            
+            rows = read_rows(self.csv_path)
+            if self.shard:
+                rows = (row for row in rows if shard_of(row, self.shard[1]) == self.shard[0])
+            
+            # Process each row, one at a time or through the concurrent pipeline
+            if self.workers > 1:
+                asyncio.run(self.process_rows_async(rows, write_result))
+            else:
+                for row in rows:
+                    resumed = self._start_row(row)
+                    if resumed is not None:
+                        write_result(True, resumed)
+                        continue
+                    success, processed_row = self.process_single_image(row)
+                    write_result(*self._finish_row(success, processed_row, processed_row['Retries']))
+            
+            # A shard can be assigned no rows; it still leaves an (empty) output to merge
+            updated_sink.commit(keep_empty=True)
+            failed_sink.commit()
+        finally:
+            updated_sink.close()
+            failed_sink.close()
+            self.journal.close()
+            # Delete any files uploaded to the OCR backend during this run
+            self.ocr.close()
+            self.executor.shutdown()
+            self.download_executor.shutdown()
+            self.http_session.close()
+            if self.download_cache is not None:
+                self.download_cache.close()
+            self.evaluation_shards.close()
         
         # Log summary
         logging.info("\nProcessing Summary:")
         logging.info(f"Total images: {self.stats['total']}")
+        if self.resume:
+            logging.info(f"Resumed from journal: {self.stats['resumed']}")
         logging.info(f"Successfully processed: {self.stats['successful']}")
         logging.info(f"Failed: {self.stats['failed']}")
         logging.info(f"Total retries: {self.stats['retries']}")
+        retry_stats = self.retry_policy.get_stats()
+        if retry_stats['budget_exhausted'] or any(b['trips'] for b in retry_stats['breakers'].values()):
+            trips = ", ".join(f"{name} {b['trips']}" for name, b in retry_stats['breakers'].items())
+            logging.info(
+                f"Retries refused by budget: {retry_stats['budget_exhausted']}; circuit breaker trips: {trips}"
+            )
+        if self.stats['successful']:
+            avg_latency = self.stats['ocr_latency_ms'] / self.stats['successful']
+            logging.info(f"Average OCR latency: {avg_latency:.0f} ms")
+        logging.info(f"Tokens used: {self.stats['tokens']}, estimated cost: ${self.stats['cost']:.4f}")
+        hedge_stats = self.ocr.hedging.get_stats()
+        for label, key in (("single attempt", 'attempt_latency_ms'), ("with hedging", 'call_latency_ms')):
+            latency = hedge_stats[key]
+            if latency['count']:
+                logging.info(
+                    f"OCR latency {label}: p50 {latency['p50']:.0f} ms, "
+                    f"p95 {latency['p95']:.0f} ms, p99 {latency['p99']:.0f} ms"
+                )
+        logging.info(
+            f"Hedges: {hedge_stats['hedges']} ({hedge_stats['hedge_fraction']:.1%} of calls), "
+            f"won {hedge_stats['hedge_win_rate']:.1%}; deadlines exceeded: {hedge_stats['deadline_exceeded']}"
+        )
+        if self.ocr.cache is not None:
+            cache_stats = self.ocr.cache.get_stats()
+            logging.info(f"OCR cache hits: {cache_stats['hits']}, misses: {cache_stats['misses']}")
+        if self.download_cache is not None:
+            download_stats = self.download_cache.get_stats()
+            logging.info(
+                f"Image downloads: {download_stats['downloads']}, "
+                f"revalidated from cache: {download_stats['not_modified']}"
+            )
         
-        if self.failed_entries:
+        if self.stats['failed']:
             logging.info(f"\nFailed entries saved to: {failed_csv}")
             logging.info("Failed entries can be retried by running the script again with the failed CSV")
         
         logging.info(f"\nUpdated CSV saved to: {output_csv}")
         logging.info(f"Evaluations saved to: {self.evaluations_dir}")
         logging.info(f"Images saved to: {self.images_dir}")
-        if self.failed_entries:
+        if self.stats['failed']:
             logging.info(f"Failed images saved to: {self.failed_dir}")
 
+def _take_option(args: List[str], name: str) -> Optional[str]:
+    """Remove "name value" from args and return value; None if absent, "" if the value is missing"""
+    if name not in args:
+        return None
+    position = args.index(name)
+    value = args[position + 1] if position + 1 < len(args) else ""
+    del args[position:position + 2]
+    return value
+
 def main():
     import sys
-    if len(sys.argv) != 2:
-        print("Usage: python -m src.orchestrator <csv_file>")
+    args = sys.argv[1:]
+    usage = (
+        "Usage: python -m src.orchestrator <csv_file> [--no-cache] [--workers N] [--resume]\n"
+        "       [--shard i/N | --processes N | --merge N]"
+    )
+    bypass_cache = '--no-cache' in args
+    resume = '--resume' in args
+    args = [arg for arg in args if arg not in ('--no-cache', '--resume')]
+    
+    try:
+        workers = int(_take_option(args, '--workers') or 1)
+        shard = _take_option(args, '--shard')
+        shard = parse_shard(shard) if shard is not None else None
+        processes = _take_option(args, '--processes')
+        processes = int(processes) if processes is not None else None
+        merge = _take_option(args, '--merge')
+        merge = int(merge) if merge is not None else None
+    except ValueError as e:
+        print(f"{e}\n{usage}")
+        sys.exit(1)
+    
+    if len(args) != 1 or sum(option is not None for option in (shard, processes, merge)) > 1:
+        print(usage)
         sys.exit(1)
     
-    csv_path = sys.argv[1]
-    processor = ImageProcessor(csv_path)
-    processor.process_csv()
+    csv_path = args[0]
+    if merge is not None:
+        merge_shards(csv_path, merge)
+    elif processes is not None:
+        worker_args = ['--workers', str(workers)] + ['--no-cache'] * bypass_cache + ['--resume'] * resume
+        if not launch_shards(csv_path, processes, worker_args):
+            sys.exit(1)
+    else:
+        processor = ImageProcessor(csv_path, bypass_cache=bypass_cache, workers=workers, resume=resume, shard=shard)
+        processor.process_csv()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,278 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+# Built-in instruction block, used when no prompt version is in production
+DEFAULT_OCR_PROMPT = """
+You are an AI assistant specialized in Optical Character Recognition (OCR) and text comparison for handwritten Hindi. You will be provided with an image containing handwritten Hindi text and a corresponding reference Hindi text that the handwriting is supposed to match.
+
+Your task is to:
+1.  **Transcribe:** Accurately transcribe the Hindi words from the provided image. Focus exclusively on Hindi script and words. Ignore any non-Hindi elements.
+2.  **Tokenize:** Internally, split both the reference text and your transcribed text into individual words. Word boundaries are typically defined by spaces.
+3.  **Compare and Evaluate:** Perform a word-by-word comparison of your transcribed text against the reference text. Your output should be a detailed evaluation for each word based on the sequence in the reference text.
+
+**Input Provided to You:**
+*   An image containing the handwritten Hindi text.
+*   A string containing the reference Hindi text (this is the ground truth the student was asked to write).
+
+**Output Format (Mandatory):**
+You must produce a JSON list of objects. Each object in the list represents the evaluation of a single word from the reference text, in the order they appear. Each object must contain the following keys:
+
+*   `reference_word` (string): The word from the reference text.
+*   `transcribed_word` (string/null): The corresponding word or segment transcribed from the image.
+    *   If a directly corresponding word is found, provide it.
+    *   If the word seems to be part of a merged segment in the transcription (e.g., reference "मत कर" transcribed as "मतकर"), this field might show the merged segment for both reference words involved.
+    *   If the word from the reference is entirely missing in the transcription, use `null` or an empty string for this field.
+    *   If a word in the image is completely illegible, you can represent it as `"[illegible]"`.
+*   `match` (boolean): `true` if the `transcribed_word` (or the relevant part of it) is an exact character-by-character match with the `reference_word` (including all matras and conjunct characters). `false` otherwise.
+*   `reason_diff` (string):
+    *   If `match` is `true`, this field can be an empty string or a brief confirmation like "Exact match."
+    *   If `match` is `false`, provide a concise explanation of the mismatch. Examples include:
+        *   "Spelling error: Transcribed '[transcribed]' vs reference '[reference]' (e.g., incorrect matra, different character)."
+        *   "Missing matra: e.g., 'ा' missing in '[transcribed]'."
+        *   "Extra character: e.g., additional 'र्' in '[transcribed]'."
+        *   "Word missing: Reference word '[reference]' not found in transcription at this position."
+        *   "Segmentation error: Reference '[reference]' appears merged in transcription (e.g., as part of '[merged_transcribed_segment]')."
+        *   "Segmentation error: Reference '[reference]' appears split in transcription."
+        *   "Illegible word in transcription."
+
+**Detailed Instructions for Comparison and Evaluation:**
+*   **Sequential Evaluation:** Iterate through the words of the reference text in order. For each `reference_word`, identify its corresponding counterpart(s) or absence in your transcribed text.
+*   **Accuracy:** The comparison must be exact. Differences in matras (vowel signs), anusvara, visarga, chandrabindu, and base characters constitute a mismatch.
+*   **Word Segmentation:**
+    *   If the student merges words that are separate in the reference (e.g., reference "मत कर", transcribed "मतकर"), then for `reference_word: "मत"`, the `transcribed_word` could be "मतकर", `match: false`, and `reason_diff` should explain the merge. Similarly for `reference_word: "कर"`.
+    *   If the student splits a word that is single in the reference, adapt the `reason_diff` accordingly.
+*   **Missing/Extra Words:**
+    *   If a reference word is missing from the transcription, indicate this clearly.
+    *   If the transcription contains extra words not present in the reference text, these should ideally be noted after all reference words have been evaluated, perhaps as additional entries with `reference_word: null` or by detailing them in the `reason_diff` of a nearby word if they disrupt the alignment significantly. For simplicity, prioritize evaluating against the reference words first.
+
+**Example (Conceptual):**
+If Reference Text is: `हर पल`
+And Transcribed Text from image is: `हर पल`
+Output:
+```json
+[
+  {
+    "reference_word": "हर",
+    "transcribed_word": "हर",
+    "match": true,
+    "reason_diff": "Exact match."
+  },
+  {
+    "reference_word": "पल",
+    "transcribed_word": "पल",
+    "match": true,
+    "reason_diff": "Exact match."
+  }
+]
+```
+
+If Reference Text is: लड़ाई
+And Transcribed Text from image is: लड़ई
+Output:
+```json
+[
+  {
+    "reference_word": "लड़ाई",
+    "transcribed_word": "लड़ई",
+    "match": false,
+    "reason_diff": "Spelling error: Transcribed 'लड़ई' is missing the 'ा' (aa) matra found in 'लड़ाई'."
+  }
+]
+```
+
+If Reference Text is: उस तट पर
+And Transcribed Text from image is: उस पर (student missed "तट")
+Output:
+```json
+[
+  {
+    "reference_word": "उस",
+    "transcribed_word": "उस",
+    "match": true,
+    "reason_diff": "Exact match."
+  },
+  {
+    "reference_word": "तट",
+    "transcribed_word": null,
+    "match": false,
+    "reason_diff": "Word missing: Reference word 'तट' not found in transcription at this position."
+  },
+  {
+    "reference_word": "पर",
+    "transcribed_word": "पर",
+    "match": true,
+    "reason_diff": "Exact match."
+  }
+]
+```
+
+Begin by transcribing the provided image, then proceed to the word-by-word evaluation against the reference text, structuring your final output strictly in the JSON format specified.
+"""
+
+# Built-in instructions for local scoring: the model only transcribes, and
+# src.scoring aligns and scores the transcription against the reference
+TRANSCRIPTION_OCR_PROMPT = """
+You are an OCR engine for handwritten Hindi. Transcribe the Hindi words in the provided image exactly as they are written.
+
+*   Do not correct anything: keep spelling mistakes, missing or extra matras, and the writer's own word spacing (words written joined stay joined, words written apart stay apart).
+*   Write an unreadable word as `[illegible]`.
+*   Ignore any non-Hindi elements.
+
+**Output Format (Mandatory):**
+A JSON object with a single key, `transcription`, holding the transcribed words in reading order separated by single spaces, e.g. `{"transcription": "हर पल लड़ई"}`.
+"""
+
+# Output formats a prompt can ask for
+OUTPUT_EVALUATIONS = "evaluations"  # JSON list of word evaluations judged by the model
+OUTPUT_TRANSCRIPTION = "transcription"  # {"transcription": ...} scored locally
+
+
+def detect_output_format(instructions: str) -> str:
+    """Tell from a prompt's instructions whether it asks for a plain transcription."""
+    if '"transcription"' in instructions and "reference_word" not in instructions:
+        return OUTPUT_TRANSCRIPTION
+    return OUTPUT_EVALUATIONS
+
+
+class CompiledPrompt(BaseModel):
+    """
+    A prompt split into a static instruction prefix and a per-image suffix.
+
+    The prefix is identical for every request of a version, so backends can
+    cache it provider-side and only the short suffix is sent per call.
+    """
+    version: str
+    instructions: str
+    prefix_hash: str
+    output_format: str = OUTPUT_EVALUATIONS
+
+    @classmethod
+    def compile(cls, version: str, instructions: str) -> "CompiledPrompt":
+        """Build a compiled prompt, hashing its static prefix once."""
+        prefix_hash = hashlib.sha256(instructions.encode('utf-8')).hexdigest()
+        return cls(
+            version=version,
+            instructions=instructions,
+            prefix_hash=prefix_hash,
+            output_format=detect_output_format(instructions)
+        )
+
+    def render(self, reference_text: Optional[str] = None) -> str:
+        """Render the per-image part of the prompt."""
+        if self.output_format == OUTPUT_TRANSCRIPTION:
+            # Showing the reference would invite the model to correct the handwriting
+            return "Transcribe the handwritten text in the image."
+        if reference_text:
+            return f"Reference Text: {reference_text}"
+        return "No reference text was provided; transcribe the image."
+
+
+DEFAULT_PROMPT = CompiledPrompt.compile("builtin", DEFAULT_OCR_PROMPT)
+TRANSCRIPTION_PROMPT = CompiledPrompt.compile("builtin-transcription", TRANSCRIPTION_OCR_PROMPT)
+
+
+class PromptRegistry:
+    """
+    In-memory registry of compiled prompts backed by the prompt_versions table.
+
+    The production PromptVersion is loaded once and reused until it is older
+    than refresh_seconds or invalidate() is called, so promoting a version
+    takes effect without a redeploy. Explicitly requested versions are loaded
+    on first use. With nothing loaded the built-in prompt is used.
+    """
+
+    def __init__(self, refresh_seconds: Optional[float] = None, default: Optional[CompiledPrompt] = None):
+        """
+        Initialize the registry.
+
+        Args:
+            refresh_seconds: How long a loaded production prompt is trusted.
+                Defaults to OCR_PROMPT_REFRESH_SECONDS, or 300.
+            default: Built-in prompt used when no version is loaded. Defaults to the
+                transcription prompt if OCR_OUTPUT_FORMAT is "transcription",
+                else the word evaluation prompt.
+        """
+        self.refresh_seconds = refresh_seconds or float(os.getenv("OCR_PROMPT_REFRESH_SECONDS", "300"))
+        if default is None:
+            output_format = os.getenv("OCR_OUTPUT_FORMAT", OUTPUT_EVALUATIONS)
+            default = TRANSCRIPTION_PROMPT if output_format == OUTPUT_TRANSCRIPTION else DEFAULT_PROMPT
+        self.default = default
+        self._versions: Dict[str, CompiledPrompt] = {}
+        self._missing = set()
+        self._active: Optional[CompiledPrompt] = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, version: Optional[str] = None) -> CompiledPrompt:
+        """
+        Return the compiled prompt for a version.
+
+        Args:
+            version: PromptVersion.version to use, or None for the production prompt
+
+        Returns:
+            The requested version if loaded, else the production prompt, else the built-in one
+        """
+        with self._lock:
+            if version and version in self._versions:
+                return self._versions[version]
+            return self._active or self.default
+
+    def invalidate(self):
+        """Force the next ensure_loaded call to reload from the database."""
+        with self._lock:
+            self._loaded_at = 0.0
+
+    async def ensure_loaded(self, db, version: Optional[str] = None):
+        """
+        Load the production prompt (if stale) and the requested version (if new).
+
+        Args:
+            db: Async database session
+            version: Optional PromptVersion.version to load as well
+        """
+        from sqlalchemy.future import select
+        from src.database import PromptVersion
+
+        if time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            result = await db.execute(
+                select(PromptVersion)
+                .where(PromptVersion.status == "production")
+                .order_by(PromptVersion.created_at.desc())
+                .limit(1)
+            )
+            production = result.scalar_one_or_none()
+            with self._lock:
+                self._active = (
+                    CompiledPrompt.compile(production.version, production.prompt_text)
+                    if production and production.prompt_text else None
+                )
+                # Explicit versions may have been edited too; reload them on demand
+                self._versions.clear()
+                self._missing.clear()
+                self._loaded_at = time.monotonic()
+            logging.info(f"Prompt registry active version: {self.get().version}")
+
+        with self._lock:
+            if not version or version in self._versions or version in self._missing:
+                return
+
+        result = await db.execute(
+            select(PromptVersion)
+            .where(PromptVersion.version == version)
+            .order_by(PromptVersion.created_at.desc())
+            .limit(1)
+        )
+        prompt_version = result.scalar_one_or_none()
+        with self._lock:
+            if prompt_version and prompt_version.prompt_text:
+                self._versions[version] = CompiledPrompt.compile(version, prompt_version.prompt_text)
+            else:
+                # e.g. the legacy "v1" label; fall back to the production prompt
+                self._missing.add(version)
@@ -0,0 +1,295 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from google.genai.errors import APIError
+
+# HTTP status codes that mean the upstream is over quota or overloaded
+OVERLOAD_STATUS_CODES = (429, 503)
+
+
+def is_overload_error(error: BaseException) -> bool:
+    """Return True if an error means the API wants us to slow down."""
+    return isinstance(error, APIError) and error.code in OVERLOAD_STATUS_CODES
+
+
+def _wake(future: asyncio.Future):
+    """Resolve a waiter future unless it was already cancelled or resolved."""
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket refilled continuously at a per-minute rate.
+
+    Usable from both threads (acquire) and coroutines (acquire_async).
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate_per_minute: Tokens added per minute
+            capacity: Maximum burst size. Defaults to one second of refill,
+                so sustained load stays just under the rate rather than bursting.
+        """
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = capacity or max(self.rate_per_second, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def _reserve(self, amount: float) -> float:
+        """Take amount tokens, returning how long the caller must wait for them."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate_per_second
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        """Take amount tokens only if they are available right now."""
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens < amount:
+                return False
+            self._tokens -= amount
+            return True
+
+    def acquire(self, amount: float = 1):
+        """Block until amount tokens are available."""
+        wait = self._reserve(amount)
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1):
+        """Wait without blocking the event loop until amount tokens are available."""
+        wait = self._reserve(amount)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def adjust(self, amount: float):
+        """Debit (positive) or credit (negative) tokens after the fact."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens - amount)
+
+
+class RateLimiter:
+    """Client-side limiter on requests per minute and tokens per minute."""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        """
+        Initialize the limiter.
+
+        Args:
+            requests_per_minute: Request quota, or None for no request limit
+            tokens_per_minute: Token quota, or None for no token limit
+        """
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    @classmethod
+    def from_env(cls, share: float = 1.0) -> "RateLimiter":
+        """
+        Build a limiter from GEMINI_RPM and GEMINI_TPM.
+
+        Defaults to 2000 requests/min and 4,000,000 tokens/min. Set either to 0
+        to disable that limit.
+
+        Args:
+            share: Fraction of the quotas this process may use, e.g. 1/N for
+                one of N processes sharing one API key
+        """
+        return cls(
+            requests_per_minute=float(os.getenv("GEMINI_RPM", "2000")) * share,
+            tokens_per_minute=float(os.getenv("GEMINI_TPM", "4000000")) * share
+        )
+
+    def acquire(self, estimated_tokens: int = 0):
+        """Block until one request of estimated_tokens fits in both quotas."""
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens and estimated_tokens:
+            self.tokens.acquire(estimated_tokens)
+
+    def try_acquire(self, estimated_tokens: int = 0) -> bool:
+        """Admit one request without waiting, or return False if either quota is exhausted."""
+        if self.requests and not self.requests.try_acquire(1):
+            return False
+        if self.tokens and estimated_tokens and not self.tokens.try_acquire(estimated_tokens):
+            if self.requests:
+                # Give the request slot back
+                self.requests.adjust(-1)
+            return False
+        return True
+
+    async def acquire_async(self, estimated_tokens: int = 0):
+        """Async variant of acquire."""
+        if self.requests:
+            await self.requests.acquire_async(1)
+        if self.tokens and estimated_tokens:
+            await self.tokens.acquire_async(estimated_tokens)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """Correct the token bucket once a request's real token count is known."""
+        if self.tokens:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+
+class AimdConcurrencyController:
+    """
+    Additive-increase/multiplicative-decrease limit on in-flight requests.
+
+    The limit grows by roughly one slot per window of successful calls and is
+    cut by decrease_factor when the API reports 429/503, at most once per
+    cooldown so a burst of failures from one window only backs off once.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        initial_limit: Optional[int] = None,
+        min_limit: int = 1,
+        decrease_factor: float = 0.5,
+        cooldown_seconds: float = 2.0,
+    ):
+        """
+        Initialize the controller.
+
+        Args:
+            max_limit: Hard ceiling on concurrent requests
+            initial_limit: Starting limit, defaults to max_limit
+            min_limit: Floor the limit never drops below
+            decrease_factor: Multiplier applied to the limit on overload
+            cooldown_seconds: Minimum time between two decreases
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.decrease_factor = decrease_factor
+        self.cooldown_seconds = cooldown_seconds
+        self._limit = float(initial_limit or max_limit)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._async_waiters: deque = deque()
+
+        self.stats = {'successes': 0, 'overloads': 0, 'decreases': 0}
+
+    @property
+    def limit(self) -> int:
+        return max(self.min_limit, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _try_acquire(self) -> bool:
+        if self._in_flight < self.limit:
+            self._in_flight += 1
+            return True
+        return False
+
+    def _notify(self):
+        """Wake every waiter so it can retry. Must hold the lock."""
+        self._condition.notify_all()
+        while self._async_waiters:
+            loop, future = self._async_waiters.popleft()
+            loop.call_soon_threadsafe(_wake, future)
+
+    def acquire(self):
+        """Block until a slot is free."""
+        with self._condition:
+            while not self._try_acquire():
+                self._condition.wait()
+
+    def try_acquire(self) -> bool:
+        """Take a slot without waiting, or return False if none is free."""
+        with self._lock:
+            return self._try_acquire()
+
+    async def acquire_async(self):
+        """Wait without blocking the event loop until a slot is free."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                if self._try_acquire():
+                    return
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+            await future
+
+    def release(self):
+        """Free a slot taken by acquire or acquire_async."""
+        with self._lock:
+            self._in_flight -= 1
+            self._notify()
+
+    def on_success(self):
+        """Grow the limit by 1/limit so it rises by one per window of successes."""
+        with self._lock:
+            self.stats['successes'] += 1
+            if self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                self._notify()
+
+    def on_overload(self):
+        """Cut the limit after a 429/503, once per cooldown window."""
+        with self._lock:
+            self.stats['overloads'] += 1
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown_seconds:
+                self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                self._last_decrease = now
+                self.stats['decreases'] += 1
+
+    def record(self, error: Optional[BaseException]):
+        """Feed the outcome of one call into the controller."""
+        if error is None:
+            self.on_success()
+        elif is_overload_error(error):
+            self.on_overload()
+
+    @contextmanager
+    def slot(self):
+        """Hold a slot for the duration of a with block."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """Hold a slot for the duration of an async with block."""
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_shared_rate_limiter: Optional[RateLimiter] = None
+
+
+def get_shared_rate_limiter() -> RateLimiter:
+    """Return the process-wide rate limiter, creating it from the environment."""
+    global _shared_rate_limiter
+    if _shared_rate_limiter is None:
+        _shared_rate_limiter = RateLimiter.from_env()
+    return _shared_rate_limiter
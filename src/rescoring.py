@@ -0,0 +1,163 @@
+import asyncio
+import concurrent.futures
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from .database import Evaluation, Image, WordEvaluation
+from .scoring import RescoreRow, rescore_chunk
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+async def _fetch_chunk(
+    db: AsyncSession,
+    after_id: int,
+    chunk_size: int,
+    prompt_version: Optional[str],
+    evaluation_run_id: Optional[int],
+) -> List[RescoreRow]:
+    """Read the next chunk of successful evaluations in id order."""
+    query = (
+        select(
+            Evaluation.id,
+            Evaluation.accuracy,
+            Image.reference_text,
+            Evaluation.ocr_output,
+            Evaluation.word_evaluations_json
+        )
+        .join(Image, Evaluation.image_id == Image.id)
+        .where(Evaluation.processing_status == "success", Evaluation.id > after_id)
+        .order_by(Evaluation.id)
+        .limit(chunk_size)
+    )
+    if prompt_version:
+        query = query.where(Evaluation.prompt_version == prompt_version)
+    if evaluation_run_id is not None:
+        query = query.where(Evaluation.evaluation_run_id == evaluation_run_id)
+
+    result = await db.execute(query)
+    return [tuple(row) for row in result.fetchall()]
+
+
+async def _write_chunk(db: AsyncSession, results: List[Dict]):
+    """Write rescored evaluations back with one bulk UPDATE and a bulk word replace."""
+    scored = [result for result in results if "error" not in result]
+    if not scored:
+        return
+
+    now = datetime.utcnow()
+    await db.execute(update(Evaluation), [
+        {
+            "id": result["id"],
+            "accuracy": result["accuracy"],
+            "correct_words": result["correct_words"],
+            "total_words": result["total_words"],
+            "word_evaluations_json": json.dumps(result["evaluations"]),
+            "updated_at": now,
+        }
+        for result in scored
+    ])
+
+    await db.execute(
+        delete(WordEvaluation).where(WordEvaluation.evaluation_id.in_([result["id"] for result in scored]))
+    )
+    word_rows = [
+        {"evaluation_id": result["id"], "word_position": position, **word_evaluation}
+        for result in scored
+        for position, word_evaluation in enumerate(result["evaluations"])
+    ]
+    if word_rows:
+        await db.execute(insert(WordEvaluation), word_rows)
+    await db.commit()
+
+
+async def rescore_evaluations(
+    db: AsyncSession,
+    prompt_version: Optional[str] = None,
+    evaluation_run_id: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    workers: Optional[int] = None,
+    dry_run: bool = False,
+) -> Dict:
+    """
+    Rescore stored evaluations without calling OCR.
+
+    Evaluations are read in id-ordered chunks and scored on a process pool
+    while the next chunks are read; each finished chunk is written back in
+    one transaction, so an interrupted job leaves earlier chunks rescored.
+
+    Args:
+        db: Database session
+        prompt_version: Only rescore evaluations of this prompt version
+        evaluation_run_id: Only rescore evaluations of this run
+        chunk_size: Evaluations per chunk
+        workers: Scoring processes, defaults to the CPU count; 0 scores in this process
+        dry_run: Score and count changes without writing them
+
+    Returns:
+        Dict with rescored, changed and failed counts and elapsed_seconds
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    stats = {"rescored": 0, "changed": 0, "failed": 0}
+    started = time.perf_counter()
+
+    async def finish(results: List[Dict]):
+        for result in results:
+            if "error" in result:
+                stats["failed"] += 1
+                logging.warning(f"Could not rescore evaluation {result['id']}: {result['error']}")
+            else:
+                stats["rescored"] += 1
+                stats["changed"] += result["changed"]
+        if not dry_run:
+            await _write_chunk(db, results)
+
+    # Spawned, not forked: the API calls this from a process with a running event
+    # loop and driver/executor threads whose locks a forked child would inherit
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) if workers > 0 else None
+    loop = asyncio.get_running_loop()
+    in_flight: deque = deque()
+    after_id = 0
+    try:
+        while True:
+            rows = await _fetch_chunk(db, after_id, chunk_size, prompt_version, evaluation_run_id)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+
+            if executor is None:
+                await finish(rescore_chunk(rows))
+                continue
+
+            # Keep every worker busy while bounding the chunks held in memory
+            in_flight.append(loop.run_in_executor(executor, rescore_chunk, rows))
+            if len(in_flight) >= workers * 2:
+                await finish(await in_flight.popleft())
+
+        while in_flight:
+            await finish(await in_flight.popleft())
+    finally:
+        for future in in_flight:
+            future.cancel()
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    stats["elapsed_seconds"] = time.perf_counter() - started
+    logging.info(
+        f"Rescored {stats['rescored']} evaluations ({stats['changed']} changed, "
+        f"{stats['failed']} failed) in {stats['elapsed_seconds']:.1f}s"
+    )
+    return stats
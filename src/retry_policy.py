@@ -0,0 +1,362 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+import requests
+from google.genai.errors import APIError
+
+from src.hedging import DeadlineExceeded
+
+T = TypeVar("T")
+
+# HTTP status codes worth retrying: timeouts, throttling and transient server errors.
+# Anything else (404 image, 401/403 bad key, 400 bad request) fails immediately.
+RETRYABLE_STATUS_CODES = (408, 425, 429, 500, 502, 503, 504)
+
+
+class OcrCallError(Exception):
+    """An OCR call that returned an error result instead of raising."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Classify an error as transient (worth retrying) or permanent.
+
+    Connection failures, timeouts, throttling and 5xx responses are
+    transient. Client errors such as a missing image, a rejected API key
+    or an unreadable local file are not, and neither are programming errors.
+    """
+    if isinstance(error, OcrCallError):
+        return error.retryable
+    if isinstance(error, APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in RETRYABLE_STATUS_CODES
+    if isinstance(error, (requests.ConnectionError, requests.Timeout, aiohttp.ClientConnectionError)):
+        return True
+    if isinstance(error, (DeadlineExceeded, TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # The model occasionally emits malformed JSON; a fresh call usually parses
+    return isinstance(error, json.JSONDecodeError)
+
+
+class RetryBudget:
+    """
+    Cap on the retries one job may spend across all of its calls.
+
+    Keeps a batch whose upstream is failing from multiplying its cost by
+    max_attempts; once spent, calls fail after their first attempt. A job
+    whose size is not known up front starts from a minimum and grows the
+    budget with add_calls() as work arrives.
+    """
+
+    def __init__(self, max_retries: float, ratio: float = 0.0):
+        """
+        Args:
+            max_retries: Retries allowed so far
+            ratio: Retries added per call by add_calls()
+        """
+        self.max_retries = max_retries
+        self.ratio = ratio
+        self.spent = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_calls(cls, calls: int) -> "RetryBudget":
+        """
+        Budget for a job of a given number of calls, from RETRY_BUDGET_RATIO
+        (default 0.2 retries per call) and RETRY_BUDGET_MIN (default 10).
+        """
+        ratio = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))
+        minimum = int(os.getenv("RETRY_BUDGET_MIN", "10"))
+        return cls(max(minimum, int(calls * ratio)), ratio)
+
+    def add_calls(self, calls: int = 1):
+        """Grow the budget for calls more calls joining the job."""
+        with self._lock:
+            self.max_retries += calls * self.ratio
+
+    def try_spend(self) -> bool:
+        """Take one retry from the budget; False if it is exhausted."""
+        with self._lock:
+            if self.spent + 1 > self.max_retries:
+                return False
+            self.spent += 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Pause all callers of an upstream while its error rate is too high.
+
+    Outcomes of the last window_seconds are kept. Once at least min_calls
+    are in the window and the share of transient failures reaches
+    error_rate, the breaker opens: every caller waits until cooldown_seconds
+    have passed, then the window starts over.
+    """
+
+    def __init__(
+        self,
+        error_rate: float = 0.5,
+        min_calls: int = 20,
+        window_seconds: float = 60.0,
+        cooldown_seconds: float = 30.0,
+    ):
+        """
+        Initialize the breaker.
+
+        Args:
+            error_rate: Failure share that opens the breaker, or 0 to never open
+            min_calls: Calls needed in the window before the rate is trusted
+            window_seconds: How far back outcomes are counted
+            cooldown_seconds: How long callers are paused once open
+        """
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self._outcomes: deque = deque()
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+
+        self.stats = {'trips': 0, 'paused_seconds': 0.0}
+
+    @property
+    def is_open(self) -> bool:
+        return time.monotonic() < self._open_until
+
+    def _expire(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            _, failed = self._outcomes.popleft()
+            self._failures -= failed
+
+    def record(self, failed: bool):
+        """Record one call outcome; failed means a transient upstream error."""
+        if not self.error_rate:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._outcomes.append((now, failed))
+            self._failures += failed
+            if (
+                now >= self._open_until
+                and len(self._outcomes) >= self.min_calls
+                and self._failures / len(self._outcomes) >= self.error_rate
+            ):
+                self._open_until = now + self.cooldown_seconds
+                self._outcomes.clear()
+                self._failures = 0
+                self.stats['trips'] += 1
+                logging.warning(
+                    f"Circuit breaker open: upstream error rate above {self.error_rate:.0%}, "
+                    f"pausing for {self.cooldown_seconds:.0f}s"
+                )
+
+    def _remaining(self) -> float:
+        remaining = self._open_until - time.monotonic()
+        if remaining > 0:
+            with self._lock:
+                self.stats['paused_seconds'] += remaining
+        return remaining
+
+    def wait(self):
+        """Block while the breaker is open."""
+        remaining = self._remaining()
+        while remaining > 0:
+            time.sleep(remaining)
+            remaining = self._open_until - time.monotonic()
+
+    async def wait_async(self):
+        """Sleep while the breaker is open without blocking the event loop."""
+        remaining = self._remaining()
+        while remaining > 0:
+            await asyncio.sleep(remaining)
+            remaining = self._open_until - time.monotonic()
+
+
+class RetryPolicy:
+    """
+    Retry transient failures with exponential backoff and full jitter.
+
+    Shared by ImageProcessor and OcrOrchestrator. Each upstream ("download",
+    "ocr") gets its own circuit breaker, so a failing image host does not
+    pause OCR calls and vice versa. Permanent errors are raised on the
+    first attempt.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+        breaker_error_rate: float = 0.5,
+        breaker_min_calls: int = 20,
+        breaker_window_seconds: float = 60.0,
+        breaker_cooldown_seconds: float = 30.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the policy.
+
+        Args:
+            max_attempts: Attempts per call, including the first
+            base_delay: Backoff cap in seconds before the first retry, doubled per retry
+            max_delay: Upper bound on the backoff cap
+            breaker_error_rate, breaker_min_calls, breaker_window_seconds,
+                breaker_cooldown_seconds: CircuitBreaker settings per upstream
+            seed: Seed for the jitter, for reproducible tests
+        """
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._breaker_settings = dict(
+            error_rate=breaker_error_rate,
+            min_calls=breaker_min_calls,
+            window_seconds=breaker_window_seconds,
+            cooldown_seconds=breaker_cooldown_seconds,
+        )
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.stats = {'retries': 0, 'permanent_failures': 0, 'budget_exhausted': 0}
+
+    @classmethod
+    def from_env(cls, max_attempts: Optional[int] = None) -> "RetryPolicy":
+        """
+        Build a policy from RETRY_MAX_ATTEMPTS (default 3), RETRY_BASE_DELAY_SECONDS
+        (0.5), RETRY_MAX_DELAY_SECONDS (30), CIRCUIT_BREAKER_ERROR_RATE (0.5, 0 disables),
+        CIRCUIT_BREAKER_MIN_CALLS (20), CIRCUIT_BREAKER_WINDOW_SECONDS (60) and
+        CIRCUIT_BREAKER_COOLDOWN_SECONDS (30). max_attempts overrides the environment.
+        """
+        return cls(
+            max_attempts=max_attempts or int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.5")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY_SECONDS", "30")),
+            breaker_error_rate=float(os.getenv("CIRCUIT_BREAKER_ERROR_RATE", "0.5")),
+            breaker_min_calls=int(os.getenv("CIRCUIT_BREAKER_MIN_CALLS", "20")),
+            breaker_window_seconds=float(os.getenv("CIRCUIT_BREAKER_WINDOW_SECONDS", "60")),
+            breaker_cooldown_seconds=float(os.getenv("CIRCUIT_BREAKER_COOLDOWN_SECONDS", "30")),
+        )
+
+    def breaker(self, upstream: str) -> CircuitBreaker:
+        with self._lock:
+            if upstream not in self.breakers:
+                self.breakers[upstream] = CircuitBreaker(**self._breaker_settings)
+            return self.breakers[upstream]
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter delay before retry number retry (0-based)."""
+        cap = min(self.max_delay, self.base_delay * (2 ** retry))
+        with self._lock:
+            return self._random.uniform(0, cap)
+
+    def _should_retry(
+        self, error: BaseException, attempt: int, breaker: CircuitBreaker,
+        budget: Optional[RetryBudget], counts: Optional[Dict]
+    ) -> bool:
+        """Record a failed attempt and decide whether to try again."""
+        retryable = is_retryable(error)
+        breaker.record(retryable)
+        if not retryable:
+            with self._lock:
+                self.stats['permanent_failures'] += 1
+            return False
+        if attempt + 1 >= self.max_attempts:
+            return False
+        if budget is not None and not budget.try_spend():
+            with self._lock:
+                self.stats['budget_exhausted'] += 1
+            logging.warning("Retry budget exhausted; not retrying")
+            return False
+        with self._lock:
+            self.stats['retries'] += 1
+        if counts is not None:
+            counts['retries'] = counts.get('retries', 0) + 1
+        return True
+
+    def call(
+        self, operation: Callable[[], T], upstream: str,
+        budget: Optional[RetryBudget] = None, counts: Optional[Dict] = None
+    ) -> T:
+        """
+        Run operation, retrying transient failures.
+
+        Args:
+            operation: Zero-argument callable making one attempt
+            upstream: Name of the service called, selecting the circuit breaker
+            budget: The job's retry budget, if it has one
+            counts: Dict whose 'retries' entry is incremented per retry
+
+        Returns:
+            The first successful result; the last error is raised otherwise
+        """
+        breaker = self.breaker(upstream)
+        for attempt in range(self.max_attempts):
+            breaker.wait()
+            try:
+                result = operation()
+            except Exception as e:
+                if not self._should_retry(e, attempt, breaker, budget, counts):
+                    raise
+                logging.info(f"Retrying {upstream} after error: {e} (attempt {attempt + 2}/{self.max_attempts})")
+                time.sleep(self.backoff(attempt))
+            else:
+                breaker.record(False)
+                return result
+
+    async def call_async(
+        self, operation: Callable[[], Awaitable[T]], upstream: str,
+        budget: Optional[RetryBudget] = None, counts: Optional[Dict] = None
+    ) -> T:
+        """Async variant of call; operation returns a new awaitable per attempt."""
+        breaker = self.breaker(upstream)
+        for attempt in range(self.max_attempts):
+            await breaker.wait_async()
+            try:
+                result = await operation()
+            except Exception as e:
+                if not self._should_retry(e, attempt, breaker, budget, counts):
+                    raise
+                logging.info(f"Retrying {upstream} after error: {e} (attempt {attempt + 2}/{self.max_attempts})")
+                await asyncio.sleep(self.backoff(attempt))
+            else:
+                breaker.record(False)
+                return result
+
+    def get_stats(self) -> Dict:
+        """Return retry counters and per-upstream breaker trips."""
+        with self._lock:
+            stats = dict(self.stats)
+            breakers = dict(self.breakers)
+        stats['breakers'] = {upstream: dict(breaker.stats) for upstream, breaker in breakers.items()}
+        return stats
+
+
+def check_ocr_result(result: Optional[Dict]) -> Dict:
+    """
+    Turn an OCR error result into an exception the retry policy can classify.
+
+    Returns:
+        result, if it is a successful OCR result
+    """
+    if not result:
+        raise OcrCallError("OCR returned no result", retryable=True)
+    if 'error' in result:
+        raise OcrCallError(result['error'], retryable=result.get('retryable', False))
+    return result
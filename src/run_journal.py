@@ -0,0 +1,111 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+# Input columns whose values decide whether a journaled row still applies
+INPUT_COLUMNS = ('#', 'Link', 'Text')
+
+
+def row_key(row: Dict) -> str:
+    """Identify a CSV row by its image number."""
+    return row.get('#', '')
+
+
+def row_hash(row: Dict) -> str:
+    """Hash a row's input columns, so edited rows are not resumed from stale results."""
+    payload = json.dumps([row.get(column, '') for column in INPUT_COLUMNS], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RunJournal:
+    """
+    Journal of finished CSV rows, committed as each row finishes.
+
+    An interrupted batch can be resumed without paying for the same OCR
+    calls again. Rows are matched by image number and a hash of their input
+    columns, so a row whose link or reference text changed is processed
+    again; a later result for a row replaces the earlier one.
+
+    Entries live in SQLite rather than memory, so lookups stay cheap and
+    memory stays flat however many rows the manifest has. Each row is its
+    own transaction, so a crash loses at most the row being written.
+    """
+
+    def __init__(self, path: Union[str, Path], resume: bool = False):
+        """
+        Open the journal.
+
+        Args:
+            path: Journal database file
+            resume: Keep existing entries; otherwise start a new journal
+        """
+        self.path = Path(path)
+        if not resume and self.path.exists():
+            self.path.unlink()
+            for suffix in ("-wal", "-shm"):
+                Path(f"{self.path}{suffix}").unlink(missing_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                key TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                row TEXT NOT NULL,
+                PRIMARY KEY (key, hash)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def get(self, row: Dict) -> Optional[Dict]:
+        """Return the latest journal entry for a row with this input, successful or not."""
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT success, row FROM rows WHERE key = ? AND hash = ?", (row_key(row), row_hash(row))
+            ).fetchone()
+        if found is None:
+            return None
+        return {'key': row_key(row), 'hash': row_hash(row), 'success': bool(found[0]), 'row': json.loads(found[1])}
+
+    def is_completed(self, row: Dict) -> bool:
+        """
+        Whether a row already succeeded with the same input.
+
+        Failed rows are not completed, so resuming retries them.
+        """
+        with self._lock:
+            found = self._conn.execute(
+                "SELECT success FROM rows WHERE key = ? AND hash = ?", (row_key(row), row_hash(row))
+            ).fetchone()
+        return bool(found and found[0])
+
+    def record(self, success: bool, row: Dict):
+        """
+        Commit a finished row to disk.
+
+        Args:
+            success: Whether the row was processed successfully
+            row: The processed row; its input columns are as read
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rows (key, hash, success, row) VALUES (?, ?, ?, ?)",
+                (row_key(row), row_hash(row), int(success), json.dumps(row, ensure_ascii=False))
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -61,6 +61,7 @@ class ImageUpdate(BaseModel):
 
 class Image(ImageBase):
     id: int
+    content_hash: Optional[str] = None
     created_at: datetime
     updated_at: datetime
     
@@ -82,11 +83,19 @@ class EvaluationBase(BaseModel):
     progress_percentage: Optional[int] = 0
     current_step: Optional[str] = None
     estimated_completion: Optional[datetime] = None
+    latency_ms: Optional[int] = None
+    ttfb_ms: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    candidates_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    cost_estimate: Optional[float] = None
+    retry_count: Optional[int] = 0
 
 class EvaluationCreate(BaseModel):
     image_id: int
     prompt_version: str = "v1"
     force_reprocess: bool = False  # Force reprocessing even if already processed
+    bypass_cache: bool = False  # Call the OCR API even if a cached result exists
 
 class EvaluationUpdate(BaseModel):
     ocr_output: Optional[str] = None
@@ -95,6 +104,15 @@ class EvaluationUpdate(BaseModel):
     total_words: Optional[int] = None
     processing_status: Optional[str] = None
     error_message: Optional[str] = None
+    progress_percentage: Optional[int] = None
+    current_step: Optional[str] = None
+    latency_ms: Optional[int] = None
+    ttfb_ms: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    candidates_tokens: Optional[int] = None
+    cached_tokens: Optional[int] = None
+    cost_estimate: Optional[float] = None
+    retry_count: Optional[int] = None
     word_evaluations: Optional[List[WordEvaluationCreate]] = None
 
 class Evaluation(EvaluationBase):
@@ -160,17 +178,99 @@ class AccuracyDistribution(BaseModel):
     low_accuracy: int  # < 70%
     total_processed: int
 
+class ErrorRateMetrics(BaseModel):
+    evaluations: int
+    reference_words: int
+    reference_characters: int
+    cer: Optional[float] = None  # Character (grapheme cluster) error rate
+    cer_ci: Optional[List[float]] = None  # [low, high] bootstrap interval
+    wer: Optional[float] = None  # Word error rate
+    wer_ci: Optional[List[float]] = None
+    mean_accuracy: Optional[float] = None
+    mean_accuracy_ci: Optional[List[float]] = None
+    position_error_rates: List[float] = []  # Error rate per reference word position
+    confidence: float
+    computed_at: datetime
+
+class OcrCacheStats(BaseModel):
+    enabled: bool
+    hits: int = 0
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    hit_rate: float = 0.0
+    memory_entries: int = 0
+    disk_bytes: int = 0
+
+class OcrUsageStats(BaseModel):
+    group: str  # Prompt version or evaluation run id
+    evaluations: int
+    avg_latency_ms: Optional[float] = None
+    max_latency_ms: Optional[int] = None
+    avg_ttfb_ms: Optional[float] = None
+    prompt_tokens: int = 0
+    candidates_tokens: int = 0
+    cached_tokens: int = 0
+    total_cost: float = 0.0
+    avg_cost: Optional[float] = None
+
+class LatencyPercentiles(BaseModel):
+    count: int = 0
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
+
+class OcrLatencyStats(BaseModel):
+    calls: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    hedge_fraction: float = 0.0
+    hedge_win_rate: float = 0.0
+    hedge_delay_ms: Optional[float] = None
+    deadline_exceeded: int = 0
+    attempt_latency_ms: LatencyPercentiles  # Completed single attempts, i.e. before hedging
+    call_latency_ms: LatencyPercentiles  # What callers saw, with hedging
+    streaming: Optional["OcrLatencyStats"] = None  # Streaming calls, hedged on time to first chunk
+
+class OcrExecutorStats(BaseModel):
+    workers: int
+    queued: int = 0  # Jobs waiting for a thread right now
+    running: int = 0
+    max_queued: int = 0
+    completed: int = 0
+    failed: int = 0
+    wait_ms: LatencyPercentiles  # Time from submission until a thread picked the job up
+    run_ms: LatencyPercentiles
+
 # Batch processing schemas
 class BatchProcessRequest(BaseModel):
     image_ids: List[int]
     prompt_version: str = "v1"
     force_reprocess: bool = False
+    bypass_cache: bool = False
 
 class BatchProcessResponse(BaseModel):
     queued_count: int
     message: str
     job_id: Optional[str] = None  # For future job tracking
 
+class RescoreRequest(BaseModel):
+    prompt_version: Optional[str] = None  # Only rescore this prompt version
+    evaluation_run_id: Optional[int] = None  # Only rescore this run
+    chunk_size: int = Field(1000, ge=1)
+    dry_run: bool = False
+
+class RescoreJob(BaseModel):
+    job_id: str
+    status: str  # processing, success, failed
+    rescored: int = 0
+    changed: int = 0
+    failed: int = 0
+    elapsed_seconds: Optional[float] = None
+    error_message: Optional[str] = None
+
 # Search and filter schemas
 class ImageFilter(BaseModel):
     has_evaluations: Optional[bool] = None
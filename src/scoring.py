@@ -0,0 +1,312 @@
+import json
+import unicodedata
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+VIRAMA = "\u094d"
+ZWJ = "\u200d"
+ZWNJ = "\u200c"
+ILLEGIBLE = "[illegible]"
+
+# Alignment costs. A word substitution costs its normalized edit distance
+# (0-1), so near misses align ahead of unrelated words. Merges and splits
+# cost less than the substitution plus deletion/insertion they replace.
+GAP_COST = 1.0
+SEGMENTATION_COST = 0.5
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """NFC-normalize text, drop zero-width spaces and collapse whitespace."""
+    text = unicodedata.normalize("NFC", text or "")
+    text = text.replace("\u200b", "").replace("\ufeff", "")
+    return " ".join(text.split())
+
+
+@lru_cache(maxsize=None)
+def _is_mark(char: str) -> bool:
+    return unicodedata.category(char).startswith("M")
+
+
+def grapheme_clusters(text: str) -> List[str]:
+    """
+    Split text into Devanagari aksharas.
+
+    Combining marks (matras, nukta, anusvara, visarga, chandrabindu) and
+    joiners attach to the preceding cluster, and a virama joins the next
+    consonant into a conjunct, so "क्ष" or "स्त्री" count as one unit.
+
+    Args:
+        text: Normalized text
+
+    Returns:
+        List of grapheme clusters, including spaces as their own clusters
+    """
+    clusters: List[str] = []
+    for char in text:
+        if clusters and not char.isspace() and (
+            _is_mark(char)
+            or char in (ZWJ, ZWNJ)
+            or (clusters[-1][-1] in (VIRAMA, ZWJ) and char.isalpha())
+        ):
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+    return clusters
+
+
+def edit_distance(reference: Sequence, hypothesis: Sequence) -> int:
+    """Levenshtein distance between two sequences."""
+    if len(reference) < len(hypothesis):
+        reference, hypothesis = hypothesis, reference
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_item in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_item in enumerate(hypothesis, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_item != hyp_item),
+            ))
+        previous = current
+    return previous[-1]
+
+
+@lru_cache(maxsize=65536)
+def word_distance(reference_word: str, transcribed_word: str) -> float:
+    """
+    Grapheme edit distance between two words, scaled to 0-1.
+
+    Cached, since the same word pairs recur across the alignment table and
+    across evaluations of the same reference text.
+    """
+    if reference_word == transcribed_word:
+        return 0.0
+    ref_clusters = grapheme_clusters(reference_word)
+    hyp_clusters = grapheme_clusters(transcribed_word)
+    return edit_distance(ref_clusters, hyp_clusters) / max(len(ref_clusters), len(hyp_clusters))
+
+
+def describe_difference(reference_word: str, transcribed_word: str) -> str:
+    """Explain a mismatch between two words in the style of the evaluation prompt."""
+    if transcribed_word == ILLEGIBLE:
+        return "Illegible word in transcription."
+
+    opcodes = SequenceMatcher(None, reference_word, transcribed_word, autojunk=False).get_opcodes()
+    missing = "".join(reference_word[i1:i2] for tag, i1, i2, _, _ in opcodes if tag == "delete")
+    extra = "".join(transcribed_word[j1:j2] for tag, _, _, j1, j2 in opcodes if tag == "insert")
+    replaced = any(tag == "replace" for tag, *_ in opcodes)
+
+    if not replaced and missing and not extra and all(_is_mark(char) for char in missing):
+        return f"Missing matra: '{missing}' missing in '{transcribed_word}'."
+    if not replaced and extra and not missing:
+        return f"Extra character: '{extra}' in '{transcribed_word}'."
+    return f"Spelling error: Transcribed '{transcribed_word}' vs reference '{reference_word}'."
+
+
+def align_words(reference_words: List[str], transcribed_words: List[str]) -> List[Dict]:
+    """
+    Align transcribed words to reference words.
+
+    Dynamic programming over word sequences with substitutions weighted by
+    grapheme edit distance, plus two-to-one merges ("मत कर" written "मतकर")
+    and one-to-two splits.
+
+    Args:
+        reference_words: Normalized reference words
+        transcribed_words: Normalized transcribed words
+
+    Returns:
+        One evaluation dict (reference_word, transcribed_word, match,
+        reason_diff) per reference word, in reference order
+    """
+    n, m = len(reference_words), len(transcribed_words)
+    inf = float("inf")
+    cost = [[inf] * (m + 1) for _ in range(n + 1)]
+    step = [[None] * (m + 1) for _ in range(n + 1)]
+    cost[0][0] = 0.0
+
+    for i in range(n + 1):
+        for j in range(m + 1):
+            if i == 0 and j == 0:
+                continue
+            candidates = []
+            if i and j:
+                candidates.append((
+                    cost[i - 1][j - 1] + word_distance(reference_words[i - 1], transcribed_words[j - 1]),
+                    "substitute"
+                ))
+            if i:
+                candidates.append((cost[i - 1][j] + GAP_COST, "delete"))
+            if j:
+                candidates.append((cost[i][j - 1] + GAP_COST, "insert"))
+            if i >= 2 and j:
+                merged = reference_words[i - 2] + reference_words[i - 1]
+                candidates.append((
+                    cost[i - 2][j - 1] + SEGMENTATION_COST + word_distance(merged, transcribed_words[j - 1]),
+                    "merge"
+                ))
+            if i and j >= 2:
+                joined = transcribed_words[j - 2] + transcribed_words[j - 1]
+                candidates.append((
+                    cost[i - 1][j - 2] + SEGMENTATION_COST + word_distance(reference_words[i - 1], joined),
+                    "split"
+                ))
+            # min keeps the first of equal-cost candidates, preferring substitution
+            cost[i][j], step[i][j] = min(candidates, key=lambda candidate: candidate[0])
+
+    evaluations: List[Dict] = []
+    i, j = n, m
+    while i or j:
+        operation = step[i][j]
+        if operation == "substitute":
+            reference_word, transcribed_word = reference_words[i - 1], transcribed_words[j - 1]
+            match = reference_word == transcribed_word
+            evaluations.append({
+                "reference_word": reference_word,
+                "transcribed_word": transcribed_word,
+                "match": match,
+                "reason_diff": "Exact match." if match else describe_difference(reference_word, transcribed_word),
+            })
+            i, j = i - 1, j - 1
+        elif operation == "delete":
+            evaluations.append({
+                "reference_word": reference_words[i - 1],
+                "transcribed_word": None,
+                "match": False,
+                "reason_diff": (
+                    f"Word missing: Reference word '{reference_words[i - 1]}' "
+                    "not found in transcription at this position."
+                ),
+            })
+            i -= 1
+        elif operation == "merge":
+            transcribed_word = transcribed_words[j - 1]
+            for reference_word in (reference_words[i - 1], reference_words[i - 2]):
+                evaluations.append({
+                    "reference_word": reference_word,
+                    "transcribed_word": transcribed_word,
+                    "match": False,
+                    "reason_diff": (
+                        f"Segmentation error: Reference '{reference_word}' appears merged in "
+                        f"transcription (as part of '{transcribed_word}')."
+                    ),
+                })
+            i, j = i - 2, j - 1
+        elif operation == "split":
+            reference_word = reference_words[i - 1]
+            evaluations.append({
+                "reference_word": reference_word,
+                "transcribed_word": f"{transcribed_words[j - 2]} {transcribed_words[j - 1]}",
+                "match": False,
+                "reason_diff": f"Segmentation error: Reference '{reference_word}' appears split in transcription.",
+            })
+            i, j = i - 1, j - 2
+        else:
+            # Extra transcribed words have no reference word to report against
+            j -= 1
+
+    evaluations.reverse()
+    return evaluations
+
+
+def transcription_from_evaluations(evaluations: List[Dict]) -> str:
+    """
+    Rebuild the transcription behind a list of word evaluations.
+
+    A word merged across two reference words is reported against both, so
+    consecutive repeats of an unmatched word are only included once.
+    Illegible markers are kept.
+
+    Args:
+        evaluations: Evaluation dicts in reference order
+
+    Returns:
+        Space-separated transcribed words
+    """
+    words: List[str] = []
+    previous = None
+    for evaluation in evaluations:
+        word = evaluation.get("transcribed_word")
+        if word and not (word == previous and not evaluation.get("match")):
+            words.append(word)
+        previous = word
+    return " ".join(words)
+
+
+def score_transcription(reference_text: Optional[str], transcription: Optional[str]) -> Dict:
+    """
+    Score a plain transcription against the reference text.
+
+    Args:
+        reference_text: Text the student was asked to write
+        transcription: Text read from the image
+
+    Returns:
+        Dict with full_text, evaluations, accuracy, correct_words and
+        total_words (as produced by GeminiOCR.summarize_evaluations) plus
+        word and character error rates
+    """
+    reference = normalize_text(reference_text)
+    hypothesis = normalize_text(transcription)
+    reference_words = reference.split()
+    transcribed_words = hypothesis.split()
+
+    evaluations = align_words(reference_words, transcribed_words)
+    total_words = len(evaluations)
+    correct_words = sum(1 for evaluation in evaluations if evaluation["match"])
+
+    reference_clusters = grapheme_clusters(reference)
+    # An illegible word counts as a single unreadable character, not eleven
+    hypothesis_clusters = grapheme_clusters(hypothesis.replace(ILLEGIBLE, "\ufffd"))
+    return {
+        "full_text": hypothesis,
+        "evaluations": evaluations,
+        "accuracy": (correct_words / total_words) * 100 if total_words > 0 else 0,
+        "correct_words": correct_words,
+        "total_words": total_words,
+        "wer": edit_distance(reference_words, transcribed_words) / len(reference_words) if reference_words else 0.0,
+        "cer": (
+            edit_distance(reference_clusters, hypothesis_clusters) / len(reference_clusters)
+            if reference_clusters else 0.0
+        ),
+    }
+
+
+# (evaluation id, stored accuracy, reference text, ocr_output, word_evaluations_json)
+RescoreRow = Tuple[int, Optional[float], Optional[str], Optional[str], Optional[str]]
+
+
+def rescore_chunk(rows: List[RescoreRow]) -> List[Dict]:
+    """
+    Rescore a chunk of stored evaluations locally.
+
+    The transcription is rebuilt from the stored word evaluations, which keep
+    illegible markers, and falls back to ocr_output. Runs in worker processes
+    (see src.rescoring), so it only takes and returns plain data.
+
+    Args:
+        rows: Stored evaluation rows
+
+    Returns:
+        One dict per row with the new accuracy, correct_words, total_words and
+        word evaluations, whether the accuracy changed, or the error if it failed
+    """
+    results = []
+    for evaluation_id, old_accuracy, reference_text, ocr_output, word_evaluations_json in rows:
+        try:
+            transcription = ocr_output
+            if word_evaluations_json:
+                transcription = transcription_from_evaluations(json.loads(word_evaluations_json))
+            scored = score_transcription(reference_text, transcription)
+            results.append({
+                "id": evaluation_id,
+                "accuracy": scored["accuracy"],
+                "correct_words": scored["correct_words"],
+                "total_words": scored["total_words"],
+                "evaluations": scored["evaluations"],
+                "changed": old_accuracy is None or abs(scored["accuracy"] - old_accuracy) > 1e-9,
+            })
+        except Exception as e:
+            results.append({"id": evaluation_id, "error": str(e)})
+    return results
@@ -0,0 +1,154 @@
+import hashlib
+import logging
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+from src.csv_stream import CsvSink, read_header, read_rows
+from src.run_journal import row_key
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse a shard spec such as "0/4".
+
+    Returns:
+        (index, count), with index counted from 0
+
+    Raises:
+        ValueError: If spec is not "i/N" with 0 <= i < N
+    """
+    try:
+        index, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {spec!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be between 0 and {count - 1}, got {spec!r}")
+    return index, count
+
+
+def shard_of(row: Dict, count: int) -> int:
+    """
+    Shard a CSV row belongs to, from a hash of its '#' column.
+
+    Unlike hash(), the result is the same in every process and on every
+    host, so separately started shards partition the rows between them.
+    """
+    digest = hashlib.sha256(row_key(row).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+
+def shard_label(index: int, count: int) -> str:
+    """Name used for a shard's output files and directories."""
+    return f"shard-{index}-of-{count}"
+
+
+def shard_base_path(csv_path: str, index: int, count: int) -> str:
+    """Path prefix of a shard's _updated.csv, _failed.csv and _journal.db."""
+    return f"{os.path.splitext(csv_path)[0]}_{shard_label(index, count)}"
+
+
+def merge_shards(csv_path: str, count: int) -> Dict:
+    """
+    Combine the outputs of all shards of a CSV into its _updated.csv and _failed.csv.
+
+    The input CSV is read again to restore the original row order. Each
+    shard wrote its rows in input order, so one pass with one reader per
+    shard is enough and memory stays flat however long the batch was.
+
+    Args:
+        csv_path: The input CSV the shards were run on
+        count: Number of shards
+
+    Returns:
+        Counts of merged 'rows' and 'failed' rows
+
+    Raises:
+        FileNotFoundError: If a shard has not written its output yet
+        ValueError: If a shard's output does not match the input, e.g. because
+            the CSV changed after that shard ran
+    """
+    bases = [shard_base_path(csv_path, index, count) for index in range(count)]
+    missing = [shard_label(index, count) for index, base in enumerate(bases) if not os.path.exists(f"{base}_updated.csv")]
+    if missing:
+        raise FileNotFoundError(f"No output from {', '.join(missing)}; run those shards first")
+
+    base_path = os.path.splitext(csv_path)[0]
+    fieldnames = read_header(f"{bases[0]}_updated.csv")
+    updated_sink = CsvSink(f"{base_path}_updated.csv", fieldnames)
+    failed_sink = CsvSink(f"{base_path}_failed.csv", fieldnames)
+    updated_readers = [read_rows(f"{base}_updated.csv") for base in bases]
+    failed_readers = [
+        read_rows(f"{base}_failed.csv") if os.path.exists(f"{base}_failed.csv") else iter(())
+        for base in bases
+    ]
+    next_failed = [next(reader, None) for reader in failed_readers]
+    stats = {'rows': 0, 'failed': 0}
+
+    try:
+        for row in read_rows(csv_path):
+            index = shard_of(row, count)
+            processed_row = next(updated_readers[index], None)
+            if processed_row is None or row_key(processed_row) != row_key(row):
+                raise ValueError(
+                    f"Output of {shard_label(index, count)} does not match the input at row {row_key(row)!r}; "
+                    f"rerun that shard"
+                )
+            updated_sink.write(processed_row)
+            stats['rows'] += 1
+
+            # Failed rows are copies of their updated rows, in the same order
+            if next_failed[index] == processed_row:
+                failed_sink.write(processed_row)
+                stats['failed'] += 1
+                next_failed[index] = next(failed_readers[index], None)
+
+        updated_sink.commit(keep_empty=True)
+        failed_sink.commit()
+    finally:
+        updated_sink.close()
+        failed_sink.close()
+        for reader in updated_readers + failed_readers:
+            if hasattr(reader, 'close'):
+                reader.close()
+
+    logging.info(f"Merged {count} shards: {stats['rows']} rows, {stats['failed']} failed")
+    return stats
+
+
+def launch_shards(csv_path: str, count: int, worker_args: List[str]) -> bool:
+    """
+    Process a CSV with count worker processes on this machine, then merge their outputs.
+
+    Each process runs "python -m src.orchestrator <csv> --shard i/N" with
+    worker_args appended, and takes 1/N of the Gemini request and token
+    quotas, so together they stay within GEMINI_RPM and GEMINI_TPM.
+
+    Args:
+        csv_path: The input CSV
+        count: Number of processes
+        worker_args: Extra command line arguments for every process
+
+    Returns:
+        Whether every shard succeeded and the outputs were merged
+    """
+    processes = [
+        subprocess.Popen([
+            sys.executable, "-m", "src.orchestrator", csv_path, "--shard", f"{index}/{count}", *worker_args
+        ])
+        for index in range(count)
+    ]
+    try:
+        exit_codes = [process.wait() for process in processes]
+    except BaseException:
+        for process in processes:
+            process.terminate()
+        raise
+
+    failed = [shard_label(index, count) for index, code in enumerate(exit_codes) if code != 0]
+    if failed:
+        logging.error(f"{', '.join(failed)} failed; rerun with --resume to finish, then merge")
+        return False
+    merge_shards(csv_path, count)
+    return True
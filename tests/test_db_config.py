@@ -0,0 +1,44 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from src.db_config import DatabaseSettings, normalize_database_url
+
+class TestDatabaseSettings(unittest.TestCase):
+    def test_from_env(self):
+        """Test that the URL gains an async driver and echo is off unless asked for."""
+        with mock.patch.dict(os.environ, {"DATABASE_URL": "postgresql://ocr@db/ocr", "DATABASE_POOL_SIZE": "20"}):
+            settings = DatabaseSettings.from_env()
+        self.assertEqual(settings.url, "postgresql+asyncpg://ocr@db/ocr")
+        self.assertFalse(settings.echo)
+        self.assertFalse(settings.is_sqlite)
+        self.assertEqual(settings.engine_kwargs()["pool_size"], 20)
+        self.assertTrue(settings.engine_kwargs()["pool_pre_ping"])
+        self.assertEqual(normalize_database_url("sqlite:///x.db"), "sqlite+aiosqlite:///x.db")
+
+    def test_sqlite_keeps_default_pool(self):
+        """Test that pool sizing is only passed for server databases, not file or in-memory SQLite."""
+        self.assertNotIn("pool_size", DatabaseSettings(url="sqlite+aiosqlite:///:memory:").engine_kwargs())
+        self.assertNotIn("pool_size", DatabaseSettings().engine_kwargs())
+        self.assertEqual(DatabaseSettings().engine_kwargs()["connect_args"], {"timeout": 5.0})
+
+    def test_sqlite_pragmas_apply(self):
+        """Test that the pragma statements are valid and take effect on a connection."""
+        settings = DatabaseSettings(busy_timeout_ms=2500)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            conn = sqlite3.connect(str(Path(temp_dir) / "test.db"))
+            try:
+                for pragma in settings.sqlite_pragmas():
+                    conn.execute(pragma)
+                self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+                self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+                self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 2500)
+                self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -65536)
+            finally:
+                conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.download_cache import DownloadCache
+
+class TestDownloadCache(unittest.TestCase):
+    def setUp(self):
+        """Set up a cache in a temporary directory with room for two 10-byte files."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache = DownloadCache(self.temp_dir.name, max_bytes=20)
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def download(self, url, content=b"0123456789", etag='"v1"', last_modified=None):
+        temp_path = self.cache.temp_path(url)
+        temp_path.write_bytes(content)
+        return self.cache.store(url, temp_path, etag, last_modified)
+
+    def test_validators_round_trip(self):
+        """Test that a stored download is revalidated with its headers and reused on 304."""
+        url = "http://example.invalid/page.png"
+        self.assertEqual(self.cache.validators(url), {})
+        self.assertIsNone(self.cache.not_modified(url))
+
+        path = self.download(url, last_modified="Wed, 21 Oct 2015 07:28:00 GMT")
+        self.assertTrue(path.endswith(".png"))
+        self.assertEqual(self.cache.validators(url), {
+            "If-None-Match": '"v1"',
+            "If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT",
+        })
+        self.assertEqual(self.cache.not_modified(url), path)
+        self.assertEqual(self.cache.get_stats()["not_modified"], 1)
+
+        # A missing file means the next request must be unconditional
+        Path(path).unlink()
+        self.assertEqual(self.cache.validators(url), {})
+
+    def test_least_recently_used_evicted(self):
+        """Test that going over budget evicts the least recently used file."""
+        first = self.download("http://example.invalid/1.jpg")
+        second = self.download("http://example.invalid/2.jpg")
+        self.cache.not_modified("http://example.invalid/1.jpg")
+        third = self.download("http://example.invalid/3.jpg")
+
+        self.assertTrue(Path(first).exists())
+        self.assertFalse(Path(second).exists())
+        self.assertTrue(Path(third).exists())
+        self.assertEqual(self.cache.validators("http://example.invalid/2.jpg"), {})
+        self.assertEqual(self.cache.get_stats()["bytes"], 20)
+
+    def test_index_survives_reopen(self):
+        """Test that cached entries are still revalidated after reopening the cache."""
+        url = "http://example.invalid/1.jpg"
+        self.download(url)
+        self.cache.close()
+        self.cache = DownloadCache(self.temp_dir.name, max_bytes=20)
+        self.assertEqual(self.cache.validators(url), {"If-None-Match": '"v1"'})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.evaluation_shards import EvaluationShards, iter_shard_records, zstandard
+
+def record(number, text="हर पल"):
+    return {"image_info": {"number": number, "reference_text": text}, "evaluation": {"word_evaluations": []}}
+
+class TestEvaluationShards(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.directory = Path(self.temp_dir.name)
+
+    def test_shards_rotate_and_records_read_back(self):
+        """Test that full shards rotate and every image is read back from its shard."""
+        shards = EvaluationShards(self.directory, max_bytes=200)
+        self.addCleanup(shards.close)
+        locations = [shards.append(str(number), record(str(number))) for number in range(1, 11)]
+
+        self.assertGreater(len(list(self.directory.glob("evaluations-*.jsonl"))), 1)
+        self.assertNotEqual(locations[0].split(":")[0], locations[-1].split(":")[0])
+        for number in range(1, 11):
+            self.assertEqual(shards.read(str(number))["image_info"]["number"], str(number))
+        self.assertIsNone(shards.read("11"))
+        self.assertEqual(len(list(iter_shard_records(self.directory))), 10)
+
+    def test_latest_record_wins_after_reopen(self):
+        """Test that a re-evaluated image reads back its newest record, also after a torn line."""
+        shards = EvaluationShards(self.directory)
+        shards.append("1", record("1", "हर"))
+        shards.close()
+        with open(self.directory / "evaluations-00000.jsonl", "ab") as f:
+            f.write(b'{"image_info": {"num')
+
+        shards = EvaluationShards(self.directory)
+        self.addCleanup(shards.close)
+        shards.append("1", record("1", "पल"))
+        self.assertEqual(shards.read("1")["image_info"]["reference_text"], "पल")
+        self.assertEqual(
+            [data["image_info"]["reference_text"] for data in iter_shard_records(self.directory)], ["हर", "पल"]
+        )
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd_records_read_back(self):
+        """Test that zstd shards hold one frame per record and read back both ways."""
+        shards = EvaluationShards(self.directory, compression="zstd")
+        self.addCleanup(shards.close)
+        shards.append("1", record("1"))
+        shards.append("2", record("2"))
+
+        self.assertEqual(shards.read("2")["image_info"]["number"], "2")
+        self.assertEqual([data["image_info"]["number"] for data in shards.iter_records()], ["1", "2"])
+
+if __name__ == "__main__":
+    unittest.main()
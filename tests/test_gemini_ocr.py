@@ -1,42 +1,62 @@
 import os
+import tempfile
 import unittest
 from pathlib import Path
+from unittest import mock
+
+import PIL.Image
+
 from src.gemini_ocr import GeminiOCR
+from src.ocr_backends import ReplayBackend
+
+LIVE = bool(os.getenv("GOOGLE_API_KEY"))
 
 class TestGeminiOCR(unittest.TestCase):
     def setUp(self):
-        """Set up test cases."""
-        self.ocr = GeminiOCR()
-        
-        # Create a test image path
-        self.test_image_path = Path(__file__).parent / "test_image.jpg"
-        
-        # Ensure GOOGLE_API_KEY is set
-        if not os.getenv("GOOGLE_API_KEY"):
-            self.skipTest("GOOGLE_API_KEY environment variable is not set")
-    
+        """Set up test cases against the live API with a key, else the replay backend."""
+        # Keep the default result cache from writing into the working directory
+        env_patch = mock.patch.dict(os.environ, {"OCR_CACHE_ENABLED": "false"})
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.backend = None if LIVE else ReplayBackend(self.temp_dir.name)
+        self.ocr = GeminiOCR(backend=self.backend)
+
+        # Create a test image
+        self.test_image_path = Path(self.temp_dir.name) / "test_image.png"
+        PIL.Image.new("RGB", (64, 32), color="white").save(self.test_image_path)
+
     def test_init(self):
         """Test initialization of GeminiOCR."""
-        ocr = GeminiOCR()
+        ocr = GeminiOCR(backend=self.backend)
         self.assertIsNotNone(ocr)
         self.assertEqual(ocr.timeout, 60)
-    
+
     def test_missing_api_key(self):
         """Test initialization without API key."""
-        # Temporarily remove API key
-        original_key = os.environ.pop("GOOGLE_API_KEY", None)
-        try:
+        with mock.patch.dict(os.environ, {"OCR_BACKEND": "gemini"}):
+            os.environ.pop("GOOGLE_API_KEY", None)
             with self.assertRaises(ValueError):
                 GeminiOCR()
-        finally:
-            # Restore API key
-            if original_key:
-                os.environ["GOOGLE_API_KEY"] = original_key
-    
+
     def test_invalid_image_path(self):
         """Test with invalid image path."""
         with self.assertRaises(FileNotFoundError):
             self.ocr.extract_text("nonexistent_image.jpg")
 
+    def test_extract_text(self):
+        """Test that a call returns an evaluation per reference word and the call's usage."""
+        result = self.ocr.extract_text(self.test_image_path, "हर पल")
+        self.assertNotIn("error", result)
+        self.assertEqual(result["total_words"], 2)
+        self.assertIn("usage", result)
+
+    @unittest.skipUnless(LIVE, "GOOGLE_API_KEY environment variable is not set")
+    def test_live_backend(self):
+        """Test that the live client is used when a key is set."""
+        self.assertEqual(type(self.ocr.backend).__name__, "GeminiBackend")
+
 if __name__ == "__main__":
-    unittest.main() 
\ No newline at end of file
+    unittest.main()
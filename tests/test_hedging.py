@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from src.hedging import DeadlineExceeded, HedgePolicy, LatencyTracker
+
+class TestHedgePolicy(unittest.TestCase):
+    def _policy(self, **kwargs) -> HedgePolicy:
+        """Build a policy whose hedge threshold is already at 10 ms."""
+        policy = HedgePolicy(min_samples=10, **kwargs)
+        for _ in range(10):
+            policy.attempt_latency.record(10)
+        return policy
+    
+    def test_percentiles(self):
+        """Test nearest-rank percentiles."""
+        tracker = LatencyTracker()
+        for latency in range(1, 101):
+            tracker.record(latency)
+        self.assertEqual(tracker.summary(), {"count": 100, "p50": 50, "p95": 95, "p99": 99})
+    
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        """Test that a hedge beats a stalled primary and the primary is cancelled."""
+        policy = self._policy(max_hedge_fraction=1.0)
+        cancelled = []
+        
+        async def attempt(hedge: bool):
+            try:
+                await asyncio.sleep(0 if hedge else 5)
+            except asyncio.CancelledError:
+                cancelled.append(hedge)
+                raise
+            return "hedge" if hedge else "primary"
+        
+        async def run():
+            result = await policy.run_async(attempt)
+            await asyncio.sleep(0)
+            return result
+        
+        self.assertEqual(asyncio.run(run()), ("hedge", True))
+        self.assertEqual(cancelled, [False])
+        self.assertEqual(policy.get_stats()["hedge_win_rate"], 1.0)
+    
+    def test_blocking_loser_handed_over_when_complete(self):
+        """Test that a blocking loser runs on and its result is handed over to on_loser."""
+        policy = self._policy(max_hedge_fraction=1.0, deadline_seconds=5)
+        losers = []
+        finished = threading.Event()
+        
+        def on_loser(result):
+            losers.append(result)
+            finished.set()
+        
+        def attempt(hedge: bool):
+            time.sleep(0 if hedge else 0.1)
+            return "hedge" if hedge else "primary"
+        
+        self.assertEqual(policy.run(attempt, on_loser=on_loser), ("hedge", True))
+        self.assertEqual(losers, [])
+        self.assertTrue(finished.wait(1))
+        self.assertEqual(losers, ["primary"])
+    
+    def test_hedges_capped_by_fraction(self):
+        """Test that no hedge is sent once the hedge budget is used up."""
+        policy = self._policy(max_hedge_fraction=0.0)
+        
+        async def attempt(hedge: bool):
+            await asyncio.sleep(0.05)
+            return hedge
+        
+        self.assertEqual(asyncio.run(policy.run_async(attempt)), (False, False))
+        self.assertEqual(policy.get_stats()["hedges"], 0)
+    
+    def test_deadline(self):
+        """Test that a call missing its deadline raises DeadlineExceeded."""
+        policy = HedgePolicy(percentile=0)
+        
+        async def attempt(hedge: bool):
+            await asyncio.sleep(5)
+        
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(policy.run_async(attempt, deadline=0.05))
+        self.assertEqual(policy.get_stats()["deadline_exceeded"], 1)
+    
+    def test_blocking_hedge(self):
+        """Test hedging for blocking calls on the thread pool."""
+        policy = self._policy(max_hedge_fraction=1.0)
+        self.addCleanup(policy.close)
+        
+        def attempt(hedge: bool):
+            time.sleep(0 if hedge else 0.5)
+            return hedge
+        
+        self.assertEqual(policy.run(attempt), (True, True))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+import PIL.Image
+
+from src.image_store import ImageStore
+from src.ocr_cache import hash_image
+
+class TestImageStore(unittest.TestCase):
+    def setUp(self):
+        """Set up a store in a temporary directory."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name)
+        self.store = ImageStore(self.root / "store")
+
+    def tearDown(self):
+        self.store.close()
+        self.temp_dir.cleanup()
+
+    def test_identical_content_stored_once(self):
+        """Test that the same bytes from a file and from memory share one blob."""
+        source = self.root / "page.png"
+        PIL.Image.new("RGB", (4, 4), color="white").save(source)
+
+        digest = self.store.put_file(source)
+        self.assertEqual(digest, hash_image(source))
+        self.assertEqual(self.store.put_bytes(source.read_bytes()), digest)
+
+        path = self.store.path(digest)
+        self.assertEqual(path.relative_to(self.store.root).parts, (digest[:2], digest[2:4], digest))
+        self.assertEqual(self.store.digest_of(path), digest)
+        self.assertIsNone(self.store.digest_of(source))
+        self.assertTrue(source.exists())
+
+        stats = self.store.get_stats()
+        self.assertEqual((stats["writes"], stats["deduplicated"], stats["blobs"]), (1, 1, 1))
+
+    def test_blob_deleted_with_last_reference(self):
+        """Test that a blob survives until every reference is released."""
+        digest = self.store.put_bytes(b"image bytes")
+        self.assertEqual(self.store.incref(digest), 1)
+        self.assertEqual(self.store.incref(digest), 2)
+
+        self.assertEqual(self.store.decref(digest), 1)
+        self.assertTrue(self.store.exists(digest))
+        self.assertEqual(self.store.decref(digest), 0)
+        self.assertFalse(self.store.exists(digest))
+        with self.assertRaises(KeyError):
+            self.store.incref(digest)
+
+    def test_moved_file_kept_once(self):
+        """Test that a moved file leaves only the stored blob behind."""
+        source = self.root / "page.png"
+        source.write_bytes(b"image bytes")
+        duplicate = self.root / "copy.png"
+        duplicate.write_bytes(b"image bytes")
+
+        digest = self.store.put_file(source, move=True)
+        self.assertEqual(self.store.put_file(duplicate, move=True), digest)
+        self.assertFalse(source.exists())
+        self.assertFalse(duplicate.exists())
+        self.assertEqual(self.store.path(digest).read_bytes(), b"image bytes")
+
+    def test_sweep_removes_unreferenced_blobs_after_grace(self):
+        """Test that sweep() keeps referenced and recent blobs and deletes the rest."""
+        referenced = self.store.put_bytes(b"attached")
+        self.store.incref(referenced)
+        orphan = self.store.put_bytes(b"never attached")
+
+        self.assertEqual(self.store.sweep(), 0)
+        self.assertEqual(self.store.sweep(grace_seconds=-1), 1)
+        self.assertFalse(self.store.exists(orphan))
+        self.assertTrue(self.store.exists(referenced))
+        self.assertEqual(self.store.refcount(referenced), 1)
+
+    def test_streaming_read(self):
+        """Test that a blob is read back in bounded chunks."""
+        data = bytes(range(256)) * 10
+        digest = self.store.put_stream(data[i:i + 100] for i in range(0, len(data), 100))
+        self.assertEqual(digest, hashlib.sha256(data).hexdigest())
+
+        chunks = list(self.store.iter_chunks(digest, chunk_size=1000))
+        self.assertEqual([len(chunk) for chunk in chunks], [1000, 1000, 560])
+        self.assertEqual(b"".join(chunks), data)
+
+if __name__ == "__main__":
+    unittest.main()
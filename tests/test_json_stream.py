@@ -0,0 +1,39 @@
+import json
+import unittest
+
+from src.json_stream import JsonArrayStreamParser
+
+class TestJsonArrayStreamParser(unittest.TestCase):
+    def setUp(self):
+        self.items = [
+            {"reference_word": "हर", "transcribed_word": "हर", "match": True, "reason_diff": "Exact match."},
+            {"reference_word": "पल", "transcribed_word": None, "match": False,
+             "reason_diff": 'Word missing: {braces} and "quotes" [brackets] \\ end'}
+        ]
+        self.text = "```json\n" + json.dumps(self.items, ensure_ascii=False, indent=2) + "\n```"
+    
+    def test_one_character_at_a_time(self):
+        """Test that objects are emitted as soon as they close."""
+        parser = JsonArrayStreamParser()
+        emitted_at = []
+        for position, char in enumerate(self.text):
+            for item in parser.feed(char):
+                emitted_at.append((position, item))
+        
+        self.assertEqual([item for _, item in emitted_at], self.items)
+        self.assertLess(emitted_at[0][0], self.text.index('"पल"'))
+        self.assertTrue(parser.done)
+    
+    def test_whole_text_in_one_chunk(self):
+        """Test that a single chunk yields every element."""
+        parser = JsonArrayStreamParser()
+        self.assertEqual(parser.feed(self.text), self.items)
+    
+    def test_unterminated_array_is_not_done(self):
+        """Test that a truncated stream is detectable."""
+        parser = JsonArrayStreamParser()
+        parser.feed(self.text[:self.text.index('"पल"')])
+        self.assertFalse(parser.done)
+
+if __name__ == "__main__":
+    unittest.main()
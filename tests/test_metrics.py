@@ -0,0 +1,79 @@
+import random
+import unittest
+
+import numpy as np
+
+from src.metrics import (
+    MetricsCache,
+    batch_edit_distance,
+    bootstrap_ci,
+    compute_error_rates,
+    encode_texts,
+    position_error_rates,
+)
+from src.scoring import edit_distance
+
+class TestBatchEditDistance(unittest.TestCase):
+    def test_matches_reference_implementation(self):
+        """Test the batched kernel against the scalar Levenshtein distance, across batches."""
+        rng = random.Random(0)
+        references = ["".join(rng.choice("abc") for _ in range(rng.randint(0, 12))) for _ in range(300)]
+        hypotheses = ["".join(rng.choice("abc") for _ in range(rng.randint(0, 12))) for _ in range(300)]
+        
+        vocab = {}
+        distances = batch_edit_distance(
+            *encode_texts(references, list, vocab), *encode_texts(hypotheses, list, vocab), batch_size=64
+        )
+        expected = [edit_distance(ref, hyp) for ref, hyp in zip(references, hypotheses)]
+        self.assertEqual(distances.tolist(), expected)
+
+class TestErrorRates(unittest.TestCase):
+    def test_corpus_rates(self):
+        """Test that CER and WER are total errors over total reference length."""
+        metrics = compute_error_rates(
+            ["हर पल", "मत कर"],
+            ["हर पल", "मत"],
+            [[True, True], [True, False]],
+            n_resamples=200
+        )
+        self.assertEqual(metrics["evaluations"], 2)
+        self.assertAlmostEqual(metrics["wer"], 1 / 4)
+        # " कर" is three missing clusters out of ten
+        self.assertAlmostEqual(metrics["cer"], 3 / 10)
+        self.assertEqual(metrics["position_error_rates"], [0.0, 0.5])
+        low, high = metrics["wer_ci"]
+        self.assertLessEqual(low, metrics["wer"])
+        self.assertGreaterEqual(high, metrics["wer"])
+    
+    def test_empty_scope(self):
+        """Test that no evaluations yields empty metrics rather than an error."""
+        metrics = compute_error_rates([], [], [])
+        self.assertIsNone(metrics["cer"])
+        self.assertIsNone(metrics["wer_ci"])
+        self.assertEqual(metrics["position_error_rates"], [])
+    
+    def test_bootstrap_is_deterministic(self):
+        """Test that a fixed seed gives the same interval, which narrows with more data."""
+        rng = np.random.default_rng(1)
+        errors = rng.integers(0, 3, 500)
+        lengths = np.full(500, 10)
+        
+        first = bootstrap_ci([(errors, lengths)], seed=7)
+        self.assertEqual(first, bootstrap_ci([(errors, lengths)], seed=7))
+        small = bootstrap_ci([(errors[:50], lengths[:50])], seed=7)
+        self.assertLess(first[0][1] - first[0][0], small[0][1] - small[0][0])
+    
+    def test_position_error_rates_ragged(self):
+        """Test that positions only count evaluations long enough to have them."""
+        self.assertEqual(position_error_rates([[True, False, False], [False]]), [0.5, 1.0, 1.0])
+
+class TestMetricsCache(unittest.TestCase):
+    def test_stale_fingerprint_misses(self):
+        """Test that cached metrics are dropped once the evaluations change."""
+        cache = MetricsCache()
+        cache.put(("run", 1), (10, "t1"), {"cer": 0.1})
+        self.assertEqual(cache.get(("run", 1), (10, "t1")), {"cer": 0.1})
+        self.assertIsNone(cache.get(("run", 1), (11, "t2")))
+
+if __name__ == "__main__":
+    unittest.main()
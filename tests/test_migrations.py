@@ -0,0 +1,84 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from sqlalchemy import Column, ForeignKey, Index, Integer, MetaData, String, Table, create_engine
+
+from src.migrations import MIGRATIONS, applied_versions, apply_migrations
+
+# Tables as older databases have them: no index on image_id, no retry_count, no key on dataset_images
+LEGACY_SCHEMA = """
+CREATE TABLE images (id INTEGER NOT NULL PRIMARY KEY, number VARCHAR);
+CREATE TABLE evaluations (id INTEGER NOT NULL PRIMARY KEY, image_id INTEGER, prompt_version VARCHAR);
+CREATE TABLE dataset_images (dataset_id INTEGER, image_id INTEGER);
+INSERT INTO evaluations (image_id, prompt_version) VALUES (1, 'v1'), (2, 'v1');
+INSERT INTO dataset_images VALUES (1, 1), (1, 1), (1, 2);
+"""
+
+def model_metadata():
+    """A slice of the models, declared the way src.database declares them"""
+    metadata = MetaData()
+    Table('images', metadata, Column('id', Integer, primary_key=True), Column('number', String))
+    Table(
+        'evaluations', metadata,
+        Column('id', Integer, primary_key=True),
+        Column('image_id', Integer, ForeignKey('images.id')),
+        Column('prompt_version', String),
+        Column('retry_count', Integer, default=0),
+        Index('ix_evaluations_image_id_prompt_version', 'image_id', 'prompt_version')
+    )
+    Table(
+        'dataset_images', metadata,
+        Column('dataset_id', Integer, primary_key=True),
+        Column('image_id', Integer, ForeignKey('images.id'), primary_key=True),
+        Index('ix_dataset_images_image_id', 'image_id')
+    )
+    return metadata
+
+class TestMigrations(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.db_path = Path(self.temp_dir.name) / "ocr_evaluations.db"
+        self.engine = create_engine(f"sqlite:///{self.db_path}")
+        self.addCleanup(self.engine.dispose)
+
+    def migrate(self, metadata):
+        with self.engine.begin() as conn:
+            metadata.create_all(conn)
+            return apply_migrations(conn, metadata)
+
+    def query_plan(self, conn, query):
+        return " ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}"))
+
+    def test_legacy_database_is_upgraded_once(self):
+        """Test that an old database gains columns, indexes and unique pairs, and is migrated only once."""
+        conn = sqlite3.connect(str(self.db_path))
+        conn.executescript(LEGACY_SCHEMA)
+        lookup = "SELECT id FROM evaluations WHERE image_id = 1 AND prompt_version = 'v1'"
+        self.assertIn("SCAN evaluations", self.query_plan(conn, lookup))
+        conn.close()
+
+        metadata = model_metadata()
+        self.assertEqual(self.migrate(metadata), [version for version, _, _ in MIGRATIONS])
+        self.assertEqual(self.migrate(metadata), [])
+
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            self.assertIn("ix_evaluations_image_id_prompt_version", self.query_plan(conn, lookup))
+            self.assertIn("retry_count", [row[1] for row in conn.execute("PRAGMA table_info(evaluations)")])
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM dataset_images").fetchone()[0], 2)
+            with self.assertRaises(sqlite3.IntegrityError):
+                conn.execute("INSERT INTO dataset_images VALUES (1, 2)")
+        finally:
+            conn.close()
+
+    def test_new_database_records_every_version(self):
+        """Test that a database created from the models is marked fully migrated."""
+        self.migrate(model_metadata())
+        with self.engine.connect() as conn:
+            self.assertEqual(applied_versions(conn), {version for version, _, _ in MIGRATIONS})
+
+if __name__ == "__main__":
+    unittest.main()
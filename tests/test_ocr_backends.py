@@ -0,0 +1,276 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+from pathlib import Path
+
+import PIL.Image
+from google.genai.errors import ClientError, ServerError
+
+from src.gemini_ocr import GeminiOCR
+from src.hedging import DeadlineExceeded, HedgePolicy
+from src.image_store import ImageBytes
+from src.ocr_cache import OcrResultCache, hash_image
+from src.ocr_executor import OcrExecutor
+from src.ocr_usage import OcrUsage
+from src.ocr_backends import GeminiBackend, OcrBackend, ReplayBackend
+from src.prompt_registry import TRANSCRIPTION_PROMPT, PromptRegistry
+
+class TestReplayBackend(unittest.TestCase):
+    def setUp(self):
+        """Write a single recording and an image to a temporary directory."""
+        # Keep the default result cache from writing into the working directory
+        env_patch = mock.patch.dict(os.environ, {"OCR_CACHE_ENABLED": "false"})
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+        
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.recordings_dir = Path(self.temp_dir.name)
+        
+        recording = {
+            "image_info": {"number": "1", "reference_text": "हर पल\nलड़ाई"},
+            "evaluation": {
+                "word_evaluations": [
+                    {"reference_word": "हर", "transcribed_word": "हर", "match": True, "reason_diff": "Exact match."},
+                    {"reference_word": "पल", "transcribed_word": "पल", "match": True, "reason_diff": "Exact match."},
+                    {"reference_word": "लड़ाई", "transcribed_word": "लड़ई", "match": False, "reason_diff": "Missing matra."}
+                ]
+            }
+        }
+        with open(self.recordings_dir / "evaluation_1.json", "w", encoding="utf-8") as f:
+            json.dump(recording, f, ensure_ascii=False)
+        
+        self.image_path = self.recordings_dir / "image.png"
+        PIL.Image.new("RGB", (4, 4), color="white").save(self.image_path)
+    
+    def tearDown(self):
+        self.temp_dir.cleanup()
+    
+    def test_satisfies_protocol(self):
+        """Test that the replay backend implements OcrBackend."""
+        self.assertIsInstance(ReplayBackend(self.recordings_dir), OcrBackend)
+    
+    def test_replays_recording(self):
+        """Test that a recorded reference is replayed through GeminiOCR."""
+        backend = ReplayBackend(self.recordings_dir)
+        ocr = GeminiOCR(backend=backend)
+        
+        result = ocr.extract_text(self.image_path, "हर पल लड़ाई")
+        self.assertEqual(result["total_words"], 3)
+        self.assertEqual(result["correct_words"], 2)
+        self.assertEqual(result["full_text"], "हर पल लड़ई")
+    
+    def test_unrecorded_reference_matches_exactly(self):
+        """Test the synthetic exact-match response for unknown references."""
+        backend = ReplayBackend(self.recordings_dir)
+        output = json.loads(backend.generate(self.image_path, "prompt", "मत कर"))
+        self.assertEqual([w["transcribed_word"] for w in output], ["मत", "कर"])
+        self.assertTrue(all(w["match"] for w in output))
+    
+    def test_error_injection(self):
+        """Test that 429 and server errors are injected at the configured rates."""
+        with self.assertRaises(ClientError) as context:
+            ReplayBackend(self.recordings_dir, rate_limit_rate=1.0).generate(self.image_path, "prompt", "हर")
+        self.assertEqual(context.exception.code, 429)
+        
+        with self.assertRaises(ServerError):
+            ReplayBackend(self.recordings_dir, error_rate=1.0).generate(self.image_path, "prompt", "हर")
+    
+    def test_async_latency(self):
+        """Test that async calls sleep for the configured latency."""
+        backend = ReplayBackend(self.recordings_dir, latency_ms=20)
+        loop = asyncio.new_event_loop()
+        try:
+            start = loop.time()
+            loop.run_until_complete(backend.generate_async(self.image_path, "prompt", "हर"))
+            self.assertGreaterEqual(loop.time() - start, 0.015)
+        finally:
+            loop.close()
+    
+    def test_stream_yields_words_incrementally(self):
+        """Test streaming through GeminiOCR matches the non-streaming result."""
+        backend = ReplayBackend(self.recordings_dir, stream_chunk_chars=8)
+        ocr = GeminiOCR(backend=backend)
+        
+        usage = OcrUsage(model=ocr.model)
+        
+        async def collect():
+            return [word async for word in ocr.extract_text_stream(self.image_path, "हर पल लड़ाई", usage=usage)]
+        
+        words = asyncio.run(collect())
+        self.assertEqual([w.reference_word for w in words], ["हर", "पल", "लड़ाई"])
+        self.assertGreater(usage.candidates_tokens, 0)
+        result = ocr.extract_text(self.image_path, "हर पल लड़ाई")
+        result.pop("usage")
+        self.assertEqual(GeminiOCR.summarize_evaluations(words), result)
+    
+    def test_stream_deadline(self):
+        """Test that a stream still running at its deadline is abandoned."""
+        ocr = GeminiOCR(backend=ReplayBackend(self.recordings_dir, latency_ms=500, stream_chunk_chars=2))
+        
+        async def collect():
+            return [word async for word in ocr.extract_text_stream(self.image_path, "हर पल लड़ाई", deadline=0.1)]
+        
+        with self.assertRaises(DeadlineExceeded):
+            asyncio.run(collect())
+        self.assertEqual(ocr.stream_hedging.get_stats()["deadline_exceeded"], 1)
+    
+    def test_blocking_loser_holds_its_slot(self):
+        """Test that a blocking hedge that loses keeps its concurrency slot until it ends."""
+        policy = HedgePolicy(min_samples=1, max_hedge_fraction=1.0, deadline_seconds=5)
+        policy.attempt_latency.record(50)
+        ocr = GeminiOCR(backend=ReplayBackend(self.recordings_dir, latency_ms=100), hedge_policy=policy)
+        
+        result = ocr.extract_text(self.image_path, "हर पल लड़ाई")
+        self.assertNotIn("error", result)
+        self.assertFalse(result["usage"]["hedged"])
+        self.assertEqual(ocr.governor.in_flight, 1)
+        time.sleep(0.2)
+        self.assertEqual(ocr.governor.in_flight, 0)
+    
+    def test_usage_recorded(self):
+        """Test that each call reports latency and token counts, and cache hits cost nothing."""
+        cache = OcrResultCache(self.recordings_dir / "cache.db")
+        self.addCleanup(cache.close)
+        ocr = GeminiOCR(backend=ReplayBackend(self.recordings_dir, latency_ms=10), cache=cache)
+        
+        usage = ocr.extract_text(self.image_path, "हर पल लड़ाई")["usage"]
+        self.assertFalse(usage["cache_hit"])
+        self.assertGreaterEqual(usage["latency_ms"], 5)
+        self.assertGreater(usage["prompt_tokens"], 258)
+        self.assertGreater(usage["candidates_tokens"], 0)
+        
+        cached_usage = ocr.extract_text(self.image_path, "हर पल लड़ाई")["usage"]
+        self.assertTrue(cached_usage["cache_hit"])
+        self.assertEqual(cached_usage["cost_estimate"], 0.0)
+    
+    def test_transcription_prompt_scored_locally(self):
+        """Test that a transcription-only prompt is aligned and scored on the client."""
+        ocr = GeminiOCR(
+            backend=ReplayBackend(self.recordings_dir),
+            prompt_registry=PromptRegistry(default=TRANSCRIPTION_PROMPT)
+        )
+        
+        result = ocr.extract_text(self.image_path, "हर पल लड़ाई")
+        self.assertEqual(result["full_text"], "हर पल लड़ई")
+        self.assertEqual(result["correct_words"], 2)
+        self.assertIn("Missing matra", result["evaluations"][2]["reason_diff"])
+        self.assertAlmostEqual(result["wer"], 1 / 3)
+        
+        async def collect():
+            return [word async for word in ocr.extract_text_stream(self.image_path, "हर पल लड़ाई")]
+        
+        self.assertEqual([w.dict() for w in asyncio.run(collect())], result["evaluations"])
+    
+    def test_invalid_image_path(self):
+        """Test with invalid image path."""
+        ocr = GeminiOCR(backend=ReplayBackend(self.recordings_dir))
+        with self.assertRaises(FileNotFoundError):
+            ocr.extract_text("nonexistent_image.jpg")
+
+class TestGeminiBackendImages(unittest.TestCase):
+    def setUp(self):
+        """Create a backend with a mocked client and a small image file."""
+        env_patch = mock.patch.dict(os.environ, {"GOOGLE_API_KEY": "test-key"})
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+        
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.image_path = Path(self.temp_dir.name) / "image.png"
+        PIL.Image.new("RGB", (4, 4), color="white").save(self.image_path)
+    
+    def _backend(self, inline_max_bytes: int) -> GeminiBackend:
+        backend = GeminiBackend(inline_max_bytes=inline_max_bytes)
+        backend.client = mock.MagicMock()
+        backend.client.aio.files.upload = mock.AsyncMock(return_value=mock.MagicMock(name="files/abc"))
+        return backend
+    
+    def test_small_image_sent_inline(self):
+        """Test that images under the threshold are not uploaded."""
+        backend = self._backend(inline_max_bytes=1024 * 1024)
+        part = backend._process_image(self.image_path)
+        
+        self.assertEqual(part.inline_data.mime_type, "image/png")
+        backend.client.files.upload.assert_not_called()
+    
+    def test_in_memory_image_sent_without_copy(self):
+        """Test that in-memory bytes go into the inline part as the same buffer."""
+        backend = self._backend(inline_max_bytes=1024 * 1024)
+        image = ImageBytes(self.image_path.read_bytes(), mime_type="image/png")
+        part = backend._process_image(image)
+        
+        self.assertIs(part.inline_data.data, image.data)
+        self.assertEqual(part.inline_data.mime_type, "image/png")
+        self.assertEqual(hash_image(image), hash_image(self.image_path))
+    
+    def test_large_image_uploaded_once(self):
+        """Test that repeated requests for one large image share an upload."""
+        backend = self._backend(inline_max_bytes=0)
+        first = backend._process_image(self.image_path)
+        second = backend._process_image(self.image_path)
+        
+        self.assertIs(first, second)
+        backend.client.files.upload.assert_called_once()
+        
+        backend.close()
+        backend.client.files.delete.assert_called_once()
+    
+    def test_async_image_work_runs_on_executor(self):
+        """Test that an async call reads the image file on the executor."""
+        backend = self._backend(inline_max_bytes=1024 * 1024)
+        backend.executor = OcrExecutor(max_workers=1)
+        self.addCleanup(backend.executor.shutdown)
+        
+        part = asyncio.run(backend._process_image_async(self.image_path))
+        
+        self.assertEqual(part.inline_data.data, self.image_path.read_bytes())
+        self.assertEqual(backend.executor.get_stats()["completed"], 2)
+    
+    def test_concurrent_async_uploads_are_shared(self):
+        """Test that concurrent async requests for one image upload it once."""
+        backend = self._backend(inline_max_bytes=0)
+        
+        async def run():
+            return await asyncio.gather(*[
+                backend._process_image_async(self.image_path) for _ in range(5)
+            ])
+        
+        loop = asyncio.new_event_loop()
+        try:
+            handles = loop.run_until_complete(run())
+        finally:
+            loop.close()
+        
+        self.assertEqual(len({id(handle) for handle in handles}), 1)
+        backend.client.aio.files.upload.assert_awaited_once()
+    
+    def test_instructions_cached_once(self):
+        """Test that a prompt's instructions go into one reused context cache."""
+        backend = self._backend(inline_max_bytes=1024 * 1024)
+        backend.client.caches.create.return_value = mock.MagicMock(name="cachedContents/abc")
+        for _ in range(3):
+            backend.generate(self.image_path, "Reference Text: हर", "हर", instructions="Transcribe.")
+        
+        backend.client.caches.create.assert_called_once()
+        config = backend.client.models.generate_content.call_args.kwargs["config"]
+        self.assertIn("cached_content", config)
+        self.assertNotIn("system_instruction", config)
+        self.assertEqual(backend.context_cache_stats["hits"], 2)
+    
+    def test_uncacheable_instructions_sent_inline(self):
+        """Test the fallback to inline instructions when caching is rejected."""
+        backend = self._backend(inline_max_bytes=1024 * 1024)
+        backend.client.caches.create.side_effect = ValueError("too few tokens")
+        for _ in range(2):
+            backend.generate(self.image_path, "Reference Text: हर", "हर", instructions="Transcribe.")
+        
+        backend.client.caches.create.assert_called_once()
+        config = backend.client.models.generate_content.call_args.kwargs["config"]
+        self.assertEqual(config["system_instruction"], "Transcribe.")
+
+if __name__ == "__main__":
+    unittest.main()
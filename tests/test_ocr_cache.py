@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+import PIL.Image
+
+from src.ocr_cache import OcrResultCache, hash_image
+
+class TestOcrResultCache(unittest.TestCase):
+    def setUp(self):
+        """Set up a cache backed by a temporary SQLite file."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.temp_dir.name) / "cache.db"
+        self.cache = OcrResultCache(self.db_path, max_memory_entries=2)
+
+    def tearDown(self):
+        self.cache.close()
+        self.temp_dir.cleanup()
+
+    def test_miss_then_hit(self):
+        """Test that a stored result is returned on the next lookup."""
+        key = OcrResultCache.make_key("img", "prompt", "model", "हर पल")
+        self.assertIsNone(self.cache.get(key))
+
+        self.cache.put(key, {"full_text": "हर पल", "accuracy": 100.0})
+        self.assertEqual(self.cache.get(key)["full_text"], "हर पल")
+
+        stats = self.cache.get_stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_key_depends_on_every_component(self):
+        """Test that changing any key component changes the key."""
+        base = OcrResultCache.make_key("img", "prompt", "model", "ref")
+        self.assertNotEqual(base, OcrResultCache.make_key("img2", "prompt", "model", "ref"))
+        self.assertNotEqual(base, OcrResultCache.make_key("img", "prompt2", "model", "ref"))
+        self.assertNotEqual(base, OcrResultCache.make_key("img", "prompt", "model2", "ref"))
+        self.assertNotEqual(base, OcrResultCache.make_key("img", "prompt", "model", "ref2"))
+
+    def test_disk_tier_survives_reopen(self):
+        """Test that results evicted from memory are served from disk."""
+        for i in range(3):
+            self.cache.put(str(i), {"i": i})
+        self.cache.close()
+
+        self.cache = OcrResultCache(self.db_path, max_memory_entries=2)
+        self.assertEqual(self.cache.get("0"), {"i": 0})
+        self.assertEqual(self.cache.get_stats()["disk_hits"], 1)
+
+    def test_size_based_eviction(self):
+        """Test that the oldest entries are evicted once over the disk budget."""
+        self.cache.close()
+        self.cache = OcrResultCache(self.db_path, max_memory_entries=1, max_disk_bytes=100)
+        for i in range(5):
+            self.cache.put(str(i), {"text": "x" * 30})
+
+        self.assertIsNone(self.cache.get("0"))
+        self.assertIsNotNone(self.cache.get("4"))
+        self.assertLessEqual(self.cache.get_stats()["disk_bytes"], 100)
+
+    def test_hash_image_matches_file_content(self):
+        """Test that identical image bytes hash identically."""
+        image = PIL.Image.new("RGB", (4, 4), color="white")
+        first = Path(self.temp_dir.name) / "a.png"
+        second = Path(self.temp_dir.name) / "b.png"
+        image.save(first)
+        image.save(second)
+
+        self.assertEqual(hash_image(first), hash_image(second))
+        self.assertEqual(hash_image(image), hash_image(image.copy()))
+
+if __name__ == "__main__":
+    unittest.main()
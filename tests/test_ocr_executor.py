@@ -0,0 +1,61 @@
+import asyncio
+import threading
+import unittest
+
+from src.ocr_executor import OcrExecutor
+
+class TestOcrExecutor(unittest.TestCase):
+    def test_queue_depth_and_wait_recorded(self):
+        """Test that jobs beyond the pool size queue and their wait is measured."""
+        executor = OcrExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        
+        async def run_jobs():
+            jobs = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            self.assertEqual(executor.get_stats()['queued'], 2)
+            self.assertEqual(executor.get_stats()['running'], 1)
+            release.set()
+            return await asyncio.gather(*jobs)
+        
+        self.assertEqual(asyncio.run(run_jobs()), [True, True, True])
+        stats = executor.get_stats()
+        self.assertEqual((stats['queued'], stats['running'], stats['completed']), (0, 0, 3))
+        self.assertGreaterEqual(stats['max_queued'], 2)
+        self.assertEqual(stats['wait_ms']['count'], 3)
+        self.assertGreater(stats['wait_ms']['p99'], 20)
+    
+    def test_failed_and_dropped_jobs_counted(self):
+        """Test that failures are not counted as completed and dropped jobs leave the queue."""
+        executor = OcrExecutor(max_workers=1)
+        release = threading.Event()
+        
+        async def run_jobs():
+            with self.assertRaises(ZeroDivisionError):
+                await executor.run(lambda: 1 / 0)
+            jobs = [asyncio.ensure_future(executor.run(release.wait, 5)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            executor.shutdown(wait=False)
+            release.set()
+            return await asyncio.gather(*jobs, return_exceptions=True)
+        
+        results = asyncio.run(run_jobs())
+        self.assertEqual(results[0], True)
+        self.assertTrue(all(isinstance(result, asyncio.CancelledError) for result in results[1:]))
+        stats = executor.get_stats()
+        self.assertEqual((stats['queued'], stats['completed'], stats['failed']), (0, 1, 1))
+    
+    def test_closed_executor_rejects_work(self):
+        """Test that work submitted after shutdown fails instead of hanging."""
+        executor = OcrExecutor(max_workers=1)
+        
+        async def close_then_run():
+            await executor.aclose()
+            await executor.run(sum, [1, 2])
+        
+        with self.assertRaises(RuntimeError):
+            asyncio.run(close_then_run())
+
+if __name__ == "__main__":
+    unittest.main()
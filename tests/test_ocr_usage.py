@@ -0,0 +1,35 @@
+import os
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from src.ocr_usage import OcrUsage, price_for_model
+
+class TestOcrUsage(unittest.TestCase):
+    def test_price_uses_longest_prefix(self):
+        """Test that versioned model names resolve to their base model's price."""
+        self.assertEqual(price_for_model("gemini-2.0-flash-exp"), price_for_model("gemini-2.0-flash"))
+        self.assertNotEqual(price_for_model("gemini-2.0-flash-lite-001"), price_for_model("gemini-2.0-flash"))
+        self.assertIsNone(price_for_model("replay"))
+    
+    def test_price_override_from_env(self):
+        """Test that OCR_MODEL_PRICES adds or replaces table entries."""
+        with mock.patch.dict(os.environ, {"OCR_MODEL_PRICES": '{"replay": [1, 2, 0.5]}'}):
+            self.assertEqual(price_for_model("replay"), (1, 2, 0.5))
+    
+    def test_cost_bills_cached_tokens_at_cached_rate(self):
+        """Test the cost computed from Gemini usage metadata."""
+        usage = OcrUsage(model="gemini-2.0-flash")
+        usage.record_usage_metadata(SimpleNamespace(
+            prompt_token_count=1_000_000,
+            candidates_token_count=1_000_000,
+            cached_content_token_count=500_000,
+            thoughts_token_count=None,
+            total_token_count=2_000_000
+        ))
+        # 500k uncached at $0.10/M, 500k cached at $0.025/M, 1M output at $0.40/M
+        self.assertAlmostEqual(usage.compute_cost(), 0.05 + 0.0125 + 0.40)
+        self.assertEqual(usage.total_tokens, 2_000_000)
+
+if __name__ == "__main__":
+    unittest.main()
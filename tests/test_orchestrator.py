@@ -0,0 +1,362 @@
+import asyncio
+import csv
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+import PIL.Image
+import requests
+
+from src.evaluation_shards import EvaluationShards
+from src.image_store import ImageBytes, ImageStore
+from src.orchestrator import ROWS_IN_MEMORY_PER_WORKER, ImageProcessor, OcrOrchestrator
+from src.retry_policy import RetryBudget
+from src.sharding import merge_shards, parse_shard, shard_of
+
+class ImageProcessorTestCase(unittest.TestCase):
+    def setUp(self):
+        """Run in a temporary workspace with the replay backend and no result cache."""
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        
+        env_patch = mock.patch.dict(os.environ, {
+            "OCR_BACKEND": "replay",
+            "OCR_REPLAY_DIR": str(self.workspace / "recordings"),
+            "OCR_REPLAY_LATENCY_MS": "20",
+            "OCR_REPLAY_LATENCY_JITTER_MS": "20",
+            "OCR_CACHE_ENABLED": "false",
+            "GEMINI_RPM": "0",
+            "GEMINI_TPM": "0",
+            "RETRY_BASE_DELAY_SECONDS": "0.01",
+        })
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+        
+        cwd = os.getcwd()
+        os.chdir(self.workspace)
+        self.addCleanup(os.chdir, cwd)
+        
+        self.source_image = self.workspace / "source.png"
+        PIL.Image.new("RGB", (4, 4), color="white").save(self.source_image)
+        
+        self.csv_path = self.workspace / "batch.csv"
+        with open(self.csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["#", "Link", "Text"])
+            writer.writeheader()
+            for number in range(1, 13):
+                link = "http://example.invalid/missing.jpg" if number == 5 else f"http://example.invalid/{number}.jpg"
+                writer.writerow({"#": str(number), "Link": link, "Text": "हर पल"})
+    
+    def fake_download(self, processor):
+        """Copy the source image; the missing image is a 404 and image 3 drops its first connection."""
+        attempts = {}
+        
+        def download(url, image_id):
+            attempts[image_id] = attempts.get(image_id, 0) + 1
+            if "missing" in url:
+                response = requests.Response()
+                response.status_code = 404
+                raise requests.HTTPError("404 Not Found", response=response)
+            if image_id == "3" and attempts[image_id] == 1:
+                raise requests.ConnectionError("Connection reset by peer")
+            path = processor.images_dir / f"image_{image_id}.png"
+            shutil.copy(self.source_image, path)
+            return str(path)
+        return download
+
+class TestImageProcessorConcurrent(ImageProcessorTestCase):
+    def test_concurrent_output_matches_input_order(self):
+        """Test that the pipeline keeps row order and counts failures."""
+        processor = ImageProcessor(str(self.csv_path), max_retries=2, workers=4, progress_interval=0.05)
+        with mock.patch.object(processor, "download_image", side_effect=self.fake_download(processor)) as download:
+            processor.process_csv()
+        
+        with open(self.workspace / "batch_updated.csv", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row["#"] for row in rows], [str(number) for number in range(1, 13)])
+        self.assertEqual(processor.stats["successful"], 11)
+        self.assertEqual(processor.stats["failed"], 1)
+        self.assertIn("Failed (not retryable)", rows[4]["Processing Status"])
+        self.assertEqual(rows[0]["Accuracy"], "100.00%")
+        # One attempt per image, plus a retry for the dropped connection but not the 404
+        self.assertEqual(download.call_count, 13)
+        # Downloads ran on the processor's own pool; the 404 and the dropped connection failed
+        download_stats = processor.download_executor.get_stats()
+        self.assertEqual((download_stats["completed"], download_stats["failed"]), (11, 2))
+        self.assertEqual(rows[2]["Retries"], "1")
+        self.assertEqual(processor.stats["retries"], 1)
+        with open(self.workspace / "batch_failed.csv", encoding="utf-8") as f:
+            self.assertEqual([row["#"] for row in csv.DictReader(f)], ["5"])
+        shards = EvaluationShards(self.workspace / "evaluations")
+        self.addCleanup(shards.close)
+        self.assertEqual(shards.read("12")["image_info"]["url"], "http://example.invalid/12.jpg")
+        self.assertTrue(rows[11]["Evaluation JSON"].startswith("evaluations-00000.jsonl:"))
+
+    def test_rows_streamed_in_bounded_window(self):
+        """Test that a slow row holds back reading instead of buffering the whole input."""
+        processor = ImageProcessor(str(self.csv_path), max_retries=2, workers=2, progress_interval=0.05)
+        processor.retry_budget = RetryBudget.for_calls(0)
+        download = self.fake_download(processor)
+
+        def slow_first_download(url, image_id):
+            if image_id == "1":
+                time.sleep(0.3)
+            return download(url, image_id)
+
+        counters = {'read': 0, 'delivered': 0, 'most_held': 0}
+
+        def rows():
+            for number in range(1, 41):
+                counters['read'] += 1
+                counters['most_held'] = max(counters['most_held'], counters['read'] - counters['delivered'])
+                yield {"#": str(number), "Link": f"http://example.invalid/{number}.jpg", "Text": "हर पल"}
+
+        delivered = []
+
+        def on_result(success, row):
+            counters['delivered'] += 1
+            delivered.append(row["#"])
+
+        with mock.patch.object(processor, "download_image", side_effect=slow_first_download):
+            self.assertIsNone(asyncio.run(processor.process_rows_async(rows(), on_result)))
+
+        self.assertEqual(delivered, [str(number) for number in range(1, 41)])
+        self.assertLessEqual(counters['most_held'], 2 * ROWS_IN_MEMORY_PER_WORKER)
+
+class TestImageProcessorFailures(ImageProcessorTestCase):
+    def test_ocr_failure_after_download(self):
+        """Test that an OCR failure moves the downloaded image to failed/ and the run carries on."""
+        with mock.patch.dict(os.environ, {"OCR_REPLAY_ERROR_RATE": "1.0"}):
+            processor = ImageProcessor(str(self.csv_path), max_retries=1)
+            with mock.patch.object(processor, "download_image", side_effect=self.fake_download(processor)):
+                processor.process_csv()
+        
+        self.assertEqual(processor.stats["failed"], 12)
+        with open(self.workspace / "batch_failed.csv", encoding="utf-8") as f:
+            rows = {row["#"]: row for row in csv.DictReader(f)}
+        self.assertEqual(rows["1"]["Local Image"], os.path.join("failed", "image_1.png"))
+        self.assertTrue((self.workspace / "failed" / "image_1.png").exists())
+        self.assertIn("503", rows["1"]["Processing Status"])
+        self.assertNotIn("relative", rows["1"]["Processing Status"])
+
+class TestImageProcessorResume(ImageProcessorTestCase):
+    def test_resume_skips_journaled_rows(self):
+        """Test that a run interrupted mid-batch resumes without redoing finished rows."""
+        processor = ImageProcessor(str(self.csv_path), max_retries=2)
+        extract_text = processor.ocr.extract_text
+        
+        def interrupt_at_row_8(image, reference_text, **kwargs):
+            if "image_8" in str(image):
+                raise KeyboardInterrupt
+            return extract_text(image, reference_text, **kwargs)
+        
+        with mock.patch.object(processor, "download_image", side_effect=self.fake_download(processor)), \
+                mock.patch.object(processor.ocr, "extract_text", side_effect=interrupt_at_row_8):
+            with self.assertRaises(KeyboardInterrupt):
+                processor.process_csv()
+        self.assertFalse((self.workspace / "batch_updated.csv").exists())
+        
+        resumed = ImageProcessor(str(self.csv_path), max_retries=2, resume=True)
+        with mock.patch.object(resumed, "download_image", side_effect=self.fake_download(resumed)) as download:
+            resumed.process_csv()
+        
+        # Rows 1-7 except the failed row 5 were journaled as done
+        self.assertEqual(resumed.stats["resumed"], 6)
+        self.assertEqual(download.call_count, 6)
+        self.assertEqual(resumed.stats["successful"], 11)
+        with open(self.workspace / "batch_updated.csv", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row["#"] for row in rows], [str(number) for number in range(1, 13)])
+        self.assertTrue(all(row["Accuracy"] for number, row in enumerate(rows, 1) if number != 5))
+
+class TestImageProcessorShards(ImageProcessorTestCase):
+    def test_shards_partition_rows_and_merge(self):
+        """Test that shards process disjoint rows and merge back into input order."""
+        for index in range(3):
+            processor = ImageProcessor(str(self.csv_path), max_retries=2, shard=(index, 3))
+            with mock.patch.object(processor, "download_image", side_effect=self.fake_download(processor)) as download:
+                processor.process_csv()
+            self.assertEqual(
+                processor.stats["total"], sum(shard_of({"#": str(number)}, 3) == index for number in range(1, 13))
+            )
+            self.assertEqual(download.call_count, processor.stats["total"] + (index == shard_of({"#": "3"}, 3)))
+        
+        self.assertEqual(merge_shards(str(self.csv_path), 3), {'rows': 12, 'failed': 1})
+        with open(self.workspace / "batch_updated.csv", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row["#"] for row in rows], [str(number) for number in range(1, 13)])
+        self.assertTrue(rows[0]["Evaluation JSON"].startswith(f"shard-{shard_of(rows[0], 3)}-of-3/"))
+        with open(self.workspace / "batch_failed.csv", encoding="utf-8") as f:
+            self.assertEqual([row["#"] for row in csv.DictReader(f)], ["5"])
+    
+    def test_more_shards_than_rows(self):
+        """Test that shards given no rows still leave output, so the merge succeeds."""
+        with open(self.csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["#", "Link", "Text"])
+            writer.writeheader()
+            for number in range(1, 3):
+                writer.writerow({"#": str(number), "Link": f"http://example.invalid/{number}.jpg", "Text": "हर पल"})
+        for index in range(4):
+            processor = ImageProcessor(str(self.csv_path), max_retries=2, shard=(index, 4))
+            with mock.patch.object(processor, "download_image", side_effect=self.fake_download(processor)):
+                processor.process_csv()
+        
+        self.assertEqual(merge_shards(str(self.csv_path), 4), {'rows': 2, 'failed': 0})
+        with open(self.workspace / "batch_updated.csv", encoding="utf-8") as f:
+            self.assertEqual([row["#"] for row in csv.DictReader(f)], ["1", "2"])
+    
+    def test_parse_shard(self):
+        """Test that shard specs are validated."""
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for spec in ("4/4", "-1/4", "1", "a/b"):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+class TestImageProcessorDownloads(ImageProcessorTestCase):
+    def test_downloads_reuse_connection(self):
+        """Test that consecutive downloads share one keep-alive connection."""
+        connections = []
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def setup(self):
+                super().setup()
+                connections.append(self.client_address)
+            
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Length", "5")
+                self.end_headers()
+                self.wfile.write(b"image")
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        
+        processor = ImageProcessor(str(self.csv_path))
+        self.addCleanup(processor.http_session.close)
+        self.addCleanup(processor.download_cache.close)
+        for number in range(3):
+            path = processor.download_image(f"http://127.0.0.1:{server.server_port}/{number}.jpg", str(number))
+            self.assertEqual(Path(path).read_bytes(), b"image")
+        self.assertEqual(len(connections), 1)
+
+    def test_unchanged_image_revalidated(self):
+        """Test that a repeat download sends the ETag and reuses the cached file on 304."""
+        requests_seen = []
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            
+            def do_GET(self):
+                requests_seen.append(self.headers.get("If-None-Match"))
+                if self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    self.send_header("ETag", '"v1"')
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", '"v1"')
+                self.send_header("Content-Length", "5")
+                self.end_headers()
+                self.wfile.write(b"image")
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        
+        processor = ImageProcessor(str(self.csv_path))
+        self.addCleanup(processor.http_session.close)
+        self.addCleanup(processor.download_cache.close)
+        url = f"http://127.0.0.1:{server.server_port}/page.jpg"
+        first = processor.download_image(url, "1")
+        second = processor.download_image(url, "1")
+        
+        self.assertEqual(first, second)
+        self.assertEqual(Path(second).read_bytes(), b"image")
+        self.assertEqual(requests_seen, [None, '"v1"'])
+        self.assertEqual(processor.download_cache.get_stats()["not_modified"], 1)
+
+class TestOcrOrchestratorInMemory(ImageProcessorTestCase):
+    def serve(self, body: bytes) -> str:
+        """Serve body at a local URL for the duration of the test."""
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, *args):
+                pass
+        
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/page.png"
+    
+    def test_small_image_evaluated_from_memory(self):
+        """Test that a small download is OCR'd from memory and stored in the background."""
+        url = self.serve(self.source_image.read_bytes())
+        store = ImageStore(self.workspace / "store")
+        self.addCleanup(store.close)
+        
+        async def run():
+            orchestrator = OcrOrchestrator()
+            try:
+                image = await orchestrator.fetch_image_async(url, "1")
+                result = await orchestrator.process_single_evaluation(url, "हर पल", "1", persist_image=True)
+                stored = await orchestrator.wait_persisted(result["content_hash"])
+            finally:
+                await orchestrator.close()
+            return image, result, stored
+        
+        with mock.patch("src.orchestrator.get_image_store", return_value=store):
+            image, result, stored = asyncio.run(run())
+        
+        self.assertIsInstance(image, ImageBytes)
+        self.assertEqual(image.mime_type, "image/png")
+        self.assertTrue(result["success"])
+        self.assertIsNone(result["local_image_path"])
+        self.assertTrue(stored)
+        self.assertEqual(store.path(result["content_hash"]).read_bytes(), self.source_image.read_bytes())
+        self.assertEqual(list((self.workspace / "images").glob("url_*")), [])
+    
+    def test_large_image_spills_to_file(self):
+        """Test that a download over the memory limit is written to disk instead."""
+        url = self.serve(b"x" * 1000)
+        
+        async def run():
+            orchestrator = OcrOrchestrator()
+            orchestrator.download_settings.memory_max_bytes = 100
+            try:
+                return await orchestrator.fetch_image_async(url, "1"), orchestrator.executor.get_stats()
+            finally:
+                await orchestrator.close()
+        
+        path, executor_stats = asyncio.run(run())
+        self.assertIsInstance(path, str)
+        # The file is opened, written and closed on the executor, not the event loop
+        self.assertGreaterEqual(executor_stats["completed"], 3)
+        self.assertEqual(Path(path).read_bytes(), b"x" * 1000)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import unittest
+
+from src.prompt_registry import DEFAULT_PROMPT, CompiledPrompt, PromptRegistry
+
+class TestPromptRegistry(unittest.TestCase):
+    def test_falls_back_to_builtin_prompt(self):
+        """Test that an empty registry serves the built-in prompt for any version."""
+        registry = PromptRegistry()
+        self.assertIs(registry.get(), DEFAULT_PROMPT)
+        self.assertIs(registry.get("v1"), DEFAULT_PROMPT)
+    
+    def test_loaded_version_preferred_over_production(self):
+        """Test that an explicitly loaded version wins over the production prompt."""
+        registry = PromptRegistry()
+        registry._active = CompiledPrompt.compile("1.0.0", "Production instructions")
+        registry._versions["2.0.0"] = CompiledPrompt.compile("2.0.0", "Candidate instructions")
+        
+        self.assertEqual(registry.get().version, "1.0.0")
+        self.assertEqual(registry.get("2.0.0").version, "2.0.0")
+        self.assertEqual(registry.get("unknown").version, "1.0.0")
+    
+    def test_render_keeps_instructions_out_of_suffix(self):
+        """Test that only the reference text varies per request."""
+        compiled = CompiledPrompt.compile("1.0.0", "Instructions")
+        self.assertEqual(compiled.render("हर पल"), "Reference Text: हर पल")
+        self.assertNotIn("Instructions", compiled.render(None))
+        self.assertEqual(compiled.prefix_hash, CompiledPrompt.compile("x", "Instructions").prefix_hash)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import os
+import time
+import unittest
+from unittest import mock
+
+from google.genai.errors import ClientError, ServerError
+
+from src.rate_limiter import AimdConcurrencyController, RateLimiter, TokenBucket, is_overload_error
+
+class TestTokenBucket(unittest.TestCase):
+    def test_paces_requests_after_burst(self):
+        """Test that requests beyond the burst wait for refill."""
+        bucket = TokenBucket(rate_per_minute=600, capacity=2)  # 10 per second
+        start = time.monotonic()
+        for _ in range(4):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start, 0.15)
+    
+    def test_adjust_credits_unused_tokens(self):
+        """Test that over-estimated requests are credited back."""
+        bucket = TokenBucket(rate_per_minute=60, capacity=10)
+        bucket.acquire(10)
+        bucket.adjust(-10)
+        start = time.monotonic()
+        bucket.acquire(5)
+        self.assertLess(time.monotonic() - start, 0.05)
+    
+    def test_try_acquire_never_waits(self):
+        """Test that try_acquire refuses instead of going into debt."""
+        bucket = TokenBucket(rate_per_minute=60, capacity=2)
+        self.assertTrue(bucket.try_acquire(2))
+        self.assertFalse(bucket.try_acquire(1))
+
+class TestRateLimiter(unittest.TestCase):
+    def test_share_splits_quotas(self):
+        """Test that one of four shards gets a quarter of each quota."""
+        with mock.patch.dict(os.environ, {"GEMINI_RPM": "2000", "GEMINI_TPM": "0"}):
+            limiter = RateLimiter.from_env(share=1 / 4)
+        self.assertAlmostEqual(limiter.requests.rate_per_second, 500 / 60)
+        self.assertIsNone(limiter.tokens)
+
+class TestAimdConcurrencyController(unittest.TestCase):
+    def test_overload_halves_limit_once_per_cooldown(self):
+        """Test multiplicative decrease with a cooldown between cuts."""
+        controller = AimdConcurrencyController(max_limit=16, cooldown_seconds=60)
+        controller.record(ClientError(429, {"error": {"status": "RESOURCE_EXHAUSTED"}}))
+        controller.record(ServerError(503, {"error": {"status": "UNAVAILABLE"}}))
+        self.assertEqual(controller.limit, 8)
+        self.assertEqual(controller.stats['decreases'], 1)
+    
+    def test_success_ramps_limit_back_up(self):
+        """Test additive increase of about one slot per window of successes."""
+        controller = AimdConcurrencyController(max_limit=16, initial_limit=4)
+        for _ in range(4):
+            controller.on_success()
+        self.assertEqual(controller.limit, 4)
+        for _ in range(5):
+            controller.on_success()
+        self.assertEqual(controller.limit, 5)
+    
+    def test_limits_async_in_flight(self):
+        """Test that no more than limit coroutines hold a slot at once."""
+        controller = AimdConcurrencyController(max_limit=3)
+        peak = 0
+        
+        async def worker():
+            nonlocal peak
+            async with controller.slot_async():
+                peak = max(peak, controller.in_flight)
+                await asyncio.sleep(0.01)
+        
+        async def run():
+            await asyncio.gather(*[worker() for _ in range(10)])
+        
+        asyncio.run(run())
+        self.assertEqual(peak, 3)
+        self.assertEqual(controller.in_flight, 0)
+    
+    def test_only_quota_errors_are_overloads(self):
+        """Test overload classification."""
+        self.assertTrue(is_overload_error(ClientError(429, {"error": {}})))
+        self.assertFalse(is_overload_error(ClientError(400, {"error": {}})))
+        self.assertFalse(is_overload_error(ValueError("bad json")))
+
+if __name__ == "__main__":
+    unittest.main()
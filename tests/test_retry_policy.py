@@ -0,0 +1,100 @@
+import asyncio
+import time
+import unittest
+
+import requests
+from google.genai.errors import ClientError, ServerError
+
+from src.retry_policy import CircuitBreaker, OcrCallError, RetryBudget, RetryPolicy, check_ocr_result, is_retryable
+
+def http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status}", response=response)
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_classification(self):
+        """Test that transient errors are retryable and permanent ones are not."""
+        self.assertTrue(is_retryable(ServerError(503, {"error": {"message": "overloaded"}})))
+        self.assertTrue(is_retryable(ClientError(429, {"error": {"message": "quota"}})))
+        self.assertTrue(is_retryable(requests.ConnectionError("reset")))
+        self.assertTrue(is_retryable(http_error(502)))
+        self.assertFalse(is_retryable(ClientError(401, {"error": {"message": "bad key"}})))
+        self.assertFalse(is_retryable(http_error(404)))
+        self.assertFalse(is_retryable(FileNotFoundError("image.jpg")))
+        self.assertFalse(is_retryable(KeyError("full_text")))
+
+    def test_error_result_raised(self):
+        """Test that OCR error dicts become exceptions carrying their classification."""
+        with self.assertRaises(OcrCallError) as raised:
+            check_ocr_result({"error": "503 UNAVAILABLE", "retryable": True})
+        self.assertTrue(is_retryable(raised.exception))
+        self.assertEqual(check_ocr_result({"full_text": "हर"}), {"full_text": "हर"})
+
+    def test_backoff_is_full_jitter(self):
+        """Test that delays are drawn from zero up to the capped exponential."""
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0, seed=1)
+        for retry, cap in [(0, 1.0), (1, 2.0), (2, 4.0), (5, 5.0)]:
+            delays = [policy.backoff(retry) for _ in range(200)]
+            self.assertTrue(all(0 <= delay <= cap for delay in delays))
+            self.assertGreater(max(delays), cap * 0.8)
+            self.assertLess(min(delays), cap * 0.2)
+
+    def test_retries_transient_not_permanent(self):
+        """Test that only transient failures are retried and retries are counted."""
+        policy = RetryPolicy(max_attempts=3, base_delay=0.001, seed=1)
+        outcomes = [requests.ConnectionError("reset"), requests.Timeout("slow"), "ok"]
+
+        def flaky():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        counts = {}
+        self.assertEqual(policy.call(flaky, "download", counts=counts), "ok")
+        self.assertEqual(counts["retries"], 2)
+
+        calls = []
+
+        def missing():
+            calls.append(1)
+            raise http_error(404)
+
+        with self.assertRaises(requests.HTTPError):
+            policy.call(missing, "download")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(policy.get_stats()["retries"], 2)
+
+    def test_budget_limits_retries(self):
+        """Test that an exhausted job budget stops further retries."""
+        policy = RetryPolicy(max_attempts=5, base_delay=0.001, breaker_error_rate=0)
+        budget = RetryBudget(max_retries=3)
+        calls = []
+
+        def failing():
+            calls.append(1)
+            raise requests.ConnectionError("reset")
+
+        for _ in range(2):
+            with self.assertRaises(requests.ConnectionError):
+                policy.call(failing, "download", budget=budget)
+        # 4 attempts on the first call, then no retries left for either
+        self.assertEqual(len(calls), 5)
+        self.assertEqual(policy.get_stats()["budget_exhausted"], 2)
+
+    def test_breaker_pauses_callers(self):
+        """Test that a burst of upstream failures makes later callers wait."""
+        breaker = CircuitBreaker(error_rate=0.5, min_calls=4, window_seconds=60, cooldown_seconds=0.2)
+        for failed in (False, True, True, True):
+            breaker.record(failed)
+        self.assertTrue(breaker.is_open)
+        self.assertEqual(breaker.stats["trips"], 1)
+
+        started = time.monotonic()
+        asyncio.run(breaker.wait_async())
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertFalse(breaker.is_open)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from src.run_journal import RunJournal
+
+class TestRunJournal(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = Path(self.temp_dir.name) / "batch_journal.db"
+
+    def test_entries_survive_reopen(self):
+        """Test that entries survive a reopen and only successful rows count as completed."""
+        journal = RunJournal(self.path)
+        journal.record(True, {"#": "1", "Link": "a", "Text": "हर", "Accuracy": "100.00%"})
+        journal.record(False, {"#": "2", "Link": "b", "Text": "पल"})
+        journal.close()
+
+        journal = RunJournal(self.path, resume=True)
+        self.addCleanup(journal.close)
+        self.assertTrue(journal.is_completed({"#": "1", "Link": "a", "Text": "हर"}))
+        self.assertEqual(journal.get({"#": "1", "Link": "a", "Text": "हर"})["row"]["Accuracy"], "100.00%")
+        self.assertFalse(journal.is_completed({"#": "2", "Link": "b", "Text": "पल"}))
+        self.assertFalse(journal.get({"#": "2", "Link": "b", "Text": "पल"})["success"])
+
+    def test_later_result_replaces_earlier(self):
+        """Test that a retried row's success replaces its earlier failure."""
+        journal = RunJournal(self.path)
+        self.addCleanup(journal.close)
+        journal.record(False, {"#": "1", "Link": "a", "Text": "हर"})
+        journal.record(True, {"#": "1", "Link": "a", "Text": "हर"})
+        self.assertTrue(journal.is_completed({"#": "1", "Link": "a", "Text": "हर"}))
+        self.assertEqual(len(journal), 1)
+
+    def test_changed_input_not_resumed(self):
+        """Test that a row whose reference text changed is not treated as done."""
+        journal = RunJournal(self.path)
+        journal.record(True, {"#": "1", "Link": "a", "Text": "हर"})
+        journal.close()
+
+        journal = RunJournal(self.path, resume=True)
+        self.addCleanup(journal.close)
+        self.assertFalse(journal.is_completed({"#": "1", "Link": "a", "Text": "हर पल"}))
+
+    def test_fresh_run_discards_journal(self):
+        """Test that opening without resume starts an empty journal."""
+        journal = RunJournal(self.path)
+        journal.record(True, {"#": "1", "Link": "a", "Text": "हर"})
+        journal.close()
+        journal = RunJournal(self.path)
+        self.addCleanup(journal.close)
+        self.assertEqual(len(journal), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+
+import json
+
+from src.scoring import (
+    grapheme_clusters,
+    normalize_text,
+    rescore_chunk,
+    score_transcription,
+    transcription_from_evaluations,
+)
+
+class TestGraphemeClusters(unittest.TestCase):
+    def test_matras_and_conjuncts_stay_together(self):
+        """Test that matras attach to their consonant and viramas form conjuncts."""
+        self.assertEqual(grapheme_clusters("लड़ाई"), ["ल", "ड़ा", "ई"])
+        self.assertEqual(grapheme_clusters("क्षमा"), ["क्ष", "मा"])
+        self.assertEqual(grapheme_clusters("हर पल"), ["ह", "र", " ", "प", "ल"])
+    
+    def test_normalize_text(self):
+        """Test that zero-width characters and repeated whitespace normalize away."""
+        self.assertEqual(normalize_text("\ufeffहर  \u200bपल\n"), "हर पल")
+
+class TestScoreTranscription(unittest.TestCase):
+    def test_exact_match(self):
+        """Test that an exact transcription scores 100% with no errors."""
+        result = score_transcription("हर पल लड़ाई मत कर", "हर पल लड़ाई मत कर")
+        self.assertEqual(result["accuracy"], 100)
+        self.assertEqual(result["wer"], 0)
+        self.assertEqual(result["cer"], 0)
+    
+    def test_missing_word(self):
+        """Test that a dropped word is reported against its reference word only."""
+        result = score_transcription("हर पल लड़ाई मत कर", "हर पल मत कर")
+        self.assertEqual(result["correct_words"], 4)
+        self.assertIsNone(result["evaluations"][2]["transcribed_word"])
+        self.assertIn("Word missing", result["evaluations"][2]["reason_diff"])
+        self.assertAlmostEqual(result["wer"], 0.2)
+    
+    def test_merged_words(self):
+        """Test that two reference words written as one are a segmentation error."""
+        result = score_transcription("हर पल मत कर", "हर पल मतकर")
+        self.assertEqual(
+            [e["transcribed_word"] for e in result["evaluations"]],
+            ["हर", "पल", "मतकर", "मतकर"]
+        )
+        self.assertIn("merged", result["evaluations"][3]["reason_diff"])
+        self.assertEqual(result["full_text"], "हर पल मतकर")
+    
+    def test_split_word(self):
+        """Test that one reference word written as two is a segmentation error."""
+        result = score_transcription("हर लड़ाई", "हर लड़ ाई")
+        self.assertEqual(result["total_words"], 2)
+        self.assertIn("split", result["evaluations"][1]["reason_diff"])
+    
+    def test_missing_matra(self):
+        """Test that a dropped vowel sign is described as a missing matra."""
+        result = score_transcription("लड़ाई", "लड़ई")
+        self.assertFalse(result["evaluations"][0]["match"])
+        self.assertIn("Missing matra", result["evaluations"][0]["reason_diff"])
+        self.assertAlmostEqual(result["cer"], 1 / 3)
+    
+    def test_illegible_word(self):
+        """Test that [illegible] counts as one wrong character, not eleven."""
+        result = score_transcription("हर पल", "हर [illegible]")
+        self.assertEqual(result["evaluations"][1]["reason_diff"], "Illegible word in transcription.")
+        self.assertAlmostEqual(result["cer"], 2 / 5)
+
+class TestRescoreChunk(unittest.TestCase):
+    def test_rebuilds_transcription_from_stored_evaluations(self):
+        """Test that merged words are counted once and illegible markers survive."""
+        stored = [
+            {"reference_word": "हर", "transcribed_word": "[illegible]", "match": False, "reason_diff": ""},
+            {"reference_word": "मत", "transcribed_word": "मतकर", "match": False, "reason_diff": ""},
+            {"reference_word": "कर", "transcribed_word": "मतकर", "match": False, "reason_diff": ""},
+        ]
+        self.assertEqual(transcription_from_evaluations(stored), "[illegible] मतकर")
+    
+    def test_rescores_rows(self):
+        """Test that rows are rescored from stored evaluations or ocr_output, and failures are isolated."""
+        stored = json.dumps([
+            {"reference_word": "हर", "transcribed_word": "हर", "match": True, "reason_diff": ""},
+            {"reference_word": "पल", "transcribed_word": "पल", "match": False, "reason_diff": ""},
+        ])
+        results = rescore_chunk([
+            (1, 50.0, "हर पल", "हर पल", stored),
+            (2, 100.0, "हर पल", "हर पल", None),
+            (3, 0.0, "हर पल", None, "not json"),
+        ])
+        self.assertEqual(results[0]["accuracy"], 100)
+        self.assertTrue(results[0]["changed"])
+        self.assertFalse(results[1]["changed"])
+        self.assertEqual(len(results[1]["evaluations"]), 2)
+        self.assertIn("error", results[2])
+
+if __name__ == "__main__":
+    unittest.main()